@@ -0,0 +1,102 @@
+"""
+Benchmark results in JSON and their comparison with a baseline
+"""
+
+import json
+import platform
+from datetime import datetime, timezone
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Any, NamedTuple
+
+RESULTS_FORMAT_VERSION = 1
+
+
+def make_results(stages: dict[str, list[float]], image: dict[str, Any]) -> dict[str, Any]:
+    """
+    :param stages: durations of the runs of every stage
+    :param image: description of the image (size, parameters of the generator etc.)
+    :return: JSON compatible results
+    """
+    return {
+        "version": RESULTS_FORMAT_VERSION,
+        "created": datetime.now(tz=timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": find_spec("numpy") is not None,
+        "image": image,
+        "stages": {name: {"best": min(runs), "runs": runs} for name, runs in stages.items()},
+    }
+
+
+def save_results(results: dict[str, Any], path: str | Path) -> None:
+    with Path(path).open("w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+
+
+def load_results(path: str | Path) -> dict[str, Any]:
+    with Path(path).open(encoding="utf-8") as file:
+        results = json.load(file)
+
+    if results.get("version") != RESULTS_FORMAT_VERSION:
+        msg = f"Unsupported benchmark results version: {results.get('version')!r}"
+        raise ValueError(msg)
+
+    return results
+
+
+class StageComparison(NamedTuple):
+    stage: str
+    baseline: float | None  # None if the stage is missing in the results
+    current: float | None
+    regression: bool
+
+    @property
+    def ratio(self) -> float | None:
+        if not self.baseline or self.current is None:
+            return None
+        return self.current / self.baseline
+
+
+def compare_results(
+    baseline: dict[str, Any],
+    current: dict[str, Any],
+    *,
+    threshold: float = 0.1,
+    min_delta: float = 0.005,
+) -> list[StageComparison]:
+    """
+    Compare the best durations of the stages with the baseline
+
+    :param baseline: baseline results
+    :param current: current results
+    :param threshold: relative slowdown which is considered a regression (0.1 is 10%)
+    :param min_delta: slowdowns smaller than this (in seconds) are considered noise
+    :return: comparison of every stage of both results
+    """
+    baseline_stages = baseline["stages"]
+    current_stages = current["stages"]
+    result = []
+    for stage in [*baseline_stages, *(stage for stage in current_stages if stage not in baseline_stages)]:
+        baseline_best = baseline_stages[stage]["best"] if stage in baseline_stages else None
+        current_best = current_stages[stage]["best"] if stage in current_stages else None
+        regression = (
+            baseline_best is not None
+            and current_best is not None
+            and current_best - baseline_best > max(baseline_best * threshold, min_delta)
+        )
+        result.append(StageComparison(stage, baseline_best, current_best, regression))
+
+    return result
+
+
+def format_comparison(comparison: list[StageComparison]) -> list[str]:
+    lines = [f"{'stage':<32} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for item in comparison:
+        baseline = f"{item.baseline:.4f}" if item.baseline is not None else "-"
+        current = f"{item.current:.4f}" if item.current is not None else "-"
+        change = f"{item.ratio - 1:+.1%}" if item.ratio is not None else "-"
+        flag = "  REGRESSION" if item.regression else ""
+        lines.append(f"{item.stage:<32} {baseline:>10} {current:>10} {change:>8}{flag}")
+
+    return lines
@@ -0,0 +1,106 @@
+"""
+Benchmarks of the stages of the analysis and the patching on synthetic images.
+
+    python -m benchmarks generate image.exe --size 16
+    python -m benchmarks run --size 16 --output results.json
+    python -m benchmarks compare baseline.json results.json --threshold 0.1
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import click
+
+from benchmarks.baseline import compare_results, format_comparison, load_results, make_results, save_results
+from benchmarks.stages import run_stages
+from benchmarks.synthetic_pe import MB, SyntheticPeParameters, generate_pe
+from dfint64_patch.cross_references.cross_references_relative import SCAN_MODES
+
+
+@click.group()
+def cli() -> None:
+    pass
+
+
+@cli.command()
+@click.argument("output_file", type=click.Path(dir_okay=False))
+@click.option("--size", "size", help="Approximate size of the image in MB", type=float, default=4)
+@click.option("--collision-rate", "collision_rate", help="Share of colliding references", type=float, default=0.01)
+@click.option("--seed", "seed", help="Seed of the random generator", type=int, default=0)
+def generate(output_file: str, size: float, collision_rate: float, seed: int) -> None:
+    """
+    Generate a synthetic PE image
+    """
+    parameters = SyntheticPeParameters(size=int(size * MB), collision_rate=collision_rate, seed=seed)
+    info = generate_pe(output_file, parameters)
+    for key, value in info._asdict().items():
+        print(f"{key}: {value}")
+
+
+@cli.command()
+@click.option("--image", "image", help="PE file to benchmark, a synthetic one is generated if not set", default=None)
+@click.option("--size", "size", help="Approximate size of the synthetic image in MB", type=float, default=4)
+@click.option("--collision-rate", "collision_rate", help="Share of colliding references", type=float, default=0.01)
+@click.option("--seed", "seed", help="Seed of the random generator", type=int, default=0)
+@click.option("--repeat", "repeat", help="Number of runs of every stage", type=int, default=3)
+@click.option("--scan", "scan", help="Scan mode of the cross references search", type=click.Choice(SCAN_MODES))
+@click.option("--output", "output", help="Path to write the JSON results to", default=None)
+def run(  # noqa: PLR0913
+    *,
+    image: str | None,
+    size: float,
+    collision_rate: float,
+    seed: int,
+    repeat: int,
+    scan: str | None,
+    output: str | None,
+) -> None:
+    """
+    Time every stage and print (or save) the results
+    """
+    scan = scan or "exhaustive"
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if image is None:
+            parameters = SyntheticPeParameters(size=int(size * MB), collision_rate=collision_rate, seed=seed)
+            image_path = Path(temp_dir) / "synthetic.exe"
+            info = generate_pe(image_path, parameters)
+            description = {"synthetic": True, **parameters._asdict(), **info._asdict(), "scan": scan}
+        else:
+            image_path = Path(image)
+            description = {"synthetic": False, "name": image_path.name, "size": image_path.stat().st_size, "scan": scan}
+
+        stages = run_stages(image_path, repeat=repeat, scan=scan)
+
+    results = make_results(stages, description)
+    for name, item in results["stages"].items():
+        print(f"{name:<32} {item['best']:.4f}")
+
+    if output is not None:
+        save_results(results, output)
+
+
+@cli.command()
+@click.argument("baseline_file", type=click.Path(exists=True, dir_okay=False))
+@click.argument("results_file", type=click.Path(exists=True, dir_okay=False))
+@click.option("--threshold", "threshold", help="Relative slowdown considered a regression", type=float, default=0.1)
+@click.option("--min-delta", "min_delta", help="Ignore smaller slowdowns (seconds)", type=float, default=0.005)
+def compare(baseline_file: str, results_file: str, threshold: float, min_delta: float) -> None:
+    """
+    Compare the results with a baseline, exit with code 1 if any stage regressed
+    """
+    comparison = compare_results(
+        load_results(baseline_file),
+        load_results(results_file),
+        threshold=threshold,
+        min_delta=min_delta,
+    )
+    for line in format_comparison(comparison):
+        print(line)
+
+    if any(item.regression for item in comparison):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,108 @@
+"""
+Timing of the separate stages of the analysis and of the patching
+"""
+
+import shutil
+import tempfile
+import time
+from collections.abc import Callable
+from itertools import chain
+from pathlib import Path
+from typing import Any
+
+from dfint64_patch.analysis.analyse import Analysis
+from dfint64_patch.cross_references.cross_references_relative import find_relative_cross_references
+from dfint64_patch.extract_strings.from_raw_bytes import extract_strings_from_raw_bytes
+from dfint64_patch.extract_subroutines.from_raw_bytes import extract_subroutine_index
+from dfint64_patch.patching.patch import build_patch_plan
+from dfint64_patch.pe.image import PeImage, open_pe_image
+from dfint64_patch.pe.sections import find_code_sections, find_data_sections
+from dfint64_patch.strings_context.extract_strings_with_subs import group_strings_by_subroutines
+from dfint64_patch.type_aliases import Rva
+
+STAGES = (
+    "extract_strings",
+    "find_relative_cross_references",
+    "extract_subroutines",
+    "grouping",
+    "patch_writing",
+)
+
+ENCODING = "cp437"
+
+
+def _time_runs(function: Callable[[], Any], repeat: int) -> tuple[list[float], Any]:
+    """
+    :return: durations of the runs and the result of the last run
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+
+    return durations, result
+
+
+def _patch_copy(pe: PeImage, image_path: Path, analysis: Analysis, work_dir: Path) -> None:
+    strings = {item.address: item.string for item in analysis.strings}
+    translations = {string: string.upper() for string in strings.values()}
+    plan = build_patch_plan(pe, strings, translations, ENCODING).plan
+
+    patched_file = work_dir / "patched.exe"
+    shutil.copy(image_path, patched_file)
+    with patched_file.open("r+b") as file:
+        plan.apply(file)
+
+
+def run_stages(image_path: str | Path, *, repeat: int = 3, scan: str = "exhaustive") -> dict[str, list[float]]:
+    """
+    Time every stage on the image
+
+    :param image_path: path to the PE file
+    :param repeat: number of runs of every stage
+    :param scan: scan mode of the cross-references search
+    :return: durations of the runs of every stage in seconds
+    """
+    image_path = Path(image_path)
+    results: dict[str, list[float]] = {}
+    with image_path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        code_section = find_code_sections(pe)[0]
+        data_sections = find_data_sections(pe)
+
+        results["extract_strings"], strings = _time_runs(
+            lambda: list(
+                chain.from_iterable(
+                    extract_strings_from_raw_bytes(section.content, Rva(section.virtual_address), encoding=ENCODING)
+                    for section in data_sections
+                )
+            ),
+            repeat,
+        )
+
+        results["find_relative_cross_references"], cross_references = _time_runs(
+            lambda: find_relative_cross_references(
+                code_section.content,
+                Rva(code_section.virtual_address),
+                (item.address for item in strings),
+                scan=scan,
+            ),
+            repeat,
+        )
+
+        results["extract_subroutines"], subroutines = _time_runs(
+            lambda: extract_subroutine_index(code_section.content, base_offset=code_section.virtual_address),
+            repeat,
+        )
+
+        analysis = Analysis(strings, cross_references, subroutines)
+        results["grouping"], _ = _time_runs(lambda: group_strings_by_subroutines(analysis, pe.image_base), repeat)
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            results["patch_writing"], _ = _time_runs(
+                lambda: _patch_copy(pe, image_path, analysis, Path(work_dir)),
+                repeat,
+            )
+
+    return results
@@ -0,0 +1,309 @@
+"""
+Generator of synthetic PE32+ images for the benchmarks.
+
+The image imitates the layout of the game's executable:
+    .text   functions with RIP-relative LEA references to the strings, random filler instructions
+            (which give false references like the real code does), CC padding between the functions
+    .rdata  pool of null-terminated strings aligned to 4 bytes
+    .data   tables of absolute pointers to the strings and some more strings
+    .pdata  exception directory with the boundaries of the functions
+    .reloc  base relocations of the pointer tables
+
+A part of the references is followed by bytes which form a second reference overlapping the first one
+(a collision of the references, see find_intersected_cross_references).
+"""
+
+import random
+import struct
+from pathlib import Path
+from typing import NamedTuple
+
+IMAGE_BASE = 0x140000000
+SECTION_ALIGNMENT = 0x1000
+FILE_ALIGNMENT = 0x200
+HEADERS_SIZE = 0x400
+MB = 0x100000
+
+IMAGE_SCN_CODE = 0x60000020  # code, execute, read
+IMAGE_SCN_RDATA = 0x40000040  # initialized data, read
+IMAGE_SCN_DATA = 0xC0000040  # initialized data, read, write
+IMAGE_SCN_RELOC = 0x42000040  # initialized data, discardable, read
+
+IMAGE_REL_BASED_DIR64 = 10
+REFERENCE_SIZE = 4
+
+_VOCABULARY = (
+    "dwarf fortress goblin elf human kobold unit report sheet popup world stone wood iron steel copper "
+    "mason carpenter miner farmer fisher hunter trader noble mayor baron duke king queen cave river "
+    "mountain forest desert ocean lake swamp beast creature artifact weapon armor shield helm boots "
+    "gloves cloak barrel bin bag rope chain door bed table chair statue coffin cabinet workshop "
+    "{0} has been struck down %s of the %d in %d days the a an is was will be not"
+)
+_WORDS = _VOCABULARY.split()
+
+_LEA_PREFIXES = (b"\x48\x8d\x05", b"\x48\x8d\x0d", b"\x48\x8d\x15", b"\x4c\x8d\x05")  # lea rax/rcx/rdx/r8, [rip+x]
+_PROLOGUE = b"\x48\x83\xec\x28"  # sub rsp, 28h
+_EPILOGUE = b"\x48\x83\xc4\x28\xc3"  # add rsp, 28h; ret
+_CALL = b"\xe8"
+_MOV_IMM = b"\xb9"  # mov ecx, imm32
+
+
+def align(value: int, alignment: int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+class SyntheticPeParameters(NamedTuple):
+    size: int = 4 * MB  # approximate size of the image
+    code_share: float = 0.55  # share of the code section in the image
+    data_share: float = 0.1  # share of the .data section (pointer tables and strings), the rest is .rdata
+    references_per_string: float = 1.5
+    collision_rate: float = 0.01  # share of the references followed by an overlapping reference
+    leaf_share: float = 0.0  # share of the functions without entries in .pdata, like leaf functions
+    seed: int = 0
+
+
+class SyntheticPeInfo(NamedTuple):
+    size: int
+    strings: int
+    references: int
+    pointers: int
+    collisions: int
+    functions: int
+
+
+class _Section(NamedTuple):
+    name: bytes
+    virtual_address: int
+    data: bytes
+    characteristics: int
+
+
+def _make_strings(rnd: random.Random, size: int, base_address: int) -> tuple[bytearray, list[int]]:
+    """
+    :return: section data and addresses of the strings
+    """
+    data = bytearray()
+    addresses = []
+    while len(data) < size:
+        addresses.append(base_address + len(data))
+        string = " ".join(rnd.choices(_WORDS, k=rnd.randint(1, 8)))
+        data += string.encode("ascii") + b"\0"
+        data += bytes(-len(data) % 4)
+
+    return data, addresses
+
+
+def _collision_tail(rnd: random.Random, position: int, displacement: int, by_low_byte: dict[int, list[int]]) -> bytes:
+    """
+    Bytes to put after a reference at the position to make a second reference 3 bytes after the first one:
+    the second reference consists of the highest byte of the first displacement and the three bytes returned.
+    """
+    high_byte = displacement >> 24 & 0xFF
+    candidates = by_low_byte.get((position + 3 + REFERENCE_SIZE + high_byte) & 0xFF)
+    if not candidates:
+        return b""
+
+    target = rnd.choice(candidates)
+    value = target - (position + 3 + REFERENCE_SIZE)
+    if not -(1 << 31) <= value < 1 << 31:
+        return b""
+
+    return (value & 0xFFFFFFFF).to_bytes(4, "little")[1:]
+
+
+def _make_code(
+    rnd: random.Random,
+    size: int,
+    base_address: int,
+    targets: list[int],
+    parameters: SyntheticPeParameters,
+) -> tuple[bytearray, list[tuple[int, int]], int, int]:
+    """
+    :return: section data, boundaries of the functions, number of the references and the collisions
+    """
+    by_low_byte: dict[int, list[int]] = {}
+    for target in targets:
+        by_low_byte.setdefault(target & 0xFF, []).append(target)
+
+    code = bytearray()
+    functions = []
+    references = 0
+    collisions = 0
+    references_count = int(len(targets) * parameters.references_per_string)
+    while len(code) < size - 0x100:
+        start = len(code)
+        code += _PROLOGUE
+        for _ in range(rnd.randint(1, 6)):
+            if rnd.random() < 0.5:  # noqa: PLR2004
+                code += _MOV_IMM + rnd.getrandbits(32).to_bytes(4, "little")
+
+            if references < references_count:
+                collision = rnd.random() < parameters.collision_rate
+                if collision:
+                    # the second reference is 4-aligned only if the first one is at 1 modulo 4
+                    code += b"\x90" * ((1 - (base_address + len(code) + 3)) % 4)
+
+                code += rnd.choice(_LEA_PREFIXES)
+                position = base_address + len(code)
+                displacement = rnd.choice(targets) - (position + REFERENCE_SIZE)
+                code += (displacement & 0xFFFFFFFF).to_bytes(4, "little")
+                references += 1
+                tail = _collision_tail(rnd, position, displacement, by_low_byte) if collision else b""
+                if tail:
+                    code += tail
+                    references += 1
+                    collisions += 1
+
+            code += _CALL + rnd.getrandbits(32).to_bytes(4, "little")
+
+        code += _EPILOGUE
+        functions.append((base_address + start, base_address + len(code)))
+        code += b"\xcc" * (-len(code) % 16 or 16)
+
+    return code, functions, references, collisions
+
+
+def _make_relocations(pointers: list[int]) -> bytearray:
+    pages: dict[int, list[int]] = {}
+    for rva in pointers:
+        pages.setdefault(rva & ~0xFFF, []).append(IMAGE_REL_BASED_DIR64 << 12 | rva & 0xFFF)
+
+    data = bytearray()
+    for page, entries in sorted(pages.items()):
+        if len(entries) % 2:
+            entries.append(0)  # padding entry
+        data += struct.pack(f"<II{len(entries)}H", page, 8 + 2 * len(entries), *entries)
+
+    return data
+
+
+def _write_image(path: Path, sections: list[_Section], data_directories: dict[int, tuple[int, int]]) -> int:
+    raw_address = HEADERS_SIZE
+    section_headers = bytearray()
+    for section in sections:
+        raw_size = align(len(section.data), FILE_ALIGNMENT)
+        section_headers += struct.pack(
+            "<8sIIIIIIHHI",
+            section.name,
+            len(section.data),
+            section.virtual_address,
+            raw_size,
+            raw_address,
+            0,
+            0,
+            0,
+            0,
+            section.characteristics,
+        )
+        raw_address += raw_size
+
+    last = sections[-1]
+    size_of_image = align(last.virtual_address + len(last.data), SECTION_ALIGNMENT)
+    directories = [data_directories.get(index, (0, 0)) for index in range(16)]
+    optional_header = struct.pack(
+        "<HBBIIIIIQIIHHHHHHIIIIHHQQQQII",
+        0x20B,  # PE32+
+        14,
+        0,
+        len(sections[0].data),
+        0,
+        0,
+        sections[0].virtual_address,  # entry point
+        sections[0].virtual_address,
+        IMAGE_BASE,
+        SECTION_ALIGNMENT,
+        FILE_ALIGNMENT,
+        6,
+        0,
+        0,
+        0,
+        6,
+        0,
+        0,
+        size_of_image,
+        HEADERS_SIZE,
+        0,
+        3,  # console subsystem
+        0x8160,
+        0x100000,
+        0x1000,
+        0x100000,
+        0x1000,
+        0,
+        len(directories),
+    ) + b"".join(struct.pack("<II", *directory) for directory in directories)
+    coff_header = struct.pack("<HHIIIHH", 0x8664, len(sections), 0, 0, 0, len(optional_header), 0x22)
+
+    dos_header = bytearray(0x80)
+    dos_header[:2] = b"MZ"
+    struct.pack_into("<I", dos_header, 0x3C, len(dos_header))
+    headers = bytes(dos_header) + b"PE\0\0" + coff_header + optional_header + section_headers
+
+    with path.open("wb") as file:
+        file.write(headers.ljust(HEADERS_SIZE, b"\0"))
+        for section in sections:
+            file.write(section.data.ljust(align(len(section.data), FILE_ALIGNMENT), b"\0"))
+
+    return raw_address
+
+
+def generate_pe(path: str | Path, parameters: SyntheticPeParameters | None = None) -> SyntheticPeInfo:
+    """
+    Generate a synthetic PE32+ image
+
+    :param path: path of the file to write
+    :param parameters: parameters of the image, default parameters are used if None
+    :return: SyntheticPeInfo
+    """
+    if parameters is None:
+        parameters = SyntheticPeParameters()
+
+    rnd = random.Random(parameters.seed)  # noqa: S311
+    code_size = int(parameters.size * parameters.code_share)
+    data_size = int(parameters.size * parameters.data_share)
+    rdata_size = parameters.size - code_size - data_size
+
+    text_rva = SECTION_ALIGNMENT
+    rdata_rva = text_rva + align(code_size, SECTION_ALIGNMENT)
+    rdata, rdata_strings = _make_strings(rnd, rdata_size, rdata_rva)
+
+    # .data: a table of pointers to the strings of .rdata, then strings
+    data_rva = rdata_rva + align(len(rdata), SECTION_ALIGNMENT)
+    pointed = rnd.sample(rdata_strings, min(len(rdata_strings), data_size // 2 // 8))
+    pointers = [data_rva + index * 8 for index in range(len(pointed))]
+    data = bytearray(struct.pack(f"<{len(pointed)}Q", *(IMAGE_BASE + address for address in pointed)))
+    strings, data_strings = _make_strings(rnd, data_size - len(data), data_rva + len(data))
+    data += strings
+
+    code, functions, references, collisions = _make_code(
+        rnd, code_size, text_rva, rdata_strings + data_strings, parameters
+    )
+
+    pdata_rva = data_rva + align(len(data), SECTION_ALIGNMENT)
+    unwind_info = rdata_rva  # the unwind info is not parsed, any address will do
+    leaf_rnd = random.Random(parameters.seed)  # noqa: S311  # separate, so the rest of the image doesn't depend on it
+    pdata = b"".join(
+        struct.pack("<III", start, end, unwind_info)
+        for start, end in functions
+        if not parameters.leaf_share or leaf_rnd.random() >= parameters.leaf_share
+    )
+
+    reloc_rva = pdata_rva + align(len(pdata), SECTION_ALIGNMENT)
+    reloc = _make_relocations(pointers)
+
+    sections = [
+        _Section(b".text", text_rva, bytes(code), IMAGE_SCN_CODE),
+        _Section(b".rdata", rdata_rva, bytes(rdata), IMAGE_SCN_RDATA),
+        _Section(b".data", data_rva, bytes(data), IMAGE_SCN_DATA),
+        _Section(b".pdata", pdata_rva, pdata, IMAGE_SCN_RDATA),
+        _Section(b".reloc", reloc_rva, bytes(reloc), IMAGE_SCN_RELOC),
+    ]
+    size = _write_image(Path(path), sections, {3: (pdata_rva, len(pdata)), 5: (reloc_rva, len(reloc))})
+    return SyntheticPeInfo(
+        size=size,
+        strings=len(rdata_strings) + len(data_strings),
+        references=references,
+        pointers=len(pointers),
+        collisions=collisions,
+        functions=len(functions),
+    )
@@ -0,0 +1,3 @@
+from dfint64_patch.cli import main
+
+main()
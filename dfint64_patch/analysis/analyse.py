@@ -0,0 +1,256 @@
+"""
+Analysis of an executable shared by all the tools: strings of the data section,
+their cross-references from the code section and subroutines of the code section.
+"""
+
+from bisect import bisect_right
+from collections.abc import Iterable, Mapping, Sequence
+from itertools import chain
+from typing import TYPE_CHECKING, NamedTuple
+
+from loguru import logger
+
+from dfint64_patch.cross_references.address_index import AddressIndex
+from dfint64_patch.cross_references.cross_reference_table import CrossReferenceTable
+from dfint64_patch.cross_references.cross_references_absolute import find_absolute_cross_references
+from dfint64_patch.cross_references.cross_references_relative import find_relative_cross_references
+from dfint64_patch.extract_strings.from_raw_bytes import ExtractedStringInfo, extract_strings_from_raw_bytes
+from dfint64_patch.extract_subroutines.from_exception_directory import extract_subroutines_from_exception_directory
+from dfint64_patch.extract_subroutines.from_raw_bytes import SubroutineIndex, extract_subroutine_index
+from dfint64_patch.metrics import count, stage, track_progress
+from dfint64_patch.pe.image import PeImage, SectionView
+from dfint64_patch.pe.sections import find_code_sections, find_data_sections
+from dfint64_patch.type_aliases import Rva
+
+if TYPE_CHECKING:
+    from dfint64_patch.analysis.cache import AnalysisCache
+
+
+SUBROUTINES_SOURCES = ("auto", "pdata", "padding")
+
+
+class AnalysisParameters(NamedTuple):
+    alignment: int = 4
+    encoding: str = "cp437"
+    code_section: int | None = None  # index of the code section, by default found by the section characteristics
+    data_section: int | None = None  # index of the data section, by default all data sections are analysed
+    subroutines: str | None = "auto"  # one of SUBROUTINES_SOURCES (see extract_pe_subroutines), None to skip them
+    scan: str = "exhaustive"  # one of SCAN_MODES, see find_relative_cross_references
+    absolute_references: bool = True  # also find absolute pointers listed in the base relocation table
+
+
+class Analysis(NamedTuple):
+    """
+    Results of the analysis, all addresses are RVA (i.e. without the image base).
+    The subroutines are empty if the analysis was done with AnalysisParameters.subroutines set to None.
+    """
+
+    strings: Sequence[ExtractedStringInfo]
+    cross_references: Mapping[Rva, list[Rva]]
+    subroutines: SubroutineIndex
+
+
+def extract_pe_subroutines(pe: PeImage, code_sections: Sequence[SectionView], source: str = "auto") -> SubroutineIndex:
+    """
+    Find subroutines of the code sections
+
+    :param pe: PE image
+    :param code_sections: the code sections ordered by address
+    :param source: "pdata" - read exact boundaries of the functions from the exception directory only,
+                   "padding" - split the code sections by runs of the int3 padding bytes,
+                   "auto" - use the exception directory if the file has it and split the code between its functions
+                   by the padding (leaf functions have no entries in the directory), otherwise only the padding
+    :return: SubroutineIndex
+    """
+    if source not in SUBROUTINES_SOURCES:
+        msg = f"Unknown subroutines source: {source!r}, expected one of {SUBROUTINES_SOURCES}"
+        raise ValueError(msg)
+
+    from_padding = SubroutineIndex()
+    if source != "pdata":
+        for section in code_sections:
+            index = extract_subroutine_index(section.content, base_offset=section.virtual_address)
+            from_padding.starts.extend(index.starts)
+            from_padding.ends.extend(index.ends)
+
+    if source != "padding":
+        subroutines = extract_subroutines_from_exception_directory(pe)
+        if subroutines is not None:
+            return subroutines if source == "pdata" else fill_subroutine_gaps(subroutines, from_padding)
+
+        if source == "pdata":
+            msg = "The file has no exception directory"
+            raise ValueError(msg)
+
+        logger.info("No exception directory, subroutines are searched by padding")
+
+    return from_padding
+
+
+def fill_subroutine_gaps(functions: SubroutineIndex, from_padding: SubroutineIndex) -> SubroutineIndex:
+    """
+    Add the parts of the subroutines found by the padding which are not covered by the functions
+    of the exception directory (e.g. leaf functions, which have no entries in the directory)
+
+    :param functions: non-overlapping subroutines from the exception directory
+    :param from_padding: subroutines found by the padding
+    :return: SubroutineIndex with the functions and the gaps between them
+    """
+    gaps = []
+    for subroutine_start, end in from_padding:
+        start = subroutine_start
+        index = bisect_right(functions.ends, start)  # the first function which ends after the start
+        while start < end:
+            if index < len(functions) and functions.starts[index] < end:
+                if functions.starts[index] > start:
+                    gaps.append((start, functions.starts[index]))
+                start = max(start, functions.ends[index])
+                index += 1
+            else:
+                gaps.append((start, end))
+                break
+
+    if not gaps:
+        return functions
+
+    logger.info(f"{len(gaps)} subroutines without entries in the exception directory are found by the padding")
+    return SubroutineIndex.from_subroutines(sorted(chain(functions, gaps)))
+
+
+def select_sections(pe: PeImage, parameters: AnalysisParameters) -> tuple[list[SectionView], list[SectionView]]:
+    """
+    Select the code and the data sections to analyse
+
+    :param pe: PE image
+    :param parameters: parameters of the analysis
+    :return: code sections and data sections ordered by address
+    """
+    if parameters.code_section is not None:
+        code_sections = [pe.sections[parameters.code_section]]
+    else:
+        code_sections = find_code_sections(pe)
+
+    if parameters.data_section is not None:
+        data_sections = [pe.sections[parameters.data_section]]
+    else:
+        data_sections = find_data_sections(pe)
+
+    if not code_sections or not data_sections:
+        msg = "No code or data sections found"
+        raise ValueError(msg)
+
+    return code_sections, data_sections
+
+
+def find_sections_cross_references(
+    code_sections: Sequence[SectionView],
+    addresses: Iterable[Rva],
+    *,
+    workers: int = 1,
+    scan: str = "exhaustive",
+) -> CrossReferenceTable:
+    """
+    Search cross-references from the code sections to the strings of the data sections.
+    The addresses of all the data sections are put in one index, so every code section is scanned once
+    (by shards in several processes, see find_relative_cross_references). The results are merged into one table.
+
+    :param code_sections: code sections to scan
+    :param addresses: addresses of the objects of the data sections
+    :param workers: number of processes
+    :param scan: scan mode, see find_relative_cross_references
+    :return: CrossReferenceTable
+    """
+    index = AddressIndex(addresses)
+    return CrossReferenceTable.merge(
+        *(
+            find_relative_cross_references(
+                code_section.content,
+                base_address=Rva(code_section.virtual_address),
+                addresses=index,
+                workers=workers,
+                scan=scan,
+            )
+            for code_section in code_sections
+        )
+    )
+
+
+def analyse_pe_image(
+    pe: PeImage,
+    parameters: AnalysisParameters | None = None,
+    *,
+    workers: int = 1,
+    cache: "AnalysisCache | None" = None,
+) -> Analysis:
+    """
+    Analyse the executable or load results of a previous analysis from the cache.
+    The subroutines and the absolute references are only computed if the parameters ask for them,
+    so the tools which don't use them should turn them off (the parameters are a part of the cache key).
+
+    :param pe: PE image
+    :param parameters: parameters of the analysis, default parameters (the full analysis) are used if None
+    :param workers: number of processes to search cross-references
+    :param cache: analysis cache, if None then the cache is not used
+    :return: Analysis
+    """
+    if parameters is None:
+        parameters = AnalysisParameters()
+
+    if cache is not None:
+        with stage("analysis_cache_load"):
+            key = cache.key(pe.data, parameters)
+            analysis = cache.load(key)
+
+        if analysis is not None:
+            logger.info("Analysis results are loaded from the cache")
+            count("analysis_cache_hits")
+            return analysis
+
+    code_sections, data_sections = select_sections(pe, parameters)
+    logger.info(f"Code sections: {', '.join(section.name for section in code_sections)}")
+    logger.info(f"Data sections: {', '.join(section.name for section in data_sections)}")
+
+    logger.info("Extracting strings...")
+    data_size = sum(len(section.content) for section in data_sections)
+    progress = track_progress("extract_strings", data_size)
+    with stage("extract_strings", size=data_size) as stage_metrics:
+        strings: list[ExtractedStringInfo] = []
+        for section in data_sections:
+            strings.extend(
+                extract_strings_from_raw_bytes(
+                    section.content,
+                    base_address=Rva(section.virtual_address),
+                    alignment=parameters.alignment,
+                    encoding=parameters.encoding,
+                )
+            )
+            progress.advance(len(section.content))
+
+        stage_metrics.items = len(strings)
+
+    logger.info(f"Found {len(strings)} string-like objects")
+
+    logger.info("Searching for cross references...")
+    cross_references = find_sections_cross_references(
+        code_sections, (item.address for item in strings), workers=workers, scan=parameters.scan
+    )
+    if parameters.absolute_references:
+        with stage("find_absolute_cross_references") as stage_metrics:
+            absolute_references = find_absolute_cross_references(pe, (item.address for item in strings))
+            stage_metrics.items = absolute_references.references_count
+
+        logger.info(f"Found {absolute_references.references_count} absolute references in the relocation table")
+        cross_references = CrossReferenceTable.merge(cross_references, absolute_references)
+
+    subroutines = SubroutineIndex()
+    if parameters.subroutines is not None:
+        code_size = sum(len(section.content) for section in code_sections)
+        with stage("extract_subroutines", size=code_size) as stage_metrics:
+            subroutines = extract_pe_subroutines(pe, code_sections, parameters.subroutines)
+            stage_metrics.items = len(subroutines)
+
+    analysis = Analysis(strings, cross_references, subroutines)
+    if cache is not None:
+        cache.store(key, analysis)
+
+    return analysis
@@ -0,0 +1,271 @@
+"""
+Persistent on-disk cache of the analysis results.
+
+Entries are keyed by the hash of the executable's contents and the analysis parameters.
+Every entry is a single binary file with a fixed header followed by arrays of 64-bit integers (in the native byte order)
+and a blob of UTF-8 encoded strings. Reading an entry copies every array and the blob out of the memory-mapped file
+with a single copy each, without converting the items to Python objects; the strings are decoded on access.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Iterator, Sequence
+from contextlib import suppress
+from itertools import accumulate, chain
+from pathlib import Path
+from typing import IO, overload
+
+from loguru import logger
+
+from dfint64_patch.analysis.analyse import Analysis, AnalysisParameters
+from dfint64_patch.cross_references.cross_reference_table import CrossReferenceTable
+from dfint64_patch.extract_strings.from_raw_bytes import ExtractedStringInfo
+from dfint64_patch.extract_subroutines.from_raw_bytes import SubroutineIndex
+from dfint64_patch.type_aliases import Rva
+
+CACHE_FORMAT_VERSION = 2  # 2: "auto" subroutines include the gaps of the exception directory
+CACHE_FILE_SUFFIX = ".analysis"
+DEFAULT_MAX_CACHE_SIZE = 512 * 1024 * 1024
+
+_MAGIC = b"DF64ANL\0"
+
+# magic, format version, number of strings, of referenced objects, of references, of subroutines, size of string blob
+_HEADER = struct.Struct("<8sQQQQQQ")
+_ITEM_SIZE = array("Q").itemsize
+
+
+def default_cache_dir() -> Path:
+    if "DFINT64_PATCH_CACHE_DIR" in os.environ:
+        return Path(os.environ["DFINT64_PATCH_CACHE_DIR"])
+
+    if sys.platform == "win32" and "LOCALAPPDATA" in os.environ:
+        return Path(os.environ["LOCALAPPDATA"]) / "dfint64_patch" / "cache"
+
+    return Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "dfint64_patch"
+
+
+def write_analysis(analysis: Analysis, file_object: IO[bytes]) -> None:
+    """
+    Write analysis results in the binary cache format
+    """
+    encoded_strings = [item.string.encode("utf-8") for item in analysis.strings]
+    string_offsets = array("Q", accumulate(map(len, encoded_strings), initial=0))
+    destinations = sorted(analysis.cross_references)
+    reference_offsets = array(
+        "Q", accumulate((len(analysis.cross_references[destination]) for destination in destinations), initial=0)
+    )
+
+    file_object.write(
+        _HEADER.pack(
+            _MAGIC,
+            CACHE_FORMAT_VERSION,
+            len(analysis.strings),
+            len(destinations),
+            reference_offsets[-1],
+            len(analysis.subroutines),
+            string_offsets[-1],
+        )
+    )
+
+    arrays = [
+        array("Q", (item.address for item in analysis.strings)),
+        string_offsets,
+        array("Q", destinations),
+        reference_offsets,
+        array("Q", chain.from_iterable(analysis.cross_references[destination] for destination in destinations)),
+        analysis.subroutines.starts,
+        analysis.subroutines.ends,
+    ]
+    for items in arrays:
+        items.tofile(file_object)
+
+    file_object.writelines(encoded_strings)
+
+
+class CachedStrings(Sequence[ExtractedStringInfo]):
+    """
+    Strings read from a cache entry: their addresses, offsets in the blob and the blob of UTF-8 encoded strings.
+    A string is decoded only when it is accessed.
+    """
+
+    __slots__ = ("addresses", "blob", "offsets")
+
+    def __init__(self, addresses: array, offsets: array, blob: bytes) -> None:
+        """
+        :param addresses: addresses of the strings
+        :param offsets: start of every string in the blob plus the size of the blob at the end
+        :param blob: the strings encoded in UTF-8
+        """
+        if len(offsets) != len(addresses) + 1:
+            msg = "Offsets don't match addresses"
+            raise ValueError(msg)
+
+        self.addresses = addresses
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    @overload
+    def __getitem__(self, item: int) -> ExtractedStringInfo: ...
+
+    @overload
+    def __getitem__(self, item: slice) -> list[ExtractedStringInfo]: ...
+
+    def __getitem__(self, item: int | slice) -> ExtractedStringInfo | list[ExtractedStringInfo]:
+        if isinstance(item, slice):
+            return [self[index] for index in range(*item.indices(len(self)))]
+
+        if item < 0:
+            item += len(self)
+        address = self.addresses[item]  # raises IndexError
+        string = self.blob[self.offsets[item] : self.offsets[item + 1]].decode("utf-8")
+        return ExtractedStringInfo(Rva(address), string)
+
+    def __iter__(self) -> Iterator[ExtractedStringInfo]:
+        blob = self.blob
+        offsets = self.offsets
+        for index, address in enumerate(self.addresses):
+            yield ExtractedStringInfo(Rva(address), blob[offsets[index] : offsets[index + 1]].decode("utf-8"))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CachedStrings):
+            return (self.addresses, self.offsets, self.blob) == (other.addresses, other.offsets, other.blob)
+        if isinstance(other, Sequence):
+            return len(self) == len(other) and all(map(ExtractedStringInfo.__eq__, self, other))
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(strings={len(self)}, size={len(self.blob)})"
+
+
+def read_analysis(buffer: bytes | memoryview | mmap.mmap) -> Analysis:
+    """
+    Read analysis results from a buffer (e.g. a memory-mapped file) in the binary cache format.
+    Every array is copied from the buffer at once, the strings are decoded on access (see CachedStrings).
+    """
+    magic, version, strings_count, destinations_count, references_count, subroutines_count, blob_size = (
+        _HEADER.unpack_from(buffer)
+    )
+    if magic != _MAGIC or version != CACHE_FORMAT_VERSION:
+        msg = "Unsupported cache file format"
+        raise ValueError(msg)
+
+    # type codes of the arrays: the file stores unsigned integers, the cross-reference table uses signed ones
+    layout = [
+        ("Q", strings_count),
+        ("Q", strings_count + 1),
+        ("q", destinations_count),
+        ("q", destinations_count + 1),
+        ("q", references_count),
+        ("Q", subroutines_count),
+        ("Q", subroutines_count),
+    ]
+    blob_start = _HEADER.size + sum(count for _, count in layout) * _ITEM_SIZE
+    if len(buffer) != blob_start + blob_size:
+        msg = "Cache file is truncated"
+        raise ValueError(msg)
+
+    arrays: list[array] = []
+    with memoryview(buffer) as view:
+        position = _HEADER.size
+        for typecode, count in layout:
+            items = array(typecode)
+            with view[position : position + count * _ITEM_SIZE] as part:
+                items.frombytes(part)
+            arrays.append(items)
+            position += count * _ITEM_SIZE
+
+        with view[blob_start:] as blob_view:
+            blob = bytes(blob_view)
+
+    addresses, string_offsets, destinations, reference_offsets, sources, starts, ends = arrays
+
+    return Analysis(
+        CachedStrings(addresses, string_offsets, blob),
+        CrossReferenceTable(destinations, reference_offsets, sources),
+        SubroutineIndex(starts, ends),
+    )
+
+
+class AnalysisCache:
+    """
+    Directory with cached analysis results. When the total size of the entries exceeds the limit,
+    the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir: str | Path | None = None, max_size: int = DEFAULT_MAX_CACHE_SIZE) -> None:
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else default_cache_dir()
+        self.max_size = max_size
+
+    @staticmethod
+    def key(data: bytes | memoryview, parameters: AnalysisParameters) -> str:
+        """
+        Calculate cache key from the contents of an executable and the analysis parameters
+        """
+        file_hash = hashlib.sha256(data).hexdigest()
+        return hashlib.sha256(f"{CACHE_FORMAT_VERSION}:{file_hash}:{tuple(parameters)!r}".encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / (key + CACHE_FILE_SUFFIX)
+
+    def load(self, key: str) -> Analysis | None:
+        path = self._path(key)
+        try:
+            with path.open("rb") as file_object, mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                analysis = read_analysis(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error) as ex:
+            logger.warning(f"Failed to read cache entry {path}: {ex}")
+            path.unlink(missing_ok=True)
+            return None
+
+        path.touch()  # mark the entry as recently used
+        return analysis
+
+    def store(self, key: str, analysis: Analysis) -> None:
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            file_object = tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False)  # noqa: SIM115
+        except OSError as ex:
+            logger.warning(f"Failed to create cache entry: {ex}")
+            return
+
+        temp_path = Path(file_object.name)
+        try:
+            with file_object:
+                write_analysis(analysis, file_object)
+
+            temp_path.replace(self._path(key))
+        except OSError as ex:
+            logger.warning(f"Failed to store analysis results to cache: {ex}")
+            temp_path.unlink(missing_ok=True)
+            return
+
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries if the total size of the cache exceeds the limit
+        """
+        entries = []
+        for path in self.cache_dir.glob("*" + CACHE_FILE_SUFFIX):
+            with suppress(OSError):
+                entries.append((path.stat(), path))
+
+        total_size = 0
+        for stat, path in sorted(entries, key=lambda entry: entry[0].st_mtime, reverse=True):
+            total_size += stat.st_size
+            if total_size > self.max_size:
+                logger.info(f"Removing old cache entry {path}")
+                with suppress(OSError):
+                    path.unlink()
@@ -0,0 +1,98 @@
+"""
+Single entry point for all the commands: `dfint64 <command> ...`.
+
+Modules of the commands are imported only when a command is run, so `dfint64 --help` and every command
+don't pay for the imports (numpy, omegaconf, the analysis) of the other commands.
+"""
+
+import importlib
+from collections.abc import Sequence
+from typing import Any, NamedTuple
+
+import click
+
+
+class LazyCommand(NamedTuple):
+    import_path: str  # "module:attribute"
+    help: str  # shown in `dfint64 --help` without importing the module
+    config: bool = False  # the command is a with_config function (key=value arguments), not a click command
+
+
+COMMANDS = {
+    "extract": LazyCommand(
+        "dfint64_patch.extract_strings.cli:main",
+        "Extract strings referenced from the code",
+        config=True,
+    ),
+    "extract-subs": LazyCommand(
+        "dfint64_patch.strings_context.extract_strings_with_subs:main",
+        "Extract strings grouped by the subroutines which reference them",
+        config=True,
+    ),
+    "patch": LazyCommand("dfint64_patch.patching.cli:main", "Patch an executable with a dictionary"),
+    "compile-dict": LazyCommand(
+        "dfint64_patch.dictionary_loaders.compile_dict:main",
+        "Compile a csv dictionary to a binary dictionary",
+    ),
+    "apply-delta": LazyCommand("dfint64_patch.patching.apply_delta:main", "Apply a delta file to an executable"),
+    "serve": LazyCommand("dfint64_patch.service.cli:main", "Serve requests to the analysis of an executable"),
+}
+
+
+def _config_command(name: str, function: Any, help_text: str) -> click.Command:  # noqa: ANN401
+    @click.command(
+        name,
+        help=f"{help_text}.\n\nARGS are key=value pairs, they override the values of the config file.",
+        context_settings={"ignore_unknown_options": True},
+    )
+    @click.argument("args", nargs=-1, type=click.UNPROCESSED)
+    def command(args: Sequence[str]) -> None:
+        function(list(args))
+
+    return command
+
+
+class LazyGroup(click.Group):
+    def __init__(self, *args: Any, lazy_commands: dict[str, LazyCommand], **kwargs: Any) -> None:  # noqa: ANN401
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted({*super().list_commands(ctx), *self.lazy_commands})
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        lazy_command = self.lazy_commands.get(cmd_name)
+        if lazy_command is None:
+            return super().get_command(ctx, cmd_name)
+
+        module_name, attribute = lazy_command.import_path.split(":")
+        function = getattr(importlib.import_module(module_name), attribute)
+        if lazy_command.config:
+            return _config_command(cmd_name, function, lazy_command.help)
+
+        return function
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        # Same as click.Group.format_commands, but the help of the lazy commands is taken without importing them
+        rows = [
+            (name, self.lazy_commands[name].help if name in self.lazy_commands else self._short_help(ctx, name))
+            for name in self.list_commands(ctx)
+        ]
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
+    def _short_help(self, ctx: click.Context, name: str) -> str:
+        command = super().get_command(ctx, name)
+        return command.get_short_help_str() if command is not None else ""
+
+
+@click.group(cls=LazyGroup, lazy_commands=COMMANDS)
+def main() -> None:
+    """
+    Text patcher for x64 bit version of the Dwarf Fortress game
+    """
+
+
+if __name__ == "__main__":
+    main()
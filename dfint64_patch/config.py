@@ -1,6 +1,6 @@
 import functools
 from collections.abc import Callable
-from typing import TypeVar
+from typing import Protocol, TypeVar
 
 from loguru import logger
 from omegaconf import DictConfig, OmegaConf
@@ -8,7 +8,11 @@ from omegaconf import DictConfig, OmegaConf
 T = TypeVar("T", bound=DictConfig)
 
 
-def with_config(config_class: type[T], *config_files: str) -> Callable[[Callable[[T], None]], Callable[[], None]]:
+class ConfigCommand(Protocol):
+    def __call__(self, args: list[str] | None = None) -> None: ...
+
+
+def with_config(config_class: type[T], *config_files: str) -> Callable[[Callable[[T], None]], ConfigCommand]:
     """
     A decorator to load the config file and merge it with the CLI options.
 
@@ -16,11 +20,12 @@ def with_config(config_class: type[T], *config_files: str) -> Callable[[Callable
         Should be inherited from `omegaconf.DictConfig`.
     :param config_files: Names of configs. The closer a file is to the end of the list, the higher its priority.
         Default config should be the first in the list. CLI options have the highest priority.
+        The decorated function takes the CLI options as a list of `key=value` strings, by default `sys.argv[1:]`.
     """
 
-    def decorator(func: Callable[[T], None]) -> Callable[[], None]:
+    def decorator(func: Callable[[T], None]) -> ConfigCommand:
         @functools.wraps(func)
-        def wrapper() -> None:
+        def wrapper(args: list[str] | None = None) -> None:
             config = OmegaConf.structured(config_class)
 
             for config_file in config_files:
@@ -29,7 +34,7 @@ def with_config(config_class: type[T], *config_files: str) -> Callable[[Callable
                 except FileNotFoundError:  # noqa: PERF203
                     logger.info(f"Config {config_file} not found")
 
-            config.merge_with(OmegaConf.from_cli())
+            config.merge_with(OmegaConf.from_cli(args))
 
             missing = ", ".join(OmegaConf.missing_keys(config))
             if missing:
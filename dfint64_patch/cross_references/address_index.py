@@ -0,0 +1,79 @@
+from collections.abc import Iterable, Iterator
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+
+class AddressIndex:
+    """
+    A compact set of addresses with a fast membership check.
+    Addresses are stored as a bitset keyed by an offset from the lowest address, so the check is a range check
+    plus a single bit lookup, and the index takes one bit per byte of the covered address range
+    (e.g. 1 MB for an 8 MB data section), regardless of the number of addresses.
+    """
+
+    __slots__ = ("_count", "bits", "start", "stop")
+
+    start: int
+    stop: int  # exclusive
+    bits: bytearray
+    _count: int
+
+    def __init__(self, addresses: Iterable[int]) -> None:
+        if np is not None:
+            self._init_vectorized(addresses)
+            return
+
+        addresses = set(addresses)
+        self._count = len(addresses)
+        self.start = min(addresses, default=0)
+        self.stop = max(addresses, default=-1) + 1
+        self.bits = bytearray((self.stop - self.start + 7) // 8)
+        for address in addresses:
+            offset = address - self.start
+            self.bits[offset >> 3] |= 1 << (offset & 7)
+
+    def _init_vectorized(self, addresses: Iterable[int]) -> None:
+        array = np.unique(np.fromiter(addresses, dtype=np.int64))
+        self._count = len(array)
+        self.start = int(array[0]) if len(array) else 0
+        self.stop = int(array[-1]) + 1 if len(array) else 0
+        flags = np.zeros(self.stop - self.start, dtype=np.bool_)
+        flags[array - self.start] = True
+        self.bits = bytearray(np.packbits(flags, bitorder="little").tobytes())
+
+    def __contains__(self, address: object) -> bool:
+        if not isinstance(address, int):
+            return False
+
+        offset = address - self.start
+        return 0 <= offset < self.stop - self.start and bool(self.bits[offset >> 3] >> (offset & 7) & 1)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[int]:
+        for byte_index, byte in enumerate(self.bits):
+            if byte:
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        yield self.start + byte_index * 8 + bit
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(start=0x{self.start:x}, stop=0x{self.stop:x}, count={self._count})"
+
+    def contains_many(self, addresses: "np.ndarray") -> "np.ndarray":
+        """
+        Vectorized membership check (requires numpy)
+
+        :param addresses: array of addresses
+        :return: boolean mask of the addresses which are in the index
+        """
+        offsets = addresses - self.start
+        mask = (offsets >= 0) & (offsets < self.stop - self.start)
+        offsets = offsets[mask]
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        mask[mask] = (bits[offsets >> 3] >> (offsets & 7)) & 1 == 1
+        return mask
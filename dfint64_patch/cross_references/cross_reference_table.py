@@ -0,0 +1,209 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator, Mapping
+from itertools import accumulate, chain, groupby
+from operator import itemgetter
+
+from dfint64_patch.type_aliases import Rva
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+
+class CrossReferenceTable(Mapping[Rva, list[Rva]]):
+    """
+    Compact read-only table of cross-references in the CSR (compressed sparse row) layout.
+    Three typed arrays are stored instead of a dict of lists: sorted unique destinations,
+    offsets of the groups of sources of every destination (one more than destinations), and the sources themselves
+    (grouped by destination, sorted within a group). Lookups are binary searches over the arrays,
+    the reverse lookup (destination by source) uses a permutation of the sources sorted by value.
+
+    The table is a Mapping of a destination to the list of its sources. Like the defaultdict(list) it replaces,
+    a missing destination has no sources (an empty list) instead of raising KeyError, but it is not in the table
+    and get() returns the default for it.
+    """
+
+    __slots__ = ("_source_order", "destinations", "offsets", "sources")
+
+    destinations: array
+    offsets: array
+    sources: array
+    _source_order: array | None
+
+    def __init__(self, destinations: array, offsets: array, sources: array) -> None:
+        """
+        :param destinations: sorted unique destination addresses
+        :param offsets: start of the sources of every destination plus the total number of sources at the end
+        :param sources: source addresses grouped by destination
+        """
+        if len(offsets) != len(destinations) + 1 or offsets[0] != 0 or offsets[-1] != len(sources):
+            msg = "Offsets don't match destinations and sources"
+            raise ValueError(msg)
+
+        self.destinations = destinations
+        self.offsets = offsets
+        self.sources = sources
+        self._source_order = None
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[tuple[int, int]]) -> "CrossReferenceTable":
+        """
+        Build a table from pairs of a destination and a source (in any order)
+        """
+        if np is not None:
+            return cls._from_pairs_vectorized(pairs)
+
+        ordered = sorted(pairs)
+        groups = [(destination, len(list(group))) for destination, group in groupby(ordered, key=itemgetter(0))]
+        return cls(
+            array("q", map(itemgetter(0), groups)),
+            array("q", accumulate(map(itemgetter(1), groups), initial=0)),
+            array("q", map(itemgetter(1), ordered)),
+        )
+
+    @classmethod
+    def _from_pairs_vectorized(cls, pairs: Iterable[tuple[int, int]]) -> "CrossReferenceTable":
+        flat = np.fromiter((value for pair in pairs for value in pair), dtype=np.int64).reshape(-1, 2)
+        return cls.from_arrays(flat[:, 0], flat[:, 1])
+
+    @classmethod
+    def from_arrays(cls, destinations: "np.ndarray", sources: "np.ndarray") -> "CrossReferenceTable":
+        """
+        Build a table from numpy arrays of destinations and sources of the references (in any order)
+        without converting them to Python objects: the references are sorted by destination and source,
+        the groups start where the sorted destinations change
+        """
+        destinations = np.asarray(destinations, dtype=np.int64)
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.lexsort((sources, destinations))
+        destinations = destinations[order]
+        sources = sources[order]
+
+        group_starts = np.ones(len(destinations), dtype=bool)
+        np.not_equal(destinations[1:], destinations[:-1], out=group_starts[1:])
+        offsets = np.append(np.flatnonzero(group_starts), len(destinations)).astype(np.int64)
+        return cls(
+            array("q", destinations[offsets[:-1]].tobytes()),
+            array("q", offsets.tobytes()),
+            array("q", sources.tobytes()),
+        )
+
+    @classmethod
+    def from_mapping(cls, cross_references: Mapping[int, Iterable[int]]) -> "CrossReferenceTable":
+        if isinstance(cross_references, CrossReferenceTable):
+            return cross_references
+
+        return cls.from_pairs(
+            (destination, source) for destination, sources in cross_references.items() for source in sources
+        )
+
+    @classmethod
+    def merge(cls, *tables: "CrossReferenceTable") -> "CrossReferenceTable":
+        """
+        Merge tables with different sources into one
+        """
+        return cls.from_pairs(chain.from_iterable(table.pairs() for table in tables))
+
+    def _find(self, destination: int) -> int:
+        """
+        :return: index of the destination or -1
+        """
+        index = bisect_left(self.destinations, destination)
+        if index < len(self.destinations) and self.destinations[index] == destination:
+            return index
+        return -1
+
+    def __getitem__(self, destination: Rva) -> list[Rva]:
+        return self.get(destination) or []
+
+    def get(self, destination: Rva, default: list[Rva] | None = None) -> list[Rva] | None:  # type: ignore[override]
+        index = self._find(destination) if isinstance(destination, int) else -1
+        if index < 0:
+            return default
+        return self.sources[self.offsets[index] : self.offsets[index + 1]].tolist()
+
+    def __contains__(self, destination: object) -> bool:
+        return isinstance(destination, int) and self._find(destination) >= 0
+
+    def __len__(self) -> int:
+        return len(self.destinations)
+
+    def __iter__(self) -> Iterator[Rva]:
+        return iter(self.destinations.tolist())
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(destinations={len(self.destinations)}, references={len(self.sources)})"
+
+    @property
+    def references_count(self) -> int:
+        return len(self.sources)
+
+    def pairs(self) -> Iterator[tuple[Rva, Rva]]:
+        """
+        Iterate over pairs of a destination and a source ordered by destination
+        """
+        sources = self.sources.tolist()
+        for index, destination in enumerate(self.destinations.tolist()):
+            for source in sources[self.offsets[index] : self.offsets[index + 1]]:
+                yield destination, source
+
+    def _get_source_order(self) -> array:
+        if self._source_order is None:
+            if np is not None:
+                order = np.argsort(np.frombuffer(self.sources, dtype=np.int64), kind="stable")
+                self._source_order = array("q", order.astype(np.int64).tobytes())
+            else:
+                self._source_order = array("q", sorted(range(len(self.sources)), key=self.sources.__getitem__))
+
+        return self._source_order
+
+    def sorted_sources(self) -> array:
+        """
+        All the sources in ascending order
+        """
+        return array("q", map(self.sources.__getitem__, self._get_source_order()))
+
+    def destination_of(self, source: int) -> Rva | None:
+        """
+        Find the destination of a reference by its source address
+
+        :param source: address of the reference
+        :return: destination address or None if there is no such reference
+        """
+        order = self._get_source_order()
+        position = bisect_left(order, source, key=self.sources.__getitem__)
+        if position == len(order) or self.sources[order[position]] != source:
+            return None
+
+        return Rva(self.destinations[bisect_right(self.offsets, order[position]) - 1])
+
+    def inverse(self) -> "SourceView":
+        """
+        Mapping of a source to its destination, without building an inverse dict
+        """
+        return SourceView(self)
+
+
+class SourceView(Mapping[Rva, Rva]):
+    """
+    Inverse view of a CrossReferenceTable: a mapping of a reference's source address to its destination
+    """
+
+    __slots__ = ("_table",)
+
+    def __init__(self, table: CrossReferenceTable) -> None:
+        self._table = table
+
+    def __getitem__(self, source: Rva) -> Rva:
+        destination = self._table.destination_of(source) if isinstance(source, int) else None
+        if destination is None:
+            raise KeyError(source)
+        return destination
+
+    def __len__(self) -> int:
+        return self._table.references_count
+
+    def __iter__(self) -> Iterator[Rva]:
+        return iter(self._table.sorted_sources().tolist())
@@ -0,0 +1,149 @@
+"""
+Absolute cross-references: 64-bit pointers to the objects (e.g. tables of string pointers in the data sections).
+Every absolute pointer of an image which can be relocated is listed in the base relocation table,
+so instead of a brute-force scan the pointers are read only at the locations from the table.
+"""
+
+import struct
+import sys
+from array import array
+from collections.abc import Iterable
+
+from dfint64_patch.cross_references.address_index import AddressIndex
+from dfint64_patch.cross_references.cross_reference_table import CrossReferenceTable
+from dfint64_patch.pe.headers import IMAGE_DIRECTORY_ENTRY_BASERELOC
+from dfint64_patch.pe.image import PeImage
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
+ABSOLUTE_REFERENCE_SIZE = 8
+
+IMAGE_REL_BASED_DIR64 = 10
+
+_BLOCK_HEADER = struct.Struct("<II")  # page RVA, size of the block including the header
+_ENTRY_SIZE = 2  # 4 bits of the type, 12 bits of the offset in the page
+
+
+def _block_locations(page: int, entries: bytes | memoryview) -> array:
+    """
+    Locations of the 64-bit pointers listed in a block of the base relocation table
+
+    :param page: RVA of the page of the block
+    :param entries: entries of the block, 16-bit little-endian values
+    :return: array of RVA of the pointers
+    """
+    if np is not None:
+        values = np.frombuffer(entries, dtype="<u2")
+        locations = (values[values >> 12 == IMAGE_REL_BASED_DIR64] & 0xFFF).astype(np.int64) + page
+        return array("q", locations.tobytes())
+
+    values = array("H")
+    values.frombytes(entries)
+    if sys.byteorder != "little":  # pragma: no cover
+        values.byteswap()
+
+    return array("q", [page + (entry & 0xFFF) for entry in values if entry >> 12 == IMAGE_REL_BASED_DIR64])
+
+
+def parse_base_relocations(pe: PeImage) -> array:
+    """
+    Read locations of the 64-bit absolute pointers from the base relocation table.
+    The entries of every block are decoded at once (with numpy if it is installed).
+
+    :param pe: PE image
+    :return: array of RVA of the pointers (in the order of the table, which is usually sorted)
+    """
+    result = array("q")
+    if len(pe.data_directories) <= IMAGE_DIRECTORY_ENTRY_BASERELOC:
+        return result
+
+    directory = pe.data_directories[IMAGE_DIRECTORY_ENTRY_BASERELOC]
+    if not directory.virtual_address or not directory.size:
+        return result
+
+    start = pe.rva_to_offset(directory.virtual_address)
+    table = pe.data[start : start + directory.size]
+    position = 0
+    while position + _BLOCK_HEADER.size <= len(table):
+        page, block_size = _BLOCK_HEADER.unpack_from(table, position)
+        if block_size < _BLOCK_HEADER.size:
+            break  # corrupted table
+
+        entries_start = position + _BLOCK_HEADER.size
+        entries_count = (min(position + block_size, len(table)) - entries_start) // _ENTRY_SIZE
+        result.extend(_block_locations(page, table[entries_start : entries_start + entries_count * _ENTRY_SIZE]))
+        position += block_size
+
+    return result
+
+
+def _pointer_offsets(pe: PeImage, locations: array) -> tuple[array, array]:
+    """
+    Map locations of the pointers to file offsets, skipping the ones outside the raw data of the sections
+
+    :return: locations and their offsets
+    """
+    result_locations = array("q")
+    offsets = array("q")
+    for section in pe.sections:
+        start = section.virtual_address
+        stop = start + section.size_of_raw_data - ABSOLUTE_REFERENCE_SIZE + 1
+        for location in locations:
+            if start <= location < stop:
+                result_locations.append(location)
+                offsets.append(section.pointer_to_raw_data + location - start)
+
+    return result_locations, offsets
+
+
+def _pointer_offsets_vectorized(pe: PeImage, locations: "np.ndarray") -> tuple["np.ndarray", "np.ndarray"]:
+    result_locations = []
+    offsets = []
+    for section in pe.sections:
+        start = section.virtual_address
+        stop = start + section.size_of_raw_data - ABSOLUTE_REFERENCE_SIZE + 1
+        section_locations = locations[(locations >= start) & (locations < stop)]
+        result_locations.append(section_locations)
+        offsets.append(section_locations - start + section.pointer_to_raw_data)
+
+    if not result_locations:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    return np.concatenate(result_locations), np.concatenate(offsets)
+
+
+def find_absolute_cross_references(pe: PeImage, addresses: Iterable[int]) -> CrossReferenceTable:
+    """
+    Find absolute pointers to the given objects' addresses at the locations listed in the base relocation table
+
+    :param pe: PE image
+    :param addresses: RVA of the objects
+    :return: CrossReferenceTable of the objects' RVA and the RVA of the pointers to them
+    """
+    locations = parse_base_relocations(pe)
+    index = addresses if isinstance(addresses, AddressIndex) else AddressIndex(addresses)
+    if not locations or not index:
+        return CrossReferenceTable.from_pairs([])
+
+    if np is None:
+        pointer_locations, offsets = _pointer_offsets(pe, locations)
+        pairs = []
+        for location, offset in zip(pointer_locations, offsets, strict=True):
+            (pointer,) = struct.unpack_from("<Q", pe.data, offset)
+            destination = pointer - pe.image_base
+            if destination in index:
+                pairs.append((destination, location))
+
+        return CrossReferenceTable.from_pairs(pairs)
+
+    vector_locations, vector_offsets = _pointer_offsets_vectorized(pe, np.frombuffer(locations, dtype=np.int64))
+    data = np.frombuffer(pe.data, dtype=np.uint8)
+    # Gather the bytes of all the pointers at once and view them as little-endian 64-bit values
+    gathered = data[vector_offsets[:, np.newaxis] + np.arange(ABSOLUTE_REFERENCE_SIZE)]
+    pointers = np.ascontiguousarray(gathered).view("<u8").ravel()
+    destinations = pointers.astype(np.int64) - np.int64(pe.image_base)
+    found = index.contains_many(destinations)
+    return CrossReferenceTable.from_arrays(destinations[found], vector_locations[found])
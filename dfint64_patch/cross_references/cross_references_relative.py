@@ -1,27 +1,70 @@
-from collections import defaultdict
-from collections.abc import Iterable, Iterator, Mapping
+import re
+from collections.abc import Container, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from itertools import chain
+from multiprocessing.shared_memory import SharedMemory
 
-from tqdm import tqdm
-
+from dfint64_patch.cross_references.address_index import AddressIndex
+from dfint64_patch.cross_references.cross_reference_table import CrossReferenceTable
+from dfint64_patch.cross_references.scan_modes import SCAN_MODES
+from dfint64_patch.metrics import ThrottledProgress, stage, track_progress
 from dfint64_patch.type_aliases import Rva
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
+
 REFERENCE_SIZE = 4
 
+# RIP-relative LEA and MOV (load): opcode 8D/8B followed by ModRM with mod=00 and rm=101 (any reg),
+# the 32-bit displacement follows the ModRM byte. An optional REX prefix precedes the opcode and doesn't matter.
+RIP_RELATIVE_OPCODES = (0x8B, 0x8D)
+RIP_RELATIVE_MODRM_MASK = 0xC7
+RIP_RELATIVE_MODRM = 0x05
+OPCODE_PREFIX_SIZE = 2  # opcode and ModRM bytes before the displacement
+_RIP_RELATIVE_PATTERN = re.compile(
+    b"[%s][%s]"
+    % (
+        b"".join(re.escape(bytes([opcode])) for opcode in RIP_RELATIVE_OPCODES),
+        b"".join(re.escape(bytes([reg << 3 | RIP_RELATIVE_MODRM])) for reg in range(8)),
+    )
+)
+
+VECTORIZED_CHUNK_SIZE = 0x400000  # bytes of the block processed by one pass of the vectorized engine
+MIN_SHARD_SIZE = 0x100000  # blocks smaller than this are not worth to be split between processes
+PROGRESS_SEGMENT_SIZE = VECTORIZED_CHUNK_SIZE  # bytes scanned in a single process between the progress reports
+
+References = tuple["np.ndarray", "np.ndarray"]  # destinations and sources of references found by the vectorized engines
+ScanResult = References | list[tuple[int, int]]  # result of a scanned range: arrays or pairs of the loop engines
+
 
 def find_relative_cross_references_loop(
-    bytes_block: bytes, base_address: Rva, addresses: Iterable[int]
+    bytes_block: bytes | memoryview, base_address: Rva, addresses: Container[int]
 ) -> Iterator[tuple[int, int]]:
     """
     Analyse a block of bytes and try to find relative cross-references to the given objects' addresses.
     Optimized hot loop, don't add extra stuff to the loop (like conversion to Rva etc.)
 
     :param bytes_block: bytes block to analyse
-    :param base_address: base address of the given block (preferably this should be of some type with fast "in" check,
-        like set, dict, range or short tuple)
-    :param addresses: an iterable of destination addresses
+    :param base_address: base address of the given block
+    :param addresses: a container of destination addresses (preferably this should be of some type with fast "in"
+        check, like AddressIndex, set, dict, range or short tuple). The membership check of AddressIndex is inlined.
     :return: pairs of destinations and source addresses
     """
+    if isinstance(addresses, AddressIndex):
+        start = addresses.start
+        size = addresses.stop - addresses.start
+        bits = addresses.bits
+        for i in range(len(bytes_block) - REFERENCE_SIZE + 1):
+            relative_offset = int.from_bytes(bytes_block[i : i + REFERENCE_SIZE], byteorder="little", signed=True)
+            offset = base_address + i + REFERENCE_SIZE + relative_offset - start
+
+            if 0 <= offset < size and bits[offset >> 3] >> (offset & 7) & 1:
+                yield offset + start, base_address + i
+
+        return
+
     for i in range(len(bytes_block) - REFERENCE_SIZE + 1):
         relative_offset = int.from_bytes(bytes_block[i : i + REFERENCE_SIZE], byteorder="little", signed=True)
         destination = base_address + i + REFERENCE_SIZE + relative_offset
@@ -30,31 +73,409 @@ def find_relative_cross_references_loop(
             yield destination, base_address + i
 
 
-def find_relative_cross_references(
-    bytes_block: bytes,
+def _find_relative_cross_references_chunk(
+    data: "np.ndarray",
+    base_address: int,
+    addresses: range | AddressIndex,
+) -> tuple["np.ndarray", "np.ndarray"]:
+    """
+    Find relative cross-references in a chunk of bytes with numpy
+
+    :param data: uint8 array of the chunk
+    :param base_address: address of the first byte of the chunk
+    :param addresses: range of addresses (with step 1) or an address index
+    :return: arrays of destinations and sources (not sorted)
+    """
+    destinations = []
+    sources = []
+    steps = np.arange((len(data) + REFERENCE_SIZE - 1) // REFERENCE_SIZE, dtype=np.int64) * REFERENCE_SIZE
+    for shift in range(REFERENCE_SIZE):
+        count = (len(data) - shift) // REFERENCE_SIZE
+        relative_offsets = data[shift : shift + count * REFERENCE_SIZE].view("<i4")
+        shift_sources = steps[:count] + (base_address + shift)
+        shift_destinations = shift_sources + REFERENCE_SIZE + relative_offsets
+
+        if isinstance(addresses, range):
+            mask = (shift_destinations >= addresses.start) & (shift_destinations < addresses.stop)
+        else:
+            mask = addresses.contains_many(shift_destinations)
+
+        destinations.append(shift_destinations[mask])
+        sources.append(shift_sources[mask])
+
+    return np.concatenate(destinations), np.concatenate(sources)
+
+
+def _find_relative_cross_references_arrays(
+    bytes_block: bytes | memoryview, base_address: Rva, addresses: range | AddressIndex
+) -> References:
+    """
+    Find relative cross-references with numpy chunk by chunk
+
+    :return: arrays of destinations and sources (ordered by source within a chunk)
+    """
+    destinations = [np.empty(0, dtype=np.int64)]
+    sources = [np.empty(0, dtype=np.int64)]
+    if addresses:
+        data = np.frombuffer(bytes_block, dtype=np.uint8)
+        for start in range(0, len(data) - REFERENCE_SIZE + 1, VECTORIZED_CHUNK_SIZE):
+            chunk = data[start : start + VECTORIZED_CHUNK_SIZE + REFERENCE_SIZE - 1]
+            chunk_destinations, chunk_sources = _find_relative_cross_references_chunk(
+                chunk, base_address + start, addresses
+            )
+            order = np.argsort(chunk_sources, kind="stable")
+            destinations.append(chunk_destinations[order])
+            sources.append(chunk_sources[order])
+
+    return np.concatenate(destinations), np.concatenate(sources)
+
+
+def find_relative_cross_references_vectorized(
+    bytes_block: bytes | memoryview, base_address: Rva, addresses: Iterable[int]
+) -> Iterator[tuple[int, int]]:
+    """
+    Vectorized (numpy based) version of the find_relative_cross_references_loop.
+    The block is processed by chunks, every chunk is viewed as four stride-1 arrays of int32 values
+    (one per each possible shift), all destinations are calculated at once and matched against the addresses.
+
+    :param bytes_block: bytes block to analyse
+    :param base_address: base address of the given block
+    :param addresses: an iterable of destination addresses
+    :return: pairs of destinations and source addresses, ordered by source address
+    """
+    if not (isinstance(addresses, range) and addresses.step == 1) and not isinstance(addresses, AddressIndex):
+        addresses = AddressIndex(addresses)
+
+    destinations, sources = _find_relative_cross_references_arrays(bytes_block, base_address, addresses)
+    yield from zip(destinations.tolist(), sources.tolist(), strict=True)
+
+
+def find_rip_relative_cross_references(
+    bytes_block: bytes | memoryview, base_address: Rva, addresses: Container[int]
+) -> Iterator[tuple[int, int]]:
+    """
+    Find relative cross-references only in the displacements of RIP-relative LEA and MOV instructions.
+    The instructions are located by a byte regex, so only a small part of the positions of the block is decoded.
+    References which start in the first OPCODE_PREFIX_SIZE bytes of the block are not found.
+
+    :param bytes_block: bytes block to analyse
+    :param base_address: base address of the given block
+    :param addresses: a container of destination addresses
+    :return: pairs of destinations and source addresses, ordered by source address
+    """
+    for match in _RIP_RELATIVE_PATTERN.finditer(bytes_block):
+        position = match.end()
+        if position + REFERENCE_SIZE > len(bytes_block):
+            break
+
+        relative_offset = int.from_bytes(bytes_block[position : position + REFERENCE_SIZE], "little", signed=True)
+        destination = base_address + position + REFERENCE_SIZE + relative_offset
+        if destination in addresses:
+            yield destination, base_address + position
+
+
+def _find_rip_relative_cross_references_arrays(
+    bytes_block: bytes | memoryview, base_address: Rva, addresses: range | AddressIndex
+) -> References:
+    """
+    Find displacements of RIP-relative instructions with numpy
+
+    :return: arrays of destinations and sources (ordered by source)
+    """
+    data = np.frombuffer(bytes_block, dtype=np.uint8)
+    if len(data) < OPCODE_PREFIX_SIZE + REFERENCE_SIZE:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    last = len(data) - REFERENCE_SIZE  # the last possible position of a displacement
+    opcodes = data[: last - 1]
+    modrm = data[1:last]
+    mask = np.isin(opcodes, RIP_RELATIVE_OPCODES) & (modrm & RIP_RELATIVE_MODRM_MASK == RIP_RELATIVE_MODRM)
+    positions = np.flatnonzero(mask) + OPCODE_PREFIX_SIZE
+
+    displacements = np.zeros(len(positions), dtype=np.uint32)
+    for i in range(REFERENCE_SIZE):
+        displacements |= data[positions + i].astype(np.uint32) << (8 * i)
+
+    sources = positions + base_address
+    destinations = sources + REFERENCE_SIZE + displacements.view(np.int32)
+    if isinstance(addresses, range):
+        found = (destinations >= addresses.start) & (destinations < addresses.stop)
+    else:
+        found = addresses.contains_many(destinations)
+
+    return destinations[found].astype(np.int64), sources[found].astype(np.int64)
+
+
+def find_rip_relative_cross_references_vectorized(
+    bytes_block: bytes | memoryview, base_address: Rva, addresses: range | AddressIndex
+) -> Iterator[tuple[int, int]]:
+    """
+    Vectorized (numpy based) version of the find_rip_relative_cross_references:
+    the instructions are located by masks over the whole block, the displacements are gathered at once.
+
+    :param bytes_block: bytes block to analyse
+    :param base_address: base address of the given block
+    :param addresses: range of addresses (with step 1) or an address index
+    :return: pairs of destinations and source addresses, ordered by source address
+    """
+    destinations, sources = _find_rip_relative_cross_references_arrays(bytes_block, base_address, addresses)
+    yield from zip(destinations.tolist(), sources.tolist(), strict=True)
+
+
+def _find_relative_cross_references_block(
+    bytes_block: bytes | memoryview,
     base_address: Rva,
-    addresses: Iterable[Rva],
-) -> Mapping[Rva, list[Rva]]:
+    addresses: range | AddressIndex,
+    *,
+    vectorized: bool,
+    scan: str = "exhaustive",
+) -> ScanResult:
+    """
+    Search the block with the engine of the scan mode
+
+    :return: arrays of destinations and sources for the vectorized engines, otherwise a list of pairs
+    """
+    if scan not in SCAN_MODES:
+        msg = f"Unknown scan mode: {scan!r}, expected one of {SCAN_MODES}"
+        raise ValueError(msg)
+
+    if vectorized and np is None:
+        msg = "numpy is required for the vectorized engine"
+        raise ImportError(msg)
+
+    if vectorized:
+        if scan == "opcodes":
+            return _find_rip_relative_cross_references_arrays(bytes_block, base_address, addresses)
+
+        return _find_relative_cross_references_arrays(bytes_block, base_address, addresses)
+
+    if scan == "opcodes":
+        return list(find_rip_relative_cross_references(bytes_block, base_address, addresses))
+
+    return list(find_relative_cross_references_loop(bytes_block, base_address, addresses))
+
+
+def _build_table(results: Iterable[ScanResult]) -> CrossReferenceTable:
+    """
+    Build the table from the results of the scanned ranges (all of them are found by the same engine):
+    the arrays of the vectorized engines are passed to the table as is, without conversion to pairs
+    """
+    pairs: list[tuple[int, int]] = []
+    destinations = []
+    sources = []
+    for result in results:
+        if isinstance(result, list):
+            pairs.extend(result)
+        else:
+            destinations.append(result[0])
+            sources.append(result[1])
+
+    if not destinations:
+        return CrossReferenceTable.from_pairs(pairs)
+
+    return CrossReferenceTable.from_arrays(np.concatenate(destinations), np.concatenate(sources))
+
+
+def split_into_shards(size: int, shards: int) -> list[tuple[int, int]]:
+    """
+    Split a block of bytes into shards for the parallel search of the cross-references.
+    Every shard is a range of possible reference positions, the shard's bytes are `[start, stop + REFERENCE_SIZE - 1)`,
+    i.e. neighbouring shards overlap by `REFERENCE_SIZE - 1` bytes, so that no reference is lost or found twice.
+
+    :param size: size of the bytes block
+    :param shards: desired number of shards
+    :return: list of (start, stop) pairs of reference positions
+    """
+    positions = size - REFERENCE_SIZE + 1
+    if positions <= 0:
+        return []
+
+    shard_size = -(-positions // shards)  # ceiling division
+    shard_size += -shard_size % REFERENCE_SIZE  # keep shards aligned for the vectorized engine
+    return [(start, min(start + shard_size, positions)) for start in range(0, positions, shard_size)]
+
+
+def _scanned_size(start: int, stop: int, ranges: list[tuple[int, int]]) -> int:
+    """
+    Number of bytes of the block scanned with a range of reference positions (for the progress):
+    the last bytes of the block are not reference positions, they are counted with the last range
+    """
+    return stop - start + (REFERENCE_SIZE - 1 if stop == ranges[-1][1] else 0)
+
+
+def _scan_range(  # noqa: PLR0913
+    bytes_block: bytes | memoryview,
+    base_address: Rva,
+    addresses: range | AddressIndex,
+    start: int,
+    stop: int,
+    *,
+    vectorized: bool,
+    scan: str,
+) -> ScanResult:
+    """
+    Scan a range of reference positions of the block (a shard or a segment, see split_into_shards)
+    """
+    # in the opcodes mode the instruction bytes before a reference must be in the range too
+    prefix = min(start, OPCODE_PREFIX_SIZE) if scan == "opcodes" else 0
+    return _find_relative_cross_references_block(
+        bytes_block[start - prefix : stop + REFERENCE_SIZE - 1],
+        Rva(base_address + start - prefix),
+        addresses,
+        vectorized=vectorized,
+        scan=scan,
+    )
+
+
+def _scan_by_segments(  # noqa: PLR0913
+    bytes_block: bytes | memoryview,
+    base_address: Rva,
+    addresses: range | AddressIndex,
+    *,
+    vectorized: bool,
+    scan: str,
+    progress: ThrottledProgress,
+) -> Iterator[ScanResult]:
+    """
+    Scan the block in a single process segment by segment, reporting the progress after every segment
+    """
+    segments = split_into_shards(len(bytes_block), -(-len(bytes_block) // PROGRESS_SEGMENT_SIZE))
+    if len(segments) <= 1:
+        yield _find_relative_cross_references_block(
+            bytes_block, base_address, addresses, vectorized=vectorized, scan=scan
+        )
+        progress.advance(len(bytes_block))
+        return
+
+    for start, stop in segments:
+        yield _scan_range(bytes_block, base_address, addresses, start, stop, vectorized=vectorized, scan=scan)
+        progress.advance(_scanned_size(start, stop, segments))
+
+
+_shared_block: SharedMemory | None = None
+_shared_parameters: tuple[Rva, range | AddressIndex, bool, str] | None = None
+
+
+def _init_shard_worker(
+    shared_memory_name: str,
+    base_address: Rva,
+    addresses: range | AddressIndex,
+    vectorized: bool,  # noqa: FBT001
+    scan: str,
+) -> None:
+    global _shared_block, _shared_parameters  # noqa: PLW0603
+    _shared_block = SharedMemory(name=shared_memory_name)
+    _shared_parameters = base_address, addresses, vectorized, scan
+
+
+def _scan_shard(start: int, stop: int) -> ScanResult:
+    assert _shared_block is not None
+    assert _shared_parameters is not None
+    base_address, addresses, vectorized, scan = _shared_parameters
+
+    assert _shared_block.buf is not None
+    block = _shared_block.buf
+    return _scan_range(block, base_address, addresses, start, stop, vectorized=vectorized, scan=scan)
+
+
+def find_relative_cross_references_parallel(  # noqa: PLR0913
+    bytes_block: bytes | memoryview,
+    base_address: Rva,
+    addresses: range | AddressIndex,
+    *,
+    vectorized: bool,
+    workers: int,
+    scan: str = "exhaustive",
+    progress: ThrottledProgress | None = None,
+) -> Iterator[ScanResult]:
+    """
+    Search relative cross-references in several processes.
+    The block is copied to a shared memory once and split into overlapping shards,
+    the shards are scanned by a pool of processes. The vectorized engine returns the references of a shard
+    as two arrays, which are much cheaper to send between the processes than lists of pairs.
+
+    :param bytes_block: bytes block to analyse
+    :param base_address: base address of the given block
+    :param addresses: range or index of destination addresses
+    :param vectorized: use the numpy based engine in the worker processes
+    :param workers: number of worker processes
+    :param scan: scan mode, see find_relative_cross_references
+    :param progress: progress to advance after every scanned shard
+    :return: references of every shard: arrays of destinations and sources for the vectorized engine,
+             otherwise lists of pairs of destinations and sources
+    """
+    shards = split_into_shards(len(bytes_block), workers)
+    if not shards:
+        return
+
+    shared_block = SharedMemory(create=True, size=len(bytes_block))
+    assert shared_block.buf is not None
+    try:
+        shared_block.buf[: len(bytes_block)] = bytes_block
+
+        with ProcessPoolExecutor(
+            max_workers=len(shards),
+            initializer=_init_shard_worker,
+            initargs=(shared_block.name, base_address, addresses, vectorized, scan),
+        ) as executor:
+            for (start, stop), found in zip(shards, executor.map(_scan_shard, *zip(*shards, strict=True)), strict=True):
+                yield found
+                if progress is not None:
+                    progress.advance(_scanned_size(start, stop, shards))
+    finally:
+        shared_block.close()
+        shared_block.unlink()
+
+
+def find_relative_cross_references(  # noqa: PLR0913
+    bytes_block: bytes | memoryview,
+    base_address: Rva,
+    addresses: Iterable[int],
+    *,
+    vectorized: bool | None = None,
+    workers: int = 1,
+    scan: str = "exhaustive",
+) -> CrossReferenceTable:
     """
     Analyse a block of bytes and try to find relative cross-references to the given objects' addresses
     :param bytes_block: bytes block to analyse
     :param base_address: base address of the given block
     :param addresses: an iterable of addresses. In addition to list and other flat types it also can be range
-        (e.g. `range(0x11000, 0x12000)`) or dict object.
-    :return: Mapping[object_rva: Rva, cross_references: List[Rva]]
+        (e.g. `range(0x11000, 0x12000)`), dict or AddressIndex object. Other types are converted to AddressIndex.
+    :param vectorized: use the numpy based engine. By default, it is used if numpy is installed.
+    :param workers: number of processes to search in parallel. Small blocks are always analysed in a single process.
+    :param scan: "exhaustive" - every 4 bytes of the block are treated as a possible reference,
+                 "opcodes" - only displacements of RIP-relative LEA and MOV instructions are checked
+                 (much fewer false references, but references from other instructions are not found)
+    :return: CrossReferenceTable, i.e. Mapping[object_rva: Rva, cross_references: List[Rva]]
     """
-    result = defaultdict(list)
+    if vectorized is None:
+        vectorized = np is not None
 
-    if not isinstance(addresses, range | dict):
-        addresses = set(addresses)
+    index = addresses if isinstance(addresses, range | AddressIndex) else AddressIndex(addresses)
 
-    for destination, source in tqdm(
-        find_relative_cross_references_loop(bytes_block, base_address, addresses),
-        desc="find_relative_cross_references",
-    ):
-        result[destination].append(source)
+    progress = track_progress("find_relative_cross_references", len(bytes_block))
+    workers = min(workers, -(-len(bytes_block) // MIN_SHARD_SIZE))
+    with stage("find_relative_cross_references", size=len(bytes_block)) as stage_metrics:
+        if workers > 1:
+            results = find_relative_cross_references_parallel(
+                bytes_block,
+                base_address,
+                index,
+                vectorized=vectorized,
+                workers=workers,
+                scan=scan,
+                progress=progress,
+            )
+        else:
+            results = _scan_by_segments(
+                bytes_block, base_address, index, vectorized=vectorized, scan=scan, progress=progress
+            )
 
-    return result
+        table = _build_table(results)
+        stage_metrics.items += table.references_count
+
+    return table
 
 
 def invert_cross_reference_table(cross_references: Mapping[Rva, list[Rva]]) -> Mapping[Rva, Rva]:
@@ -62,7 +483,11 @@ def invert_cross_reference_table(cross_references: Mapping[Rva, list[Rva]]) -> M
     Invert mapping from {Destination Rva: [cross-reverence Rva]} to {cross-reference Rva: Destination Rva}
     :param cross_references: mapping of the cross-references
     :return: Mapping[source: Rva, destination: Rva] - inverted mapping
+        (a lazy view with binary search lookups for CrossReferenceTable)
     """
+    if isinstance(cross_references, CrossReferenceTable):
+        return cross_references.inverse()
+
     result = {}
     for object_rva, references in cross_references.items():
         for ref in references:
@@ -71,13 +496,66 @@ def invert_cross_reference_table(cross_references: Mapping[Rva, list[Rva]]) -> M
     return result
 
 
-def find_intersected_cross_references(cross_references: Mapping[Rva, list[Rva]]) -> Iterator[tuple[Rva, Rva]]:
+def find_intersected_cross_references_vectorized(references: "np.ndarray") -> tuple["np.ndarray", "np.ndarray"]:
+    """
+    Vectorized search of collisions of the references: the references are sorted and compared with the ones
+    1, 2, ... positions ahead (a diff of the array with itself shifted) while there are pairs closer than REFERENCE_SIZE
+
+    :param references: array of the references
+    :return: arrays of the first and the second references of the colliding pairs, ordered by the first one
+    """
+    references = np.sort(references)
+    first_parts = []
+    second_parts = []
+    distance = 1
+    while distance < len(references):
+        mask = references[distance:] - references[:-distance] < REFERENCE_SIZE
+        if not mask.any():
+            break  # gaps only grow with the distance
+
+        first_parts.append(references[:-distance][mask])
+        second_parts.append(references[distance:][mask])
+        distance += 1
+
+    if not first_parts:
+        empty = np.empty(0, dtype=references.dtype)
+        return empty, empty
+
+    first = np.concatenate(first_parts)
+    second = np.concatenate(second_parts)
+    order = np.lexsort((second, first))
+    return first[order], second[order]
+
+
+def find_intersected_cross_references(
+    cross_references: Mapping[Rva, list[Rva]],
+    *,
+    vectorized: bool | None = None,
+) -> Iterator[tuple[Rva, Rva]]:
     """
     Find collisions of the references (i.e. when one supposed reference intersects with another one)
     :param cross_references: mapping of the cross-references
+    :param vectorized: use the numpy based search. By default, it is used if numpy is installed.
     :return: iterator of collisions
     """
-    references = sorted(chain.from_iterable(cross_references.values()))
+    if vectorized is None:
+        vectorized = np is not None
+
+    if vectorized:
+        if isinstance(cross_references, CrossReferenceTable):
+            sources = np.frombuffer(cross_references.sources, dtype=np.int64)
+        else:
+            sources = np.fromiter(chain.from_iterable(cross_references.values()), dtype=np.int64)
+
+        first, second = find_intersected_cross_references_vectorized(sources)
+        yield from zip(first.tolist(), second.tolist(), strict=True)
+        return
+
+    references: Sequence[Rva]
+    if isinstance(cross_references, CrossReferenceTable):
+        references = cross_references.sorted_sources()
+    else:
+        references = sorted(chain.from_iterable(cross_references.values()))
 
     for i, item in enumerate(references):
         j = i + 1
@@ -0,0 +1,6 @@
+"""
+Scan modes of the search of relative cross-references (see find_relative_cross_references).
+They are defined apart from the search, so the command line interfaces can list them without importing numpy.
+"""
+
+SCAN_MODES = ("exhaustive", "opcodes")
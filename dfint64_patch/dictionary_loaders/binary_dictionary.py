@@ -0,0 +1,225 @@
+"""
+Compiled binary dictionary.
+
+The dictionary is compiled from csv for a specific encoding: translations are stored already encoded,
+so the file can be memory-mapped and used for lookups without parsing and without building Python dicts.
+
+Layout (little-endian):
+    header: magic, format version, number of entries, number of hash table slots,
+            sizes of the keys and the values blobs, name of the encoding
+    hash table: slots of 32-bit entry indices (open addressing with linear probing, 0xFFFFFFFF is an empty slot)
+    entries: 64-bit hash of the key, offset and length of the key, offset and length of the encoded translation
+    keys blob: UTF-8 encoded source strings
+    values blob: translations in the target encoding
+"""
+
+import codecs
+import hashlib
+import mmap
+import struct
+from collections.abc import Generator, Iterable, Iterator, Mapping
+from contextlib import contextmanager, suppress
+from pathlib import Path
+from typing import BinaryIO
+
+from loguru import logger
+
+BINARY_DICTIONARY_MAGIC = b"DF64DIC\0"
+BINARY_DICTIONARY_VERSION = 1
+
+_ENCODING_NAME_SIZE = 16
+_HEADER = struct.Struct(f"<8sIIQQQQ{_ENCODING_NAME_SIZE}s")
+_SLOT = struct.Struct("<I")
+_ENTRY = struct.Struct("<QIIII")
+_EMPTY_SLOT = 0xFFFFFFFF
+
+
+def key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def _slots_count(entries_count: int) -> int:
+    slots = 1
+    while slots < entries_count * 2:
+        slots *= 2
+    return slots
+
+
+def _encode(translation: str, encoding: str) -> bytes | None:
+    try:
+        return translation.encode(encoding)
+    except UnicodeEncodeError as ex:
+        logger.warning(f"Translation {translation!r} can't be encoded with {encoding}: {ex}, skipping")
+        return None
+
+
+def compile_dictionary(translation_table: Iterable[tuple[str, str]], encoding: str, file_object: BinaryIO) -> int:
+    """
+    Compile a dictionary to the binary format
+
+    :param translation_table: pairs of a string and its translation (later pairs override earlier ones)
+    :param encoding: encoding of the translations
+    :param file_object: output file opened in binary mode
+    :return: number of entries written
+    """
+    encoding = codecs.lookup(encoding).name
+    encoded_name = encoding.encode("ascii")
+    if len(encoded_name) > _ENCODING_NAME_SIZE:
+        msg = f"Encoding name {encoding!r} is too long"
+        raise ValueError(msg)
+
+    entries: dict[bytes, bytes] = {}
+    for source, translation in translation_table:
+        key = source.encode("utf-8")
+        value = _encode(translation, encoding)
+        if value is not None:
+            entries[key] = value
+        else:
+            entries.pop(key, None)
+
+    slots_count = _slots_count(len(entries))
+    slots = [_EMPTY_SLOT] * slots_count
+    keys_blob = bytearray()
+    values_blob = bytearray()
+    packed_entries = bytearray()
+    for index, (key, value) in enumerate(entries.items()):
+        hash_value = key_hash(key)
+        slot = hash_value & (slots_count - 1)
+        while slots[slot] != _EMPTY_SLOT:
+            slot = (slot + 1) & (slots_count - 1)
+        slots[slot] = index
+
+        packed_entries += _ENTRY.pack(hash_value, len(keys_blob), len(key), len(values_blob), len(value))
+        keys_blob += key
+        values_blob += value
+
+    file_object.write(
+        _HEADER.pack(
+            BINARY_DICTIONARY_MAGIC,
+            BINARY_DICTIONARY_VERSION,
+            0,
+            len(entries),
+            slots_count,
+            len(keys_blob),
+            len(values_blob),
+            encoded_name,
+        )
+    )
+    file_object.write(struct.pack(f"<{slots_count}I", *slots))
+    file_object.write(packed_entries)
+    file_object.write(keys_blob)
+    file_object.write(values_blob)
+    return len(entries)
+
+
+def is_binary_dictionary(path: str | Path) -> bool:
+    with Path(path).open("rb") as file:
+        return file.read(len(BINARY_DICTIONARY_MAGIC)) == BINARY_DICTIONARY_MAGIC
+
+
+class BinaryDictionary(Mapping[str, str]):
+    """
+    Compiled dictionary over a buffer, usually a memory-mapped file (see open_binary_dictionary)
+    """
+
+    encoding: str
+
+    def __init__(self, data: bytes | mmap.mmap) -> None:
+        self._data = data
+        self._read_header()
+
+    def _read_header(self) -> None:
+        if len(self._data) < _HEADER.size:
+            msg = "Dictionary file is truncated"
+            raise ValueError(msg)
+
+        magic, version, _, self._count, self._slots_count, keys_size, values_size, encoding = _HEADER.unpack_from(
+            self._data
+        )
+        if magic != BINARY_DICTIONARY_MAGIC or version != BINARY_DICTIONARY_VERSION:
+            msg = "Unsupported dictionary file format"
+            raise ValueError(msg)
+
+        self.encoding = encoding.rstrip(b"\0").decode("ascii")
+        self._entries_offset = _HEADER.size + self._slots_count * _SLOT.size
+        self._keys_offset = self._entries_offset + self._count * _ENTRY.size
+        self._values_offset = self._keys_offset + keys_size
+        if len(self._data) != self._values_offset + values_size:
+            msg = "Dictionary file is truncated"
+            raise ValueError(msg)
+
+    @property
+    def data(self) -> bytes | mmap.mmap:
+        return self._data
+
+    def _find(self, key: str) -> tuple[int, int] | None:
+        """
+        :return: offset and length of the encoded value
+        """
+        encoded_key = key.encode("utf-8")
+        hash_value = key_hash(encoded_key)
+        mask = self._slots_count - 1
+        slot = hash_value & mask
+        for _ in range(self._slots_count):
+            (index,) = _SLOT.unpack_from(self._data, _HEADER.size + slot * _SLOT.size)
+            if index == _EMPTY_SLOT:
+                return None
+
+            entry_hash, key_offset, key_length, value_offset, value_length = _ENTRY.unpack_from(
+                self._data, self._entries_offset + index * _ENTRY.size
+            )
+            if entry_hash == hash_value and key_length == len(encoded_key):
+                start = self._keys_offset + key_offset
+                if self._data[start : start + key_length] == encoded_key:
+                    return self._values_offset + value_offset, value_length
+
+            slot = (slot + 1) & mask
+
+        return None
+
+    def get_encoded(self, key: str) -> bytes | None:
+        """
+        Get a translation encoded in the encoding of the dictionary
+        """
+        found = self._find(key)
+        if found is None:
+            return None
+
+        offset, length = found
+        return self._data[offset : offset + length]
+
+    def __getitem__(self, key: str) -> str:
+        value = self.get_encoded(key) if isinstance(key, str) else None
+        if value is None:
+            raise KeyError(key)
+        return value.decode(self.encoding)
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._count):
+            _, key_offset, key_length, _, _ = _ENTRY.unpack_from(self._data, self._entries_offset + index * _ENTRY.size)
+            start = self._keys_offset + key_offset
+            yield self._data[start : start + key_length].decode("utf-8")
+
+
+@contextmanager
+def open_binary_dictionary(path: str | Path) -> Generator[BinaryDictionary, None, None]:
+    """
+    Context manager to map a compiled dictionary file to memory and unmap it on exit
+
+    :param path: path to the file
+    :return: BinaryDictionary
+    """
+    with Path(path).open("rb") as file_object:
+        mapping = mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+
+    try:
+        yield BinaryDictionary(mapping)
+    finally:
+        with suppress(BufferError):
+            mapping.close()
@@ -0,0 +1,22 @@
+from pathlib import Path
+
+import click
+from loguru import logger
+
+from dfint64_patch.dictionary_loaders.binary_dictionary import compile_dictionary
+from dfint64_patch.dictionary_loaders.csv_loader import load_translation_file
+
+
+@click.command()
+@click.argument("csv_file", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output_file", type=click.Path(dir_okay=False))
+@click.option("--encoding", "encoding", help="Encoding for the translation", default="cp437")
+def main(csv_file: str, output_file: str, encoding: str) -> None:
+    with Path(csv_file).open(encoding="utf-8") as trans, Path(output_file).open("wb") as output:
+        count = compile_dictionary(load_translation_file(trans), encoding, output)
+
+    logger.info(f"{count} entries are written to {output_file}")
+
+
+if __name__ == "__main__":
+    main()
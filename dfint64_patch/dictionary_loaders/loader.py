@@ -0,0 +1,29 @@
+from collections.abc import Generator
+from contextlib import contextmanager
+from pathlib import Path
+
+from loguru import logger
+
+from dfint64_patch.dictionary_loaders.binary_dictionary import is_binary_dictionary, open_binary_dictionary
+from dfint64_patch.dictionary_loaders.csv_loader import load_translation_file
+from dfint64_patch.type_aliases import TranslationTable
+
+
+@contextmanager
+def open_translation_dictionary(path: str | Path) -> Generator[TranslationTable, None, None]:
+    """
+    Open a dictionary file, either a compiled binary dictionary (detected by its magic) or a csv file
+
+    :param path: path to the dictionary file
+    :return: BinaryDictionary or a list of pairs of a string and its translation
+    """
+    if is_binary_dictionary(path):
+        logger.info("Opening compiled dictionary...")
+        with open_binary_dictionary(path) as dictionary:
+            yield dictionary
+    else:
+        logger.info("Loading translation file...")
+        with Path(path).open(encoding="utf-8") as file:
+            translation_table = list(load_translation_file(file))
+
+        yield translation_table
@@ -1,61 +1,63 @@
-import operator
 from dataclasses import dataclass
 from io import BufferedReader
 from pathlib import Path
 
-import lief
 from omegaconf import DictConfig
 
+from dfint64_patch.analysis.analyse import AnalysisParameters, analyse_pe_image
+from dfint64_patch.analysis.cache import AnalysisCache
 from dfint64_patch.config import with_config
-from dfint64_patch.cross_references.cross_references_relative import (
-    find_relative_cross_references,
-)
-from dfint64_patch.extract_strings.from_raw_bytes import (
-    ExtractedStringInfo,
-    extract_strings_from_raw_bytes,
-)
+from dfint64_patch.extract_strings.from_raw_bytes import ExtractedStringInfo
+from dfint64_patch.metrics import collect_metrics, log_progress
+from dfint64_patch.pe.image import open_pe_image
 from dfint64_patch.type_aliases import Rva
 from dfint64_patch.utils import maybe_open
 
 
-def extract_strings(pe_file: BufferedReader) -> list[ExtractedStringInfo]:
-    pe = lief.PE.parse(pe_file)
-    assert pe is not None
-
-    code_section = pe.sections[0]
-    string_section = pe.sections[1]
-
-    image_base = pe.optional_header.imagebase
-
-    strings = list(
-        extract_strings_from_raw_bytes(
-            string_section.content,
-            base_address=Rva(string_section.virtual_address + image_base),
-        ),
+def extract_strings(
+    pe_file: BufferedReader,
+    *,
+    workers: int = 1,
+    pe_backend: str = "builtin",
+    cache: AnalysisCache | None = None,
+) -> list[ExtractedStringInfo]:
+    with open_pe_image(pe_file, backend=pe_backend) as pe:
+        image_base = pe.image_base
+        analysis = analyse_pe_image(pe, AnalysisParameters(subroutines=None), workers=workers, cache=cache)
+
+    cross_references = analysis.cross_references
+    filtered = sorted(
+        filter(lambda x: x.address in cross_references, analysis.strings),
+        key=lambda s: min(cross_references[s.address]),
     )
-
-    cross_references = find_relative_cross_references(
-        code_section.content,
-        base_address=Rva(code_section.virtual_address + image_base),
-        addresses=map(operator.itemgetter(0), strings),
-    )
-
-    filtered = filter(lambda x: x[0] in cross_references, strings)
-    return sorted(filtered, key=lambda s: min(cross_references[s.address]))
+    return [ExtractedStringInfo(Rva(item.address + image_base), item.string) for item in filtered]
 
 
 @dataclass
 class ExtractConfig(DictConfig):
     file_name: str
     out_file: str | None = None
+    jobs: int = 1
+    pe_backend: str = "builtin"
+    cache: bool = True
+    cache_dir: str | None = None
+    metrics_out: str | None = None
 
 
 @with_config(ExtractConfig, ".extract.yaml")
 def main(conf: ExtractConfig) -> None:
-    with Path(conf.file_name).open("rb") as pe_file, maybe_open(conf.out_file) as out_file_object:
-        for item in extract_strings(pe_file):
+    with (
+        collect_metrics(progress=log_progress) as metrics,
+        Path(conf.file_name).open("rb") as pe_file,
+        maybe_open(conf.out_file) as out_file_object,
+    ):
+        cache = AnalysisCache(conf.cache_dir) if conf.cache else None
+        for item in extract_strings(pe_file, workers=conf.jobs, pe_backend=conf.pe_backend, cache=cache):
             print(item.string, file=out_file_object)
 
+    if conf.metrics_out is not None:
+        metrics.save(conf.metrics_out)
+
 
 if __name__ == "__main__":
     main()
@@ -5,7 +5,9 @@ So it is only possible to find strings by linear search in the data section, and
 in the code section.
 """
 
+import re
 from collections.abc import Iterator
+from functools import cache
 from typing import NamedTuple
 
 from dfint64_patch.type_aliases import RVA0, Rva
@@ -34,28 +36,26 @@ class ExtractedStringInfo(NamedTuple):
     string: str
 
 
-def extract_strings_from_raw_bytes(
+def _extract_strings_generic(
     bytes_block: bytes | memoryview,
-    base_address: Rva = RVA0,
-    alignment: int = 4,
-    encoding: str = "cp437",
+    base_address: Rva,
+    alignment: int,
+    encoding: str,
 ) -> Iterator[ExtractedStringInfo]:
     """
-    Extract all objects which are seem to be text strings from a raw bytes block
-    :param bytes_block: a block of bytes to be analyzed
-    :param base_address: base address of the bytes block
-    :param alignment: alignment of strings
-    :param encoding: string encoding
-    :return: Iterator[ExtractedStringInfo]
+    Character by character version of the string extraction, which works with any encoding
     """
     bytes_block = bytes(bytes_block)
     i = 0
     while i < len(bytes_block):
-        if bytes_block[i] == b"\0":
+        if bytes_block[i] == 0:
             i += alignment
             continue
 
-        end_index = bytes_block.index(b"\0", i)
+        end_index = bytes_block.find(b"\0", i)
+        if end_index < 0:
+            break
+
         buffer_part = bytes_block[i:end_index]
 
         try:
@@ -67,3 +67,71 @@ def extract_strings_from_raw_bytes(
 
         string_len = end_index - i
         i += (string_len // alignment + 1) * alignment
+
+
+_ASCII_CHARACTERS = bytes(range(128))
+
+# bytes.translate deletion tables
+_ALLOWED_BYTES = bytes(c for c in _ASCII_CHARACTERS if is_allowed(chr(c)))
+_LETTER_BYTES = bytes(c for c in _ASCII_CHARACTERS if chr(c).isalpha())
+
+_ALLOWED_BYTES_CLASS = b"[" + b"".join(b"\\x%02x" % c for c in _ALLOWED_BYTES) + b"]"
+
+# A run of allowed bytes, which is terminated with a zero byte. The lookbehind makes the regular expression engine
+# skip positions in the middle of a run, without it the search would be quadratic on long runs of allowed bytes.
+_CANDIDATE = re.compile(b"(?<!" + _ALLOWED_BYTES_CLASS + b")" + _ALLOWED_BYTES_CLASS + b"+(?=\0)")
+
+
+@cache
+def is_ascii_compatible(encoding: str) -> bool:
+    """
+    Check that the encoding decodes ASCII bytes to the same ASCII characters,
+    i.e. that a string can be validated by its bytes before decoding.
+    """
+    try:
+        return _ASCII_CHARACTERS.decode(encoding) == _ASCII_CHARACTERS.decode("ascii")
+    except UnicodeDecodeError:
+        return False
+
+
+def extract_strings_from_raw_bytes(
+    bytes_block: bytes | memoryview,
+    base_address: Rva = RVA0,
+    alignment: int = 4,
+    encoding: str = "cp437",
+) -> Iterator[ExtractedStringInfo]:
+    """
+    Extract all objects which are seem to be text strings from a raw bytes block.
+    A string starts at the first aligned position of a run of non-zero bytes and ends with a zero byte.
+    For ASCII-compatible encodings runs of allowed bytes are found with a regular expression
+    and checked for letters with bytes.translate, so the block is neither copied nor decoded as a whole.
+
+    :param bytes_block: a block of bytes to be analyzed
+    :param base_address: base address of the bytes block
+    :param alignment: alignment of strings
+    :param encoding: string encoding
+    :return: Iterator[ExtractedStringInfo]
+    """
+    if not is_ascii_compatible(encoding):
+        yield from _extract_strings_generic(bytes_block, base_address, alignment, encoding)
+        return
+
+    for match in _CANDIDATE.finditer(bytes_block):
+        start, end = match.span()
+        if start and bytes_block[start - 1]:
+            # The candidate is preceded by forbidden bytes. If there is an aligned position among them,
+            # then a string would start there and contain forbidden bytes.
+            aligned_start = start - 1 - (start - 1) % alignment
+            if all(bytes_block[aligned_start:start]):
+                continue
+
+        start += -start % alignment
+        if start >= end:
+            continue
+
+        buffer_part = bytes(bytes_block[start:end])
+        if buffer_part.translate(None, _LETTER_BYTES) == buffer_part:
+            continue
+
+        # The string consists of ASCII characters only, which are the same in the given encoding
+        yield ExtractedStringInfo(Rva(base_address + start), buffer_part.decode("ascii"))
@@ -0,0 +1,48 @@
+"""
+Subroutines from the exception directory (.pdata section) of an x64 executable.
+The directory is a table of RUNTIME_FUNCTION structures with exact start and end addresses of every function
+(except leaf functions which don't use the stack), sorted by the start address.
+"""
+
+import sys
+from array import array
+from itertools import pairwise
+
+from dfint64_patch.extract_subroutines.from_raw_bytes import SubroutineIndex
+from dfint64_patch.pe.headers import IMAGE_DIRECTORY_ENTRY_EXCEPTION
+from dfint64_patch.pe.image import PeImage
+
+# BeginAddress, EndAddress, UnwindInfoAddress
+_RUNTIME_FUNCTION_FIELDS = 3
+
+
+def extract_subroutines_from_exception_directory(pe: PeImage) -> SubroutineIndex | None:
+    """
+    Read subroutines from the exception directory
+
+    :param pe: PE image
+    :return: SubroutineIndex (addresses are RVA) or None if the file has no exception directory
+    """
+    if len(pe.data_directories) <= IMAGE_DIRECTORY_ENTRY_EXCEPTION:
+        return None
+
+    directory = pe.data_directories[IMAGE_DIRECTORY_ENTRY_EXCEPTION]
+    if not directory.virtual_address or not directory.size:
+        return None
+
+    offset = pe.rva_to_offset(directory.virtual_address)
+    items = array("I")
+    item_size = items.itemsize * _RUNTIME_FUNCTION_FIELDS
+    items.frombytes(pe.data[offset : offset + directory.size // item_size * item_size])
+    if sys.byteorder != "little":  # pragma: no cover
+        items.byteswap()
+
+    starts = array("Q", items[0::_RUNTIME_FUNCTION_FIELDS])
+    ends = array("Q", items[1::_RUNTIME_FUNCTION_FIELDS])
+    if any(previous > current for previous, current in pairwise(starts)):
+        # The table should be sorted, but don't rely on it
+        pairs = sorted(zip(starts, ends, strict=True))
+        starts = array("Q", (start for start, _ in pairs))
+        ends = array("Q", (end for _, end in pairs))
+
+    return SubroutineIndex(starts, ends)
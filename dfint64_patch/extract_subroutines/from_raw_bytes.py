@@ -1,32 +1,142 @@
 import re
+from array import array
 from bisect import bisect_right
-from collections.abc import Iterator, Sequence
-from typing import NamedTuple
+from collections.abc import Iterable, Iterator, Sequence
+from typing import NamedTuple, overload
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore[assignment]
 
 SUBROUTINE_ALIGNMENT = 4
 
+_SUBROUTINES_SEPARATOR = re.compile(rb"\xCC+")
+
 
 class SubroutineInfo(NamedTuple):
     start: int
     end: int  # exclusive
 
 
-def extract_subroutines(buffer: bytes, base_offset: int = 0) -> Iterator[SubroutineInfo]:
+def _subroutine_bounds(buffer: bytes | memoryview, base_offset: int) -> Iterator[tuple[int, int]]:
     start = 0
 
-    for match in re.finditer(rb"\xCC+", buffer):
+    for match in _SUBROUTINES_SEPARATOR.finditer(buffer):
         if match.end() % SUBROUTINE_ALIGNMENT != 0:
             continue
 
         end = match.start()
-        yield SubroutineInfo(base_offset + start, base_offset + end)
+        yield base_offset + start, base_offset + end
         start = match.end()
 
     if start < len(buffer):
-        yield SubroutineInfo(base_offset + start, base_offset + len(buffer))
+        yield base_offset + start, base_offset + len(buffer)
+
+
+def extract_subroutines(buffer: bytes | memoryview, base_offset: int = 0) -> Iterator[SubroutineInfo]:
+    for start, end in _subroutine_bounds(buffer, base_offset):
+        yield SubroutineInfo(start, end)
+
+
+class SubroutineIndex(Sequence[SubroutineInfo]):
+    """
+    Subroutines sorted by address, stored as two arrays of 64-bit integers (starts and ends),
+    with a fast search of the subroutine which contains an address
+    """
+
+    __slots__ = ("ends", "starts")
+
+    def __init__(self, starts: array | None = None, ends: array | None = None) -> None:
+        self.starts = starts if starts is not None else array("Q")
+        self.ends = ends if ends is not None else array("Q")
+        if len(self.starts) != len(self.ends):
+            msg = "Starts and ends must have the same length"
+            raise ValueError(msg)
+
+    @classmethod
+    def from_subroutines(cls, subroutines: Iterable[tuple[int, int]]) -> "SubroutineIndex":
+        index = cls()
+        for start, end in subroutines:
+            index.starts.append(start)
+            index.ends.append(end)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @overload
+    def __getitem__(self, item: int) -> SubroutineInfo: ...
+
+    @overload
+    def __getitem__(self, item: slice) -> "SubroutineIndex": ...
+
+    def __getitem__(self, item: int | slice) -> "SubroutineInfo | SubroutineIndex":
+        if isinstance(item, slice):
+            return SubroutineIndex(self.starts[item], self.ends[item])
+        return SubroutineInfo(self.starts[item], self.ends[item])
+
+    def __iter__(self) -> Iterator[SubroutineInfo]:
+        for start, end in zip(self.starts, self.ends, strict=True):
+            yield SubroutineInfo(start, end)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SubroutineIndex):
+            return self.starts == other.starts and self.ends == other.ends
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({len(self)} subroutines)"
+
+    def lookup_index(self, address: int) -> int:
+        """
+        Find the index of the subroutine which contains the address
+
+        :return: index of the subroutine or -1 if the address is not in any subroutine
+        """
+        index = bisect_right(self.starts, address) - 1
+        if index < 0 or address >= self.ends[index]:
+            return -1
+        return index
+
+    def lookup(self, address: int) -> SubroutineInfo | None:
+        index = self.lookup_index(address)
+        return self[index] if index >= 0 else None
+
+    def lookup_many(self, addresses: Iterable[int]) -> list[int]:
+        """
+        Find subroutines for many addresses at once (vectorized with numpy if it is available)
+
+        :param addresses: addresses
+        :return: indices of the subroutines which contain the addresses (-1 if an address is not in any subroutine)
+        """
+        if np is None:
+            return [self.lookup_index(address) for address in addresses]
+
+        address_array = np.fromiter(addresses, dtype=np.uint64)
+        starts = np.frombuffer(self.starts, dtype=np.uint64)
+        ends = np.frombuffer(self.ends, dtype=np.uint64)
+        indices = np.searchsorted(starts, address_array, side="right").astype(np.int64) - 1
+        found = indices >= 0
+        found[found] = address_array[found] < ends[indices[found]]
+        return np.where(found, indices, -1).tolist()
+
+
+def extract_subroutine_index(buffer: bytes | memoryview, base_offset: int = 0) -> SubroutineIndex:
+    """
+    Same as extract_subroutines, but builds SubroutineIndex
+    """
+    return SubroutineIndex.from_subroutines(_subroutine_bounds(buffer, base_offset))
 
 
 def which_subroutine(subroutines: Sequence[SubroutineInfo], address: int) -> SubroutineInfo | None:
+    if isinstance(subroutines, SubroutineIndex):
+        return subroutines.lookup(address)
+
     addresses = [subroutine.start for subroutine in subroutines]
     index = bisect_right(addresses, address) - 1
     if index < 0 or index >= len(subroutines) or address >= subroutines[index].end:
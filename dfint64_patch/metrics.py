@@ -0,0 +1,243 @@
+"""
+Instrumentation of the stages of the analysis and the patching: stage timers, counters of the processed bytes
+and items, peak memory usage and throttled progress callbacks.
+
+Metrics are collected only inside a `collect_metrics` block, outside of it the instrumentation calls do nothing,
+so the library code can be instrumented unconditionally.
+"""
+
+import json
+import sys
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+METRICS_FORMAT_VERSION = 1
+
+MB = 0x100000
+PROGRESS_STEPS = 10  # progress is reported at most this many times per stage (plus the final report)
+
+ProgressCallback = Callable[[str, int, int], None]
+"""Progress callback: name of the stage, number of the processed bytes, total number of bytes"""
+
+
+def peak_rss() -> int | None:
+    """
+    Peak resident set size of the current process in bytes, None if it can't be determined
+    """
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == "darwin" else max_rss * 1024  # kilobytes everywhere except macOS
+
+    if sys.platform == "win32":  # pragma: no cover
+        return _peak_working_set_windows()
+
+    return None  # pragma: no cover
+
+
+def _peak_working_set_windows() -> int | None:  # pragma: no cover
+    import ctypes  # noqa: PLC0415
+    from ctypes import wintypes  # noqa: PLC0415
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = (
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        )
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()  # type: ignore[attr-defined]
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):  # type: ignore[attr-defined]
+        return None
+
+    return counters.PeakWorkingSetSize
+
+
+@dataclass
+class StageMetrics:
+    calls: int = 0
+    seconds: float = 0.0
+    bytes: int = 0  # size of the processed data
+    items: int = 0  # number of the found objects (strings, references, subroutines, edits)
+    peak_rss: int | None = None  # peak memory usage of the process at the end of the stage
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "bytes": self.bytes,
+            "items": self.items,
+            "bytes_per_second": self.bytes / self.seconds if self.bytes and self.seconds else None,
+            "peak_rss": self.peak_rss,
+        }
+
+
+@dataclass
+class Metrics:
+    """
+    Collected metrics: stages by name (in the order of their first start) and free-form counters
+    """
+
+    stages: dict[str, StageMetrics] = field(default_factory=dict)
+    counters: dict[str, int] = field(default_factory=dict)
+    progress: ProgressCallback | None = None
+    started: float = field(default_factory=time.perf_counter)
+
+    @contextmanager
+    def stage(self, name: str, *, size: int = 0) -> Iterator[StageMetrics]:
+        """
+        Time a stage, nested and repeated stages are allowed (the time of the repeated ones is summed up)
+
+        :param name: name of the stage
+        :param size: number of bytes processed by the stage, can be also added to the yielded StageMetrics
+        """
+        stage_metrics = self.stages.setdefault(name, StageMetrics())
+        stage_metrics.calls += 1
+        stage_metrics.bytes += size
+        start = time.perf_counter()
+        try:
+            yield stage_metrics
+        finally:
+            stage_metrics.seconds += time.perf_counter() - start
+            stage_metrics.peak_rss = peak_rss()
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> dict[str, Any]:
+        """
+        :return: JSON compatible report
+        """
+        return {
+            "version": METRICS_FORMAT_VERSION,
+            "seconds": time.perf_counter() - self.started,
+            "peak_rss": peak_rss(),
+            "stages": {name: stage_metrics.to_json() for name, stage_metrics in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def save(self, path: str | Path) -> None:
+        with Path(path).open("w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
+
+
+_current_metrics: ContextVar[Metrics | None] = ContextVar("current_metrics", default=None)
+
+
+@contextmanager
+def collect_metrics(progress: ProgressCallback | None = None) -> Iterator[Metrics]:
+    """
+    Collect metrics of the instrumented code called inside the block
+
+    :param progress: callback to report progress of the long stages to
+    :return: Metrics
+    """
+    metrics = Metrics(progress=progress)
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+def current_metrics() -> Metrics | None:
+    return _current_metrics.get()
+
+
+def detach_metrics() -> None:
+    """
+    Stop collecting metrics in the current context.
+    Used as an initializer of the worker processes, which inherit the collector of the parent process with fork,
+    but can't pass their metrics back.
+    """
+    _current_metrics.set(None)
+
+
+@contextmanager
+def stage(name: str, *, size: int = 0) -> Iterator[StageMetrics]:
+    """
+    Time a stage if metrics are collected, see Metrics.stage.
+    Outside of collect_metrics a detached StageMetrics is yielded, so the caller doesn't need to check.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield StageMetrics()
+        return
+
+    with metrics.stage(name, size=size) as stage_metrics:
+        yield stage_metrics
+
+
+def count(name: str, value: int = 1) -> None:
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.count(name, value)
+
+
+class ThrottledProgress:
+    """
+    Progress of a stage by the processed bytes: the callback is called when at least `step` more bytes are processed
+    since the previous call, and at the end of the stage
+    """
+
+    __slots__ = ("callback", "done", "name", "next_report", "step", "total")
+
+    def __init__(self, name: str, total: int, callback: ProgressCallback | None, step: int | None = None) -> None:
+        """
+        :param name: name of the stage
+        :param total: total number of bytes to process
+        :param callback: progress callback, if None then nothing is reported
+        :param step: minimal number of bytes between the reports, by default 1/PROGRESS_STEPS of the total
+        """
+        self.name = name
+        self.total = total
+        self.callback = callback
+        self.step = step if step is not None else max(1, -(-total // PROGRESS_STEPS))
+        self.done = 0
+        self.next_report = min(self.step, total)
+
+    def advance(self, size: int) -> None:
+        self.done += size
+        if self.done < self.next_report:
+            return
+
+        finished = self.done >= self.total
+        self.next_report = self.total + 1 if finished else min(self.done + self.step, self.total)
+        if self.callback is not None:
+            self.callback(self.name, min(self.done, self.total), self.total)
+
+
+def track_progress(name: str, total: int) -> ThrottledProgress:
+    """
+    Progress of a stage reported to the callback of the current metrics (if any)
+    """
+    metrics = _current_metrics.get()
+    return ThrottledProgress(name, total, metrics.progress if metrics is not None else None)
+
+
+def log_progress(name: str, done: int, total: int) -> None:
+    """
+    Progress callback which writes the progress to the log
+    """
+    percent = done * 100 // total if total else 100
+    logger.info(f"{name}: {percent}% ({done / MB:.1f} of {total / MB:.1f} MB)")
@@ -0,0 +1,28 @@
+from pathlib import Path
+
+import click
+from loguru import logger
+
+from dfint64_patch.backup import copy_source_file_context
+from dfint64_patch.patching.delta import apply_delta, load_delta
+
+
+@click.command()
+@click.argument("delta_file", type=click.Path(exists=True, dir_okay=False))
+@click.argument("target_file", default="Dwarf Fortress.exe", type=click.Path(exists=True, dir_okay=False))
+@click.option("--output", "output_file", help="Patch a copy of the target file instead of the file itself")
+@click.option("--verify/--no-verify", "verify", help="Check hashes of the file before and after patching", default=True)
+def main(delta_file: str, target_file: str, output_file: str | None, *, verify: bool) -> None:
+    delta = load_delta(delta_file)
+    if output_file is None:
+        applied = apply_delta(delta, target_file, verify=verify)
+    else:
+        with copy_source_file_context(target_file, Path(output_file), cleanup=True) as patched_file:
+            applied = apply_delta(delta, patched_file, verify=verify)
+
+    if applied:
+        logger.info(f"{delta.header.runs} runs are applied")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Batch patching: one source executable is patched with several dictionaries (e.g. one per language).
+The executable is analysed once, the patched files are produced by a pool of processes which share the analysis.
+"""
+
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+from loguru import logger
+
+from dfint64_patch.analysis.analyse import Analysis
+from dfint64_patch.analysis.cache import AnalysisCache
+from dfint64_patch.dictionary_loaders.loader import open_translation_dictionary
+from dfint64_patch.metrics import detach_metrics
+from dfint64_patch.patching.delta import save_delta
+from dfint64_patch.patching.incremental import update_patched_file
+from dfint64_patch.patching.patch import TranslationPatch, analyse_for_translation, plan_analysed_translation
+from dfint64_patch.pe.image import open_pe_image
+from dfint64_patch.type_aliases import TranslationTable
+
+
+class BatchTarget(NamedTuple):
+    dictionary_file: str
+    encoding: str
+    patched_file: str
+
+
+class BatchResult(NamedTuple):
+    target: BatchTarget
+    applied: int | None = None  # number of the translated strings, None if the file is up to date or on error
+    skipped: int | None = None  # number of the translations which can't be applied
+    error: str | None = None
+
+
+class BatchOptions(NamedTuple):
+    pe_backend: str = "builtin"
+    relocate: bool = False
+    incremental: bool = True
+    cleanup: bool = False
+    scan: str = "exhaustive"
+    delta: bool = False
+
+
+_batch_parameters: tuple[str, Analysis, BatchOptions] | None = None
+
+
+def _init_batch_worker(source_file: str, analysis: Analysis, options: BatchOptions) -> None:
+    global _batch_parameters  # noqa: PLW0603
+    detach_metrics()
+    _batch_parameters = source_file, analysis, options
+
+
+def _write_target_delta(
+    source_file: str,
+    analysis: Analysis,
+    options: BatchOptions,
+    target: BatchTarget,
+    translation_table: TranslationTable,
+) -> TranslationPatch:
+    with Path(source_file).open("rb") as pe_file, open_pe_image(pe_file, backend=options.pe_backend) as pe:
+        translation_patch = plan_analysed_translation(
+            pe, analysis, translation_table, target.encoding, relocate=options.relocate
+        )
+
+    save_delta(source_file, translation_patch.plan, target.patched_file)
+    return translation_patch
+
+
+def _patch_target(source_file: str, analysis: Analysis, options: BatchOptions, target: BatchTarget) -> BatchResult:
+    logger.info(f"Patching {target.patched_file} with {target.dictionary_file} ({target.encoding})")
+    translation_patch: TranslationPatch | None
+    try:
+        with open_translation_dictionary(target.dictionary_file) as translation_table:
+            if options.delta:
+                translation_patch = _write_target_delta(source_file, analysis, options, target, translation_table)
+            else:
+                update = update_patched_file(
+                    source_file,
+                    target.patched_file,
+                    translation_table,
+                    target.encoding,
+                    pe_backend=options.pe_backend,
+                    relocate=options.relocate,
+                    incremental=options.incremental,
+                    cleanup=options.cleanup,
+                    scan=options.scan,
+                    analysis=analysis,
+                )
+                translation_patch = update.translation_patch if update is not None else None
+    except Exception as ex:  # noqa: BLE001
+        logger.error(f"Failed to patch {target.patched_file}: {ex}")
+        return BatchResult(target, error=str(ex) or type(ex).__name__)
+
+    if translation_patch is None:
+        return BatchResult(target)
+
+    return BatchResult(target, len(translation_patch.translated), translation_patch.skipped)
+
+
+def _patch_target_in_worker(target: BatchTarget) -> BatchResult:
+    assert _batch_parameters is not None
+    return _patch_target(*_batch_parameters, target)
+
+
+def patch_batch(  # noqa: PLR0913
+    source_file: str | Path,
+    targets: Sequence[BatchTarget],
+    *,
+    workers: int = 1,
+    pe_backend: str = "builtin",
+    cache: AnalysisCache | None = None,
+    relocate: bool = False,
+    incremental: bool = True,
+    cleanup: bool = False,
+    intersections_report: str | Path | None = None,
+    scan: str = "exhaustive",
+    delta: bool = False,
+) -> list[BatchResult]:
+    """
+    Patch copies of the source file with several dictionaries, analysing the source file only once.
+    Errors of a single target don't stop the others, they are returned in the results.
+
+    :param source_file: path to the original executable
+    :param targets: dictionaries, their encodings and paths of the patched files
+    :param workers: number of processes to search cross-references and to patch the files
+    :param pe_backend: how to parse the headers, see PeImage
+    :param cache: analysis cache, if None then the cache is not used
+    :param relocate: relocate translations longer than the original strings instead of skipping them
+    :param incremental: use the manifests of the patched files if they match the source file
+    :param cleanup: remove a patched file on error
+    :param intersections_report: path to write a summary of the collisions of the cross-references to
+    :param scan: scan mode of the cross-references search, see find_relative_cross_references
+    :param delta: write delta files (see delta.py) instead of patched copies of the source file
+    :return: results in the order of the targets
+    """
+    patched_files = [Path(target.patched_file).resolve() for target in targets]
+    if len(set(patched_files)) != len(patched_files):
+        msg = "Patched files of the batch must be different"
+        raise ValueError(msg)
+
+    if Path(source_file).resolve() in patched_files:
+        msg = "Source file can't be a patched file of the batch"
+        raise ValueError(msg)
+
+    with Path(source_file).open("rb") as pe_file, open_pe_image(pe_file, backend=pe_backend) as pe:
+        analysis = analyse_for_translation(
+            pe,
+            workers=workers,
+            cache=cache,
+            intersections_report=intersections_report,
+            scan=scan,
+            relocate=relocate,
+        )
+
+    options = BatchOptions(
+        pe_backend=pe_backend,
+        relocate=relocate,
+        incremental=incremental,
+        cleanup=cleanup,
+        scan=scan,
+        delta=delta,
+    )
+    workers = min(workers, len(targets))
+    if workers <= 1:
+        return [_patch_target(str(source_file), analysis, options, target) for target in targets]
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_batch_worker,
+        initargs=(str(source_file), analysis, options),
+    ) as executor:
+        return list(executor.map(_patch_target_in_worker, targets))
+
+
+def format_batch_summary(results: Sequence[BatchResult]) -> list[str]:
+    lines = [f"{'patched file':<40} {'encoding':<10} {'applied':>8} {'skipped':>8}"]
+    for result in results:
+        target = result.target
+        if result.error is not None:
+            status = f"{'':>8} {'':>8}  error: {result.error}"
+        elif result.applied is None:
+            status = f"{'-':>8} {'-':>8}  up to date"
+        else:
+            status = f"{result.applied:>8} {result.skipped:>8}"
+        lines.append(f"{Path(target.patched_file).name:<40} {target.encoding:<10} {status}")
+
+    return lines
@@ -1,11 +1,20 @@
-from pathlib import Path
+"""
+Command line interface of the patcher. The modules which do the work (and numpy) are imported
+only when the command runs, so `patch --help` and the argument errors don't pay for them.
+"""
+
+import sys
+from typing import TYPE_CHECKING
 
 import click
-from loguru import logger
 
-from dfint64_patch.backup import copy_source_file_context
-from dfint64_patch.dictionary_loaders.csv_loader import load_translation_file
-from dfint64_patch.patching.patch import patch
+from dfint64_patch.cross_references.scan_modes import SCAN_MODES
+from dfint64_patch.dictionary_loaders.loader import open_translation_dictionary
+from dfint64_patch.metrics import collect_metrics, log_progress
+from dfint64_patch.pe.image import PE_BACKENDS
+
+if TYPE_CHECKING:
+    from dfint64_patch.analysis.cache import AnalysisCache
 
 
 @click.command()
@@ -15,19 +24,224 @@ from dfint64_patch.patching.patch import patch
     type=click.Path(exists=True, dir_okay=False, resolve_path=True),
 )
 @click.argument("patched_file", default="Dwarf Fortress Patched.exe")
-@click.option("--dict", "dictionary_file", help="Path to the dictionary csv file")
+@click.option("--dict", "dictionary_file", help="Path to the dictionary csv file or compiled dictionary")
 @click.option("--encoding", "encoding", help="Encoding for the translation", default="cp437")
 @click.option("--cleanup", "cleanup", help="Remove patched file on error", default=False)
-def main(source_file: str, patched_file: str, dictionary_file: str, encoding: str, cleanup: bool) -> None:  # noqa: FBT001
-    with copy_source_file_context(source_file, patched_file, cleanup=cleanup):
-        logger.info("Loading translation file...")
+@click.option("--jobs", "jobs", help="Number of processes to search cross references", default=1)
+@click.option("--pe-backend", "pe_backend", help="PE headers parser", type=click.Choice(PE_BACKENDS), default="builtin")
+@click.option("--cache/--no-cache", "cache", help="Use the cache of the analysis results", default=True)
+@click.option("--cache-dir", "cache_dir", help="Directory of the analysis cache", default=None)
+@click.option(
+    "--dry-run", "dry_run", is_flag=True, help="Only show what would be changed, don't write the patched file"
+)
+@click.option(
+    "--relocate",
+    "relocate",
+    is_flag=True,
+    help="Move translations longer than the original strings to free space or to a new section",
+)
+@click.option(
+    "--incremental/--full",
+    "incremental",
+    help="Update the patched file using its manifest (only the changed strings are rewritten) or rebuild it",
+    default=True,
+)
+@click.option(
+    "--intersections-report",
+    "intersections_report",
+    help="Write a summary of the collisions of the cross references to the file",
+    type=click.Path(dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--scan",
+    "scan",
+    help="Search cross references in every 4 bytes of the code or only in RIP-relative LEA/MOV instructions",
+    type=click.Choice(SCAN_MODES),
+    default="exhaustive",
+)
+@click.option(
+    "--metrics-out",
+    "metrics_out",
+    help="Write timings, throughput and memory usage of the stages to the JSON file",
+    type=click.Path(dir_okay=False),
+    default=None,
+)
+@click.option(
+    "--batch",
+    "batch",
+    help="Dictionary, encoding and patched file to produce from the source file (can be repeated), "
+    "the source file is analysed once and the files are patched in parallel. PATCHED_FILE and --dict are ignored",
+    type=(click.Path(exists=True, dir_okay=False), str, click.Path(dir_okay=False)),
+    multiple=True,
+)
+@click.option(
+    "--delta",
+    "delta",
+    is_flag=True,
+    help="Write a delta file (only the changed bytes) to PATCHED_FILE instead of a patched copy of the source file",
+)
+@click.option(
+    "--watch",
+    "watch",
+    is_flag=True,
+    help="Keep running and update the patched file(s) every time the dictionary csv file(s) change",
+)
+def main(  # noqa: PLR0913
+    source_file: str,
+    patched_file: str,
+    *,
+    dictionary_file: str,
+    encoding: str,
+    cleanup: bool,
+    jobs: int,
+    pe_backend: str,
+    cache: bool,
+    cache_dir: str | None,
+    dry_run: bool,
+    relocate: bool,
+    incremental: bool,
+    intersections_report: str | None,
+    scan: str,
+    metrics_out: str | None,
+    batch: tuple[tuple[str, str, str], ...],
+    delta: bool,
+    watch: bool,
+) -> None:
+    if batch and dry_run:
+        msg = "--dry-run is not supported with --batch"
+        raise click.UsageError(msg)
+
+    if watch and (dry_run or delta):
+        msg = "--watch is not supported with --dry-run and --delta"
+        raise click.UsageError(msg)
+
+    from dfint64_patch.analysis.cache import AnalysisCache  # noqa: PLC0415
+    from dfint64_patch.patching.batch import BatchTarget, format_batch_summary, patch_batch  # noqa: PLC0415
+    from dfint64_patch.patching.watch import TranslationWatcher  # noqa: PLC0415
+
+    analysis_cache = AnalysisCache(cache_dir) if cache else None
+
+    with collect_metrics(progress=log_progress) as metrics:
+        if watch:
+            results = []
+            TranslationWatcher(
+                source_file,
+                [BatchTarget(*target) for target in batch] or [BatchTarget(dictionary_file, encoding, patched_file)],
+                workers=jobs,
+                pe_backend=pe_backend,
+                cache=analysis_cache,
+                relocate=relocate,
+                intersections_report=intersections_report,
+                scan=scan,
+            ).run()
+        elif batch:
+            results = patch_batch(
+                source_file,
+                [BatchTarget(*target) for target in batch],
+                workers=jobs,
+                pe_backend=pe_backend,
+                cache=analysis_cache,
+                relocate=relocate,
+                incremental=incremental,
+                cleanup=cleanup,
+                intersections_report=intersections_report,
+                scan=scan,
+                delta=delta,
+            )
+            for line in format_batch_summary(results):
+                print(line)
+        else:
+            results = []
+            _run(
+                source_file,
+                patched_file,
+                dictionary_file=dictionary_file,
+                encoding=encoding,
+                cleanup=cleanup,
+                jobs=jobs,
+                pe_backend=pe_backend,
+                cache=analysis_cache,
+                dry_run=dry_run,
+                relocate=relocate,
+                incremental=incremental,
+                intersections_report=intersections_report,
+                scan=scan,
+                delta=delta,
+            )
+
+    if metrics_out is not None:
+        metrics.save(metrics_out)
+
+    if any(result.error is not None for result in results):
+        sys.exit(1)
+
+
+def _run(  # noqa: PLR0913
+    source_file: str,
+    patched_file: str,
+    *,
+    dictionary_file: str,
+    encoding: str,
+    cleanup: bool,
+    jobs: int,
+    pe_backend: str,
+    cache: "AnalysisCache | None",
+    dry_run: bool,
+    relocate: bool,
+    incremental: bool,
+    intersections_report: str | None,
+    scan: str,
+    delta: bool,
+) -> None:
+    from dfint64_patch.patching.delta import save_delta  # noqa: PLC0415
+    from dfint64_patch.patching.incremental import update_patched_file  # noqa: PLC0415
+    from dfint64_patch.patching.patch import patch  # noqa: PLC0415
+
+    if dry_run or delta:
+        with open_translation_dictionary(dictionary_file) as translation_table:
+            plan = patch(
+                source_file,
+                translation_table,
+                encoding,
+                workers=jobs,
+                pe_backend=pe_backend,
+                cache=cache,
+                dry_run=True,
+                relocate=relocate,
+                intersections_report=intersections_report,
+                scan=scan,
+            )
+
+        if delta and not dry_run:
+            save_delta(source_file, plan, patched_file)
+            return
 
-        with Path(dictionary_file).open(encoding="utf-8") as trans:
-            translation_table = list(load_translation_file(trans))
+        stats = plan.stats()
+        print(f"Edits: {stats.edits}")
+        print(f"Writes after coalescing: {stats.writes}")
+        print(f"Bytes to write: {stats.bytes_total}")
+        if stats.first_offset is not None:
+            print(f"Patched range: 0x{stats.first_offset:x}-0x{stats.last_offset:x}")
+        return
 
+    with open_translation_dictionary(dictionary_file) as translation_table:
         print(source_file)  # TODO: split translation table for debugging
 
-        patch(patched_file, translation_table, encoding)
+        update_patched_file(
+            source_file,
+            patched_file,
+            translation_table,
+            encoding,
+            workers=jobs,
+            pe_backend=pe_backend,
+            cache=cache,
+            relocate=relocate,
+            incremental=incremental,
+            cleanup=cleanup,
+            intersections_report=intersections_report,
+            scan=scan,
+        )
 
 
 if __name__ == "__main__":
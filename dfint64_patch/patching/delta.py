@@ -0,0 +1,194 @@
+"""
+Delta files: the changes of a patched executable relative to the source one, instead of a full patched copy.
+
+Layout (little-endian):
+    header: magic, format version, number of runs, size and SHA-256 of the source file,
+            size and SHA-256 of the patched file
+    runs: offset and length of every run, sorted by offset, non-overlapping
+    data: bytes of the runs one after another
+
+A delta is applied in place to a file identical to the source one through a writable memory map.
+"""
+
+import hashlib
+import struct
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+from loguru import logger
+
+from dfint64_patch.patching.incremental import file_sha256
+from dfint64_patch.patching.patch_plan import PatchPlan
+from dfint64_patch.type_aliases import Offset
+
+DELTA_MAGIC = b"DF64DLT\0"
+DELTA_VERSION = 1
+
+_HASH_SIZE = 32
+_HEADER = struct.Struct(f"<8sIIQQ{_HASH_SIZE}sQ{_HASH_SIZE}s")
+_RUN = struct.Struct("<QQ")
+_HASH_CHUNK_SIZE = 0x100000
+
+
+class DeltaHeader(NamedTuple):
+    runs: int
+    source_size: int
+    source_sha256: str
+    target_size: int
+    target_sha256: str
+
+
+class Delta(NamedTuple):
+    header: DeltaHeader
+    plan: PatchPlan
+
+
+def patched_sha256(source_file: str | Path, plan: PatchPlan) -> tuple[int, str]:
+    """
+    Calculate the size and the hash of the file patched with the plan without writing it
+
+    :param source_file: path to the source file
+    :param plan: patch plan
+    :return: size and SHA-256 of the patched file
+    """
+    file_hash = hashlib.sha256()
+    position = 0
+    with Path(source_file).open("rb") as file:
+        for edit in plan.coalesced():
+            while position < edit.offset:
+                chunk = file.read(min(_HASH_CHUNK_SIZE, edit.offset - position))
+                if not chunk:  # the edit is beyond the end of the source file, the file is extended with zeros
+                    chunk = bytes(edit.offset - position)
+                file_hash.update(chunk)
+                position += len(chunk)
+
+            file_hash.update(edit.data)
+            file.seek(edit.end)
+            position = edit.end
+
+        while chunk := file.read(_HASH_CHUNK_SIZE):
+            file_hash.update(chunk)
+            position += len(chunk)
+
+    return position, file_hash.hexdigest()
+
+
+def write_delta(source_file: str | Path, plan: PatchPlan, file_object: BinaryIO) -> DeltaHeader:
+    """
+    Write the plan to a delta file
+
+    :param source_file: path to the source file the plan is made for
+    :param plan: patch plan
+    :param file_object: output file opened in binary mode
+    :return: DeltaHeader
+    """
+    runs = list(plan.coalesced())
+    target_size, target_sha256 = patched_sha256(source_file, plan)
+    header = DeltaHeader(
+        runs=len(runs),
+        source_size=Path(source_file).stat().st_size,
+        source_sha256=file_sha256(source_file),
+        target_size=target_size,
+        target_sha256=target_sha256,
+    )
+    file_object.write(
+        _HEADER.pack(
+            DELTA_MAGIC,
+            DELTA_VERSION,
+            0,
+            header.runs,
+            header.source_size,
+            bytes.fromhex(header.source_sha256),
+            header.target_size,
+            bytes.fromhex(header.target_sha256),
+        )
+    )
+    file_object.write(b"".join(_RUN.pack(run.offset, len(run.data)) for run in runs))
+    file_object.writelines(run.data for run in runs)
+
+    return header
+
+
+def save_delta(source_file: str | Path, plan: PatchPlan, path: str | Path) -> DeltaHeader:
+    with Path(path).open("wb") as file:
+        header = write_delta(source_file, plan, file)
+
+    logger.info(f"Delta of {header.runs} runs ({sum(len(edit.data) for edit in plan)} bytes) is written to {path}")
+    return header
+
+
+def read_delta(data: bytes) -> Delta:
+    """
+    Parse a delta file
+
+    :param data: contents of the delta file
+    :return: Delta
+    """
+    if len(data) < _HEADER.size:
+        msg = "Delta file is truncated"
+        raise ValueError(msg)
+
+    magic, version, _, runs_count, source_size, source_hash, target_size, target_hash = _HEADER.unpack_from(data)
+    if magic != DELTA_MAGIC or version != DELTA_VERSION:
+        msg = "Unsupported delta file format"
+        raise ValueError(msg)
+
+    data_offset = _HEADER.size + runs_count * _RUN.size
+    if len(data) < data_offset:
+        msg = "Delta file is truncated"
+        raise ValueError(msg)
+
+    plan = PatchPlan()
+    position = data_offset
+    for offset, length in _RUN.iter_unpack(data[_HEADER.size : data_offset]):
+        if position + length > len(data):
+            msg = "Delta file is truncated"
+            raise ValueError(msg)
+
+        plan.add(Offset(offset), data[position : position + length])
+        position += length
+
+    if position != len(data):
+        msg = "Delta file has extra data"
+        raise ValueError(msg)
+
+    header = DeltaHeader(runs_count, source_size, source_hash.hex(), target_size, target_hash.hex())
+    return Delta(header, plan)
+
+
+def load_delta(path: str | Path) -> Delta:
+    return read_delta(Path(path).read_bytes())
+
+
+def apply_delta(delta: Delta, target_file: str | Path, *, verify: bool = True) -> bool:
+    """
+    Apply a delta in place to a file identical to the source file of the delta
+
+    :param delta: Delta
+    :param target_file: path to the file to patch
+    :param verify: check the hashes of the file before and after patching
+    :return: True if the delta is applied, False if the file is already patched with it
+    """
+    header = delta.header
+    target_file = Path(target_file)
+    if verify:
+        current_sha256 = file_sha256(target_file)
+        if current_sha256 == header.target_sha256:
+            logger.info(f"{target_file} is already patched")
+            return False
+
+        if current_sha256 != header.source_sha256:
+            msg = f"{target_file} doesn't match the source file of the delta"
+            raise ValueError(msg)
+    elif target_file.stat().st_size != header.source_size:
+        msg = f"Size of {target_file} doesn't match the source file of the delta"
+        raise ValueError(msg)
+
+    with target_file.open("r+b") as file:
+        delta.plan.apply(file)  # in place through a writable memory map
+
+    if verify and file_sha256(target_file) != header.target_sha256:
+        msg = f"{target_file} doesn't match the patched file of the delta after patching"
+        raise ValueError(msg)
+
+    return True
@@ -0,0 +1,408 @@
+"""
+Incremental re-patching.
+
+After patching, a manifest is written next to the patched file. It records hashes of the source file,
+of the dictionary and of the patched file, and all the edits applied to the source file with the original bytes.
+On the next run against the same source file only the edits which differ from the manifest are written:
+the original bytes are restored for the edits which are gone, and the new edits are applied.
+"""
+
+import hashlib
+import json
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import NamedTuple
+
+from loguru import logger
+
+from dfint64_patch.analysis.analyse import Analysis
+from dfint64_patch.analysis.cache import AnalysisCache
+from dfint64_patch.backup import copy_source_file_context
+from dfint64_patch.dictionary_loaders.binary_dictionary import BinaryDictionary
+from dfint64_patch.metrics import stage
+from dfint64_patch.patching.patch import (
+    TranslatedString,
+    TranslationPatch,
+    as_translation_dictionary,
+    build_patch_plan,
+    plan_analysed_translation,
+    plan_translation,
+)
+from dfint64_patch.patching.patch_plan import PatchPlan
+from dfint64_patch.pe.image import PeImage, open_pe_image
+from dfint64_patch.type_aliases import Offset, Rva, TranslationTable
+
+MANIFEST_FORMAT_VERSION = 1
+MANIFEST_SUFFIX = ".manifest.json"
+
+_HASH_CHUNK_SIZE = 0x100000
+
+
+class ManifestEdit(NamedTuple):
+    offset: Offset
+    original: bytes  # shorter than data (or empty) if the edit is beyond the end of the source file
+    data: bytes
+
+
+class PatchedFileUpdate(NamedTuple):
+    translation_patch: TranslationPatch  # the applied patch
+    manifest: "PatchManifest"  # the saved manifest of the updated patched file
+
+
+@dataclass
+class PatchManifest:
+    source_sha256: str
+    source_size: int
+    dictionary_sha256: str
+    encoding: str
+    relocate: bool
+    output_sha256: str
+    strings: list[TranslatedString]
+    edits: list[ManifestEdit]
+    scan: str = "exhaustive"
+
+    def to_json(self) -> dict:
+        return {
+            "version": MANIFEST_FORMAT_VERSION,
+            **{field.name: getattr(self, field.name) for field in fields(self)},
+            "strings": [item._asdict() for item in self.strings],
+            "edits": [
+                {"offset": edit.offset, "original": edit.original.hex(), "data": edit.data.hex()} for edit in self.edits
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "PatchManifest":
+        if data.get("version") != MANIFEST_FORMAT_VERSION:
+            msg = f"Unsupported manifest version: {data.get('version')!r}"
+            raise ValueError(msg)
+
+        return cls(
+            source_sha256=data["source_sha256"],
+            source_size=data["source_size"],
+            dictionary_sha256=data["dictionary_sha256"],
+            encoding=data["encoding"],
+            relocate=data["relocate"],
+            output_sha256=data["output_sha256"],
+            strings=[
+                TranslatedString(Rva(item["rva"]), item["original"], item["translation"]) for item in data["strings"]
+            ],
+            edits=[
+                ManifestEdit(Offset(edit["offset"]), bytes.fromhex(edit["original"]), bytes.fromhex(edit["data"]))
+                for edit in data["edits"]
+            ],
+            scan=data.get("scan", "exhaustive"),
+        )
+
+
+def manifest_path(patched_file: str | Path) -> Path:
+    patched_file = Path(patched_file)
+    return patched_file.with_name(patched_file.name + MANIFEST_SUFFIX)
+
+
+def load_manifest(path: Path) -> PatchManifest | None:
+    try:
+        with path.open(encoding="utf-8") as file:
+            return PatchManifest.from_json(json.load(file))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as ex:
+        logger.warning(f"Failed to read patch manifest {path}: {ex}")
+        return None
+
+
+def save_manifest(manifest: PatchManifest, path: Path) -> None:
+    # json.dumps uses the C encoder, json.dump writes chunk by chunk with the much slower pure python one
+    path.write_text(json.dumps(manifest.to_json(), ensure_ascii=False), encoding="utf-8")
+
+
+def file_sha256(path: str | Path) -> str:
+    file_hash = hashlib.sha256()
+    with Path(path).open("rb") as file:
+        while chunk := file.read(_HASH_CHUNK_SIZE):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def translation_table_sha256(translation_table: TranslationTable) -> str:
+    if isinstance(translation_table, BinaryDictionary):
+        return hashlib.sha256(translation_table.data).hexdigest()
+
+    if isinstance(translation_table, Mapping):
+        translation_table = translation_table.items()
+
+    return hashlib.sha256(json.dumps(list(translation_table), ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def diff_edits(old_edits: list[ManifestEdit], new_edits: list[ManifestEdit]) -> tuple[PatchPlan, PatchPlan] | None:
+    """
+    Calculate edits to turn a file patched with the old edits into the file patched with the new ones
+
+    :param old_edits: edits applied to the file
+    :param new_edits: edits which should be applied instead
+    :return: a plan to restore the original bytes and a plan to apply the changed edits (to be applied in this order),
+             or None if the file can't be updated in place (e.g. its size changes)
+    """
+    old_set = {(edit.offset, edit.data) for edit in old_edits}
+    new_set = {(edit.offset, edit.data) for edit in new_edits}
+
+    restore_plan = PatchPlan()
+    for edit in old_edits:
+        if (edit.offset, edit.data) not in new_set:
+            if len(edit.original) != len(edit.data):
+                return None  # the edit extends the file
+
+            restore_plan.add(edit.offset, edit.original)
+
+    update_plan = PatchPlan()
+    for edit in new_edits:
+        if (edit.offset, edit.data) not in old_set:
+            if len(edit.original) != len(edit.data):
+                return None
+
+            update_plan.add(edit.offset, edit.data)
+
+    return restore_plan, update_plan
+
+
+def update_patched_file(  # noqa: PLR0913
+    source_file: str | Path,
+    patched_file: str | Path,
+    translation_table: TranslationTable,
+    encoding: str,
+    *,
+    workers: int = 1,
+    pe_backend: str = "builtin",
+    cache: AnalysisCache | None = None,
+    relocate: bool = False,
+    incremental: bool = True,
+    cleanup: bool = False,
+    intersections_report: str | Path | None = None,
+    scan: str = "exhaustive",
+    analysis: Analysis | None = None,
+    translation_patch: TranslationPatch | None = None,
+    source_sha256: str | None = None,
+    output_sha256: str | None = None,
+) -> PatchedFileUpdate | None:
+    """
+    Patch a copy of the source file, or update the previously patched file using its manifest
+
+    :param source_file: path to the original executable
+    :param patched_file: path to the patched executable
+    :param translation_table: pairs of a string and its translation, or a mapping (e.g. a compiled dictionary)
+    :param encoding: encoding of the translations
+    :param workers: number of processes to search cross-references
+    :param pe_backend: how to parse the headers, see PeImage
+    :param cache: analysis cache, if None then the cache is not used
+    :param relocate: relocate translations longer than the original strings instead of skipping them
+    :param incremental: use the manifest of the patched file if it matches the source file
+    :param cleanup: remove the patched file on error
+    :param intersections_report: path to write a summary of the collisions of the cross-references to
+    :param scan: scan mode of the cross-references search, see find_relative_cross_references
+    :param analysis: results of the analysis of the source file made with the same scan mode
+                     (e.g. shared between several translations), if None then the file is analysed
+    :param translation_patch: plan of the translation table already made by the caller,
+                              if None then the plan is made here
+    :param source_sha256: hash of the source file known by the caller, if None then the source file is hashed
+    :param output_sha256: hash of the patched file known by the caller (e.g. from the manifest of the previous
+                          update), if None then the patched file is hashed to check it against its manifest
+    :return: the applied TranslationPatch and the saved manifest, None if the patched file is up to date
+    """
+    patched_file = Path(patched_file)
+    if source_sha256 is None:
+        source_sha256 = file_sha256(source_file)
+
+    dictionary_sha256 = translation_table_sha256(translation_table)
+
+    path = manifest_path(patched_file)
+    manifest = load_manifest(path) if incremental else None
+    if manifest is not None and (
+        manifest.source_sha256 != source_sha256
+        or not patched_file.exists()
+        or manifest.output_sha256 != (output_sha256 or file_sha256(patched_file))
+    ):
+        logger.info("Patched file doesn't match its manifest, it will be rebuilt")
+        manifest = None
+
+    parameters = (dictionary_sha256, encoding, relocate, scan)
+    if (
+        manifest is not None
+        and (
+            manifest.dictionary_sha256,
+            manifest.encoding,
+            manifest.relocate,
+            manifest.scan,
+        )
+        == parameters
+    ):
+        logger.info("Patched file is up to date")
+        return None
+
+    with Path(source_file).open("rb") as pe_file, open_pe_image(pe_file, backend=pe_backend) as pe:
+        source_size = len(pe.data)
+        if translation_patch is None:
+            if analysis is None:
+                translation_patch = plan_translation(
+                    pe,
+                    translation_table,
+                    encoding,
+                    workers=workers,
+                    cache=cache,
+                    relocate=relocate,
+                    intersections_report=intersections_report,
+                    scan=scan,
+                )
+            else:
+                translation_patch = plan_analysed_translation(
+                    pe, analysis, translation_table, encoding, relocate=relocate
+                )
+
+        plan, translated, _ = translation_patch
+        edits = [ManifestEdit(edit.offset, bytes(pe.data[edit.offset : edit.end]), edit.data) for edit in plan]
+
+    plans = diff_edits(manifest.edits, edits) if manifest is not None else None
+    path.unlink(missing_ok=True)  # the manifest is not valid while the file is being changed
+    if plans is not None:
+        restore_plan, update_plan = plans
+        logger.info(f"Updating patched file: {len(restore_plan)} edits restored, {len(update_plan)} edits applied")
+        size = restore_plan.stats().bytes_total + update_plan.stats().bytes_total
+        with stage("patch_writing", size=size) as stage_metrics, patched_file.open("r+b") as output_file:
+            restore_plan.apply(output_file)
+            update_plan.apply(output_file)
+            stage_metrics.items += len(restore_plan) + len(update_plan)
+    else:
+        with (
+            stage("patch_writing", size=plan.stats().bytes_total) as stage_metrics,
+            copy_source_file_context(source_file, patched_file, cleanup=cleanup),
+            patched_file.open("r+b") as file,
+        ):
+            plan.apply(file)
+            stage_metrics.items += len(plan)
+
+    manifest = PatchManifest(
+        source_sha256=source_sha256,
+        source_size=source_size,
+        dictionary_sha256=dictionary_sha256,
+        encoding=encoding,
+        relocate=relocate,
+        output_sha256=file_sha256(patched_file),
+        strings=translated,
+        edits=edits,
+        scan=scan,
+    )
+    save_manifest(manifest, path)
+    return PatchedFileUpdate(translation_patch, manifest)
+
+
+class LivePatchedFile:
+    """
+    Patched file which is kept up to date in place by changes of some translations (the watch mode).
+    The manifest is kept in memory: an update writes only the edits of the changed strings, and the manifest
+    (with the hash of the whole patched file) is saved only by save(). Until then there is no manifest on disk,
+    so if the process is killed, the next run rebuilds the patched file.
+    Longer translations are not relocated, the relocation depends on all of them.
+    """
+
+    def __init__(
+        self,
+        patched_file: str | Path,
+        manifest: PatchManifest,
+        translation_patch: TranslationPatch,
+        translation_table: TranslationTable,
+    ) -> None:
+        """
+        :param patched_file: path to the patched executable
+        :param manifest: manifest of the patched file, it must match the file
+        :param translation_patch: plan the patched file is made with
+        :param translation_table: translations the patched file is made with
+        """
+        if manifest.relocate:
+            msg = "Patched files with relocated translations can't be updated in place"
+            raise ValueError(msg)
+
+        self.patched_file = Path(patched_file)
+        self.manifest = manifest
+        self.translation_table = translation_table
+        self.skipped = translation_patch.skipped
+        self.dirty = False  # the manifest on disk doesn't match the patched file or the translations
+        self._edits = {edit.offset: edit for edit in manifest.edits}
+        self._translated = {item.rva: item for item in translation_patch.translated}
+
+    @property
+    def translated(self) -> int:
+        return len(self._translated)
+
+    def set_translation_table(self, translation_table: TranslationTable) -> None:
+        """
+        Replace the translations which don't change the patched file (e.g. only translations of other strings changed)
+        """
+        self.translation_table = translation_table
+        self.dirty = True
+
+    def update(
+        self,
+        pe: PeImage,
+        strings: Mapping[Rva, str],
+        translation_table: TranslationTable,
+        old_dictionary: Mapping[str, str],
+    ) -> int:
+        """
+        Write the changed translations of the strings to the patched file
+
+        :param pe: PE image of the source file
+        :param strings: strings which translations are changed, by their RVA
+        :param translation_table: all the current translations
+        :param old_dictionary: translations the patched file is made with
+        :return: number of the written edits
+        """
+        # The strings had a translation, but it wasn't applied
+        previously_skipped = sum(
+            1 for rva, string in strings.items() if old_dictionary.get(string) and rva not in self._translated
+        )
+        changed = build_patch_plan(pe, strings, as_translation_dictionary(translation_table), self.manifest.encoding)
+        new_edits = {edit.offset: edit for edit in changed.plan}
+
+        plan = PatchPlan()
+        for rva in strings:
+            self._translated.pop(rva, None)
+            offset = pe.rva_to_offset(rva)
+            old_edit = self._edits.pop(offset, None)
+            new_edit = new_edits.get(offset)
+            if new_edit is not None:
+                self._edits[offset] = ManifestEdit(offset, bytes(pe.data[offset : new_edit.end]), new_edit.data)
+                if old_edit is None or old_edit.data != new_edit.data:
+                    plan.add(offset, new_edit.data)
+            elif old_edit is not None:
+                plan.add(offset, old_edit.original)
+
+        for item in changed.translated:
+            self._translated[item.rva] = item
+
+        self.skipped += changed.skipped - previously_skipped
+        self.translation_table = translation_table
+        if not self.dirty:
+            manifest_path(self.patched_file).unlink(missing_ok=True)  # it's not valid while the file is being changed
+            self.dirty = True
+
+        with stage("patch_writing", size=plan.stats().bytes_total) as stage_metrics:
+            with self.patched_file.open("r+b") as file:
+                plan.apply(file)
+            stage_metrics.items += len(plan)
+
+        return len(plan)
+
+    def save(self) -> None:
+        """
+        Save the manifest if it's changed, the patched file is hashed here
+        """
+        if not self.dirty:
+            return
+
+        self.manifest.edits = sorted(self._edits.values())
+        self.manifest.strings = sorted(self._translated.values())
+        self.manifest.dictionary_sha256 = translation_table_sha256(self.translation_table)
+        self.manifest.output_sha256 = file_sha256(self.patched_file)
+        save_manifest(self.manifest, manifest_path(self.patched_file))
+        self.dirty = False
@@ -0,0 +1,86 @@
+"""
+Summary of collisions of the cross-references (references which overlap each other, so at least one of them is false).
+Instead of logging every colliding pair, the collisions are counted by the referenced strings
+and the strings with the most colliding references are reported.
+"""
+
+from collections import Counter
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import NamedTuple
+
+from loguru import logger
+
+from dfint64_patch.type_aliases import Rva
+
+DEFAULT_TOP_COUNT = 20
+
+
+class IntersectionsSummary(NamedTuple):
+    collisions: int  # number of colliding pairs
+    references: int  # number of distinct colliding references
+    objects: int  # number of distinct objects referenced by the colliding references
+    worst_objects: list[tuple[Rva, int]]  # objects with the most colliding references and the numbers of the references
+
+
+def summarize_intersections(
+    intersections: Iterable[tuple[Rva, Rva]],
+    object_rva_by_reference: Mapping[Rva, Rva],
+    *,
+    top: int = DEFAULT_TOP_COUNT,
+) -> IntersectionsSummary:
+    """
+    Count collisions of the cross-references
+
+    :param intersections: pairs of colliding references
+    :param object_rva_by_reference: mapping of a reference to its destination
+    :param top: number of the worst objects to report
+    :return: IntersectionsSummary
+    """
+    collisions = 0
+    references: set[Rva] = set()
+    for pair in intersections:
+        collisions += 1
+        references.update(pair)
+
+    objects = Counter(object_rva_by_reference[reference] for reference in references)
+    return IntersectionsSummary(
+        collisions=collisions,
+        references=len(references),
+        objects=len(objects),
+        worst_objects=objects.most_common(top),
+    )
+
+
+def format_intersections_summary(summary: IntersectionsSummary, strings: Mapping[Rva, str]) -> list[str]:
+    lines = [
+        f"Colliding pairs of references: {summary.collisions}",
+        f"Colliding references: {summary.references}",
+        f"Objects with colliding references: {summary.objects}",
+    ]
+    if summary.worst_objects:
+        lines.append(f"Top {len(summary.worst_objects)} objects by the number of colliding references:")
+        lines.extend(f"{count:8} 0x{rva:x} {strings.get(rva)!r}" for rva, count in summary.worst_objects)
+
+    return lines
+
+
+def report_intersections(
+    summary: IntersectionsSummary,
+    strings: Mapping[Rva, str],
+    report_file: str | Path | None = None,
+) -> None:
+    """
+    Log the counts of the collisions and write the full summary to a file
+
+    :param summary: summary of the collisions
+    :param strings: strings by their RVA
+    :param report_file: path to the report file, if None then only the counts are logged
+    """
+    logger.info(
+        f"Found {summary.collisions} collisions of {summary.references} references to {summary.objects} objects"
+    )
+    if report_file is not None:
+        lines = format_intersections_summary(summary, strings)
+        Path(report_file).write_text("\n".join(lines) + "\n", encoding="utf-8")
+        logger.info(f"Intersections report is written to {report_file}")
@@ -1,77 +1,278 @@
-from collections.abc import Iterable, Mapping
+import codecs
+from collections.abc import Callable, Mapping
 from pathlib import Path
+from typing import NamedTuple
 
-import lief
 from loguru import logger
 
+from dfint64_patch.analysis.analyse import Analysis, AnalysisParameters, analyse_pe_image
+from dfint64_patch.analysis.cache import AnalysisCache
 from dfint64_patch.cross_references.cross_references_relative import (
     find_intersected_cross_references,
-    find_relative_cross_references,
     invert_cross_reference_table,
 )
-from dfint64_patch.extract_strings.from_raw_bytes import extract_strings_from_raw_bytes
-from dfint64_patch.type_aliases import Rva
-
-
-def patch(patched_file: str | Path, translation_table: list[tuple[str, str]], encoding: str) -> None:
-    with Path(patched_file).open("r+b") as pe_file:
-        pe = lief.PE.parse(pe_file)
-        assert pe is not None
-
-        code_section = pe.sections[0]
-        data_section = pe.sections[1]
-
-        logger.info("Extracting strings...")
-        strings = {
-            item.address: item.string
-            for item in extract_strings_from_raw_bytes(
-                data_section.content,
-                base_address=Rva(data_section.virtual_address),
-            )
-        }
-
-        logger.info(f"Found {len(strings)} string-like objects")
-
-        logger.info("Searching for cross references...")
-        cross_references = find_relative_cross_references(
-            code_section.content,
-            base_address=Rva(code_section.virtual_address),
-            addresses=strings,
-        )
+from dfint64_patch.dictionary_loaders.binary_dictionary import BinaryDictionary
+from dfint64_patch.metrics import count, stage
+from dfint64_patch.patching.intersections import report_intersections, summarize_intersections
+from dfint64_patch.patching.patch_plan import PatchPlan
+from dfint64_patch.patching.relocation import relocate_strings
+from dfint64_patch.pe.image import PeImage, open_pe_image
+from dfint64_patch.type_aliases import Rva, TranslationTable
+
+
+class TranslatedString(NamedTuple):
+    rva: Rva
+    original: str
+    translation: str
+
+
+class TranslationPatch(NamedTuple):
+    plan: PatchPlan
+    translated: list[TranslatedString]  # strings for which the translations are applied
+    skipped: int = 0  # strings which have translations, but the translations can't be applied
+
+
+def _translation_getter(
+    translation_dictionary: Mapping[str, str],
+    encoding: str,
+) -> Callable[[str], tuple[str, bytes] | None]:
+    """
+    :return: function which looks a string up in the dictionary once and returns its translation, decoded and encoded
+    """
+    # Compiled dictionaries contain already encoded translations
+    if isinstance(translation_dictionary, BinaryDictionary) and (
+        codecs.lookup(translation_dictionary.encoding).name == codecs.lookup(encoding).name
+    ):
+        get_encoded = translation_dictionary.get_encoded
+
+        def get_compiled_translation(string: str) -> tuple[str, bytes] | None:
+            encoded_translation = get_encoded(string)
+            return (encoded_translation.decode(encoding), encoded_translation) if encoded_translation else None
+
+        return get_compiled_translation
+
+    def get_translation(string: str) -> tuple[str, bytes] | None:
+        translation = translation_dictionary.get(string)
+        return (translation, translation.encode(encoding)) if translation else None
 
-        object_rva_by_reference = invert_cross_reference_table(cross_references)
-
-        logger.info(f"Found {len(cross_references)} objects with references from code section")
-        logger.info(f"In total {sum(map(len, cross_references.values()))} cross references")
-
-        logger.info("Searching intersections in the cross references...")
-
-        intersections = list(find_intersected_cross_references(cross_references))
-        print_intersections(intersections, object_rva_by_reference, strings)
-
-        translation_dictionary = dict(translation_table)
-        for rva, string in strings.items():
-            translation = translation_dictionary.get(string)
-            if translation:
-                if len(translation) <= len(string):
-                    # Shorter strings are padded with spaces
-                    encoded_translation = translation.encode(encoding).ljust(len(string) + 1) + b"\0"
-                    pe_file.seek(pe.rva_to_offset(rva))
-                    pe_file.write(encoded_translation)
-                else:
-                    # TODO: implement this case
-                    logger.warning(f"Translation for string {string!r} is longer than original one ({translation!r})")
-
-
-def print_intersections(
-    intersections: Iterable[tuple[Rva, Rva]],
-    object_rva_by_reference: Mapping[Rva, Rva],
-    strings: dict[Rva, str],
-) -> None:
-    for ref1, ref2 in intersections:
-        obj1_rva = object_rva_by_reference[ref1]
-        obj2_rva = object_rva_by_reference[ref2]
+    return get_translation
+
+
+def as_translation_dictionary(translation_table: TranslationTable) -> Mapping[str, str]:
+    return translation_table if isinstance(translation_table, Mapping) else dict(translation_table)
+
+
+def build_patch_plan(
+    pe: PeImage,
+    strings: Mapping[Rva, str],
+    translation_dictionary: Mapping[str, str],
+    encoding: str,
+    *,
+    cross_references: Mapping[Rva, list[Rva]] | None = None,
+) -> TranslationPatch:
+    """
+    Calculate edits of the file to replace the strings with their translations
+
+    :param pe: PE image
+    :param strings: strings of the file by their RVA
+    :param translation_dictionary: translations of the strings
+    :param encoding: encoding of the translations
+    :param cross_references: references to the strings, if given then translations longer than the original strings
+                             are relocated (see relocate_strings), otherwise they are skipped
+    :return: TranslationPatch
+    """
+    plan = PatchPlan()
+    translated: dict[Rva, TranslatedString] = {}
+    longer_translations: dict[Rva, bytes] = {}
+    skipped = 0
+    get_translation = _translation_getter(translation_dictionary, encoding)
+    for rva, string in strings.items():
+        found = get_translation(string)
+        if found is not None:
+            translation, encoded_translation = found
+            if len(encoded_translation) <= len(string):
+                # Shorter strings are padded with spaces
+                plan.add(pe.rva_to_offset(rva), encoded_translation.ljust(len(string)) + b"\0")
+                translated[rva] = TranslatedString(rva, string, translation)
+            elif cross_references is not None:
+                longer_translations[rva] = encoded_translation
+                translated[rva] = TranslatedString(rva, string, translation)
+            else:
+                logger.warning(f"Translation for string {string!r} is longer than original one ({translation!r})")
+                skipped += 1
+
+    if cross_references is not None and longer_translations:
+        stats = relocate_strings(pe, strings, cross_references, longer_translations, plan)
         logger.info(
-            f"0x{ref1:x} (to 0x{obj1_rva:x} {strings[obj1_rva]!r}) / "
-            f"0x{ref2:x} (to 0x{obj2_rva:x} {strings[obj2_rva]!r})",
+            f"Longer translations: {stats.extended_in_place} extended in place, {stats.moved} moved "
+            f"({stats.placed_in_slack} placed in padding, new section of {stats.new_section_size} bytes), "
+            f"{len(stats.skipped)} skipped"
+        )
+        for rva in stats.skipped:
+            del translated[rva]
+        skipped += len(stats.skipped)
+
+    return TranslationPatch(plan, list(translated.values()), skipped)
+
+
+def plan_analysed_translation(
+    pe: PeImage,
+    analysis: Analysis,
+    translation_table: TranslationTable,
+    encoding: str,
+    *,
+    relocate: bool = False,
+) -> TranslationPatch:
+    """
+    Calculate edits to replace the strings of the executable with their translations using results of its analysis
+
+    :param pe: PE image
+    :param analysis: results of the analysis of the executable, see analyse_pe_image
+    :param translation_table: pairs of a string and its translation, or a mapping (e.g. a compiled dictionary)
+    :param encoding: encoding of the translations
+    :param relocate: relocate translations longer than the original strings instead of skipping them
+    :return: TranslationPatch
+    """
+    with stage("build_patch_plan") as stage_metrics:
+        result = build_patch_plan(
+            pe,
+            {item.address: item.string for item in analysis.strings},
+            as_translation_dictionary(translation_table),
+            encoding,
+            cross_references=analysis.cross_references if relocate else None,
         )
+        stats = result.plan.stats()
+        stage_metrics.items = stats.edits
+        stage_metrics.bytes = stats.bytes_total
+
+    count("translated_strings", len(result.translated))
+    logger.info(f"Patch plan: {stats.edits} edits in {stats.writes} writes, {stats.bytes_total} bytes in total")
+    return result
+
+
+def analyse_for_translation(  # noqa: PLR0913
+    pe: PeImage,
+    *,
+    workers: int = 1,
+    cache: AnalysisCache | None = None,
+    intersections_report: str | Path | None = None,
+    scan: str = "exhaustive",
+    relocate: bool = False,
+    subroutines: str | None = None,
+) -> Analysis:
+    """
+    Analyse the executable and report collisions of the found cross-references.
+    The absolute references are only needed to relocate the strings, so they are searched only if relocate is set.
+
+    :param pe: PE image
+    :param workers: number of processes to search cross-references
+    :param cache: analysis cache, if None then the cache is not used
+    :param intersections_report: path to write a summary of the collisions of the cross-references to
+    :param scan: scan mode of the cross-references search, see find_relative_cross_references
+    :param relocate: the analysis will be used to relocate translations longer than the original strings
+    :param subroutines: source of the subroutines (see extract_pe_subroutines), None to skip them
+    :return: Analysis
+    """
+    parameters = AnalysisParameters(scan=scan, subroutines=subroutines, absolute_references=relocate)
+    analysis = analyse_pe_image(pe, parameters, workers=workers, cache=cache)
+    strings = {item.address: item.string for item in analysis.strings}
+    cross_references = analysis.cross_references
+
+    object_rva_by_reference = invert_cross_reference_table(cross_references)
+
+    logger.info(f"Found {len(cross_references)} objects with references from code section")
+    logger.info(f"In total {sum(map(len, cross_references.values()))} cross references")
+
+    logger.info("Searching intersections in the cross references...")
+
+    with stage("find_intersected_cross_references") as stage_metrics:
+        intersections = find_intersected_cross_references(cross_references)
+        summary = summarize_intersections(intersections, object_rva_by_reference)
+        stage_metrics.items = summary.collisions
+
+    report_intersections(summary, strings, intersections_report)
+    return analysis
+
+
+def plan_translation(  # noqa: PLR0913
+    pe: PeImage,
+    translation_table: TranslationTable,
+    encoding: str,
+    *,
+    workers: int = 1,
+    cache: AnalysisCache | None = None,
+    relocate: bool = False,
+    intersections_report: str | Path | None = None,
+    scan: str = "exhaustive",
+) -> TranslationPatch:
+    """
+    Analyse the executable and calculate edits to replace its strings with their translations
+
+    :param pe: PE image
+    :param translation_table: pairs of a string and its translation, or a mapping (e.g. a compiled dictionary)
+    :param encoding: encoding of the translations
+    :param workers: number of processes to search cross-references
+    :param cache: analysis cache, if None then the cache is not used
+    :param relocate: relocate translations longer than the original strings instead of skipping them
+    :param intersections_report: path to write a summary of the collisions of the cross-references to
+    :param scan: scan mode of the cross-references search, see find_relative_cross_references
+    :return: TranslationPatch
+    """
+    analysis = analyse_for_translation(
+        pe,
+        workers=workers,
+        cache=cache,
+        intersections_report=intersections_report,
+        scan=scan,
+        relocate=relocate,
+    )
+    return plan_analysed_translation(pe, analysis, translation_table, encoding, relocate=relocate)
+
+
+def patch(  # noqa: PLR0913
+    patched_file: str | Path,
+    translation_table: TranslationTable,
+    encoding: str,
+    *,
+    workers: int = 1,
+    pe_backend: str = "builtin",
+    cache: AnalysisCache | None = None,
+    dry_run: bool = False,
+    relocate: bool = False,
+    intersections_report: str | Path | None = None,
+    scan: str = "exhaustive",
+) -> PatchPlan:
+    """
+    Replace strings of the file with their translations
+
+    :param patched_file: path to the file to patch
+    :param translation_table: pairs of a string and its translation, or a mapping (e.g. a compiled dictionary)
+    :param encoding: encoding of the translations
+    :param workers: number of processes to search cross-references
+    :param pe_backend: how to parse the headers, see PeImage
+    :param cache: analysis cache, if None then the cache is not used
+    :param dry_run: only calculate the patch plan, don't modify the file
+    :param relocate: relocate translations longer than the original strings instead of skipping them
+    :param intersections_report: path to write a summary of the collisions of the cross-references to
+    :param scan: scan mode of the cross-references search, see find_relative_cross_references
+    :return: the patch plan
+    """
+    with Path(patched_file).open("rb" if dry_run else "r+b") as pe_file:
+        with open_pe_image(pe_file, backend=pe_backend) as pe:
+            plan = plan_translation(
+                pe,
+                translation_table,
+                encoding,
+                workers=workers,
+                cache=cache,
+                relocate=relocate,
+                intersections_report=intersections_report,
+                scan=scan,
+            ).plan
+
+        if not dry_run:
+            with stage("patch_writing", size=plan.stats().bytes_total) as stage_metrics:
+                plan.apply(pe_file)
+                stage_metrics.items += len(plan)
+
+    return plan
@@ -0,0 +1,119 @@
+"""
+Patch plan: a list of edits of a file computed in memory and applied in a single pass.
+"""
+
+import mmap
+import os
+from bisect import bisect
+from collections.abc import Iterable, Iterator
+from typing import BinaryIO, NamedTuple
+
+from dfint64_patch.type_aliases import Offset
+
+
+class PatchEdit(NamedTuple):
+    offset: Offset
+    data: bytes
+
+    @property
+    def end(self) -> int:
+        return self.offset + len(self.data)
+
+
+class PatchPlanStats(NamedTuple):
+    edits: int  # number of edits as added to the plan
+    writes: int  # number of writes after coalescing of the adjacent edits
+    bytes_total: int
+    first_offset: int | None
+    last_offset: int | None  # exclusive
+
+
+class PatchPlan:
+    """
+    Edits of a file sorted by offset. Overlapping edits are not allowed, adjacent edits are coalesced on applying.
+    """
+
+    def __init__(self, edits: Iterable[PatchEdit] = ()) -> None:
+        self._edits: list[PatchEdit] = []
+        for edit in edits:
+            self.add(*edit)
+
+    def add(self, offset: int, data: bytes) -> None:
+        if not data:
+            return
+
+        edit = PatchEdit(Offset(offset), bytes(data))
+        index = bisect(self._edits, edit)  # edits are usually added in order, so it is an append
+        previous_edit = self._edits[index - 1] if index > 0 else None
+        next_edit = self._edits[index] if index < len(self._edits) else None
+        if (previous_edit and previous_edit.end > edit.offset) or (next_edit and edit.end > next_edit.offset):
+            msg = f"Edit at offset 0x{offset:x} ({len(data)} bytes) overlaps another edit"
+            raise ValueError(msg)
+
+        self._edits.insert(index, edit)
+
+    def __len__(self) -> int:
+        return len(self._edits)
+
+    def __iter__(self) -> Iterator[PatchEdit]:
+        return iter(self._edits)
+
+    def __bool__(self) -> bool:
+        return bool(self._edits)
+
+    def coalesced(self) -> Iterator[PatchEdit]:
+        """
+        Iterate over the edits merging adjacent ones
+        """
+        start: int | None = None
+        parts: list[bytes] = []
+        end = 0
+        for edit in self._edits:
+            if start is not None and edit.offset == end:
+                parts.append(edit.data)
+            else:
+                if start is not None:
+                    yield PatchEdit(Offset(start), b"".join(parts))
+                start = edit.offset
+                parts = [edit.data]
+
+            end = edit.end
+
+        if start is not None:
+            yield PatchEdit(Offset(start), b"".join(parts))
+
+    def stats(self) -> PatchPlanStats:
+        return PatchPlanStats(
+            edits=len(self._edits),
+            writes=sum(1 for _ in self.coalesced()),
+            bytes_total=sum(len(edit.data) for edit in self._edits),
+            first_offset=self._edits[0].offset if self._edits else None,
+            last_offset=self._edits[-1].end if self._edits else None,
+        )
+
+    def apply_to_buffer(self, buffer: bytearray | memoryview | mmap.mmap) -> None:
+        """
+        Apply the edits to a writable buffer (e.g. a bytearray with the contents of a file)
+        """
+        if self._edits and self._edits[-1].end > len(buffer):
+            msg = f"Patch plan exceeds the size of the buffer (0x{self._edits[-1].end:x} > 0x{len(buffer):x})"
+            raise ValueError(msg)
+
+        for edit in self.coalesced():
+            buffer[edit.offset : edit.end] = edit.data
+
+    def apply(self, file_object: BinaryIO) -> None:
+        """
+        Apply the edits to a file opened in "r+b" mode through a writable memory map of the file.
+        The file is extended if the edits go beyond its end.
+        """
+        if not self._edits:
+            return
+
+        file_object.flush()
+        if self._edits[-1].end > file_object.seek(0, os.SEEK_END):
+            file_object.truncate(self._edits[-1].end)
+
+        with mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_WRITE) as mapping:
+            self.apply_to_buffer(mapping)
+            mapping.flush()
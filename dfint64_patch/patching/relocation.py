@@ -0,0 +1,240 @@
+"""
+Placement of translations which are longer than the original strings.
+
+A translation is written in place if it fits into the original string plus the zero padding after it,
+otherwise it is moved to free space (padding slack after other strings, then a new section appended to the file)
+and all the relative references to the string are rewritten to point to the new location.
+Absolute pointers to the string (the ones listed in the base relocation table) are rewritten as absolute pointers.
+The original strings are left intact, so references which are not found still work.
+"""
+
+import struct
+from bisect import bisect_left, insort
+from collections.abc import Iterable, Mapping
+from typing import NamedTuple
+
+from loguru import logger
+
+from dfint64_patch.cross_references.cross_references_absolute import parse_base_relocations
+from dfint64_patch.cross_references.cross_references_relative import (
+    REFERENCE_SIZE,
+    find_intersected_cross_references,
+)
+from dfint64_patch.patching.patch_plan import PatchPlan
+from dfint64_patch.pe.image import PeImage
+from dfint64_patch.pe.new_section import align, plan_new_section
+from dfint64_patch.type_aliases import Rva
+
+NEW_SECTION_NAME = ".dfint"
+
+_RELATIVE_REFERENCE = struct.Struct("<i")
+_ABSOLUTE_REFERENCE = struct.Struct("<Q")
+
+
+class FreeSpaceMap:
+    """
+    Best-fit allocator over free blocks of the address space
+    """
+
+    def __init__(self, blocks: Iterable[tuple[int, int]] = ()) -> None:
+        """
+        :param blocks: pairs of the address and the size of free blocks
+        """
+        self._blocks: list[tuple[int, int]] = sorted((size, address) for address, size in blocks if size > 0)
+
+    def add(self, address: int, size: int) -> None:
+        if size > 0:
+            insort(self._blocks, (size, address))
+
+    def allocate(self, size: int) -> Rva | None:
+        """
+        Allocate space in the smallest free block which is large enough
+
+        :param size: size to allocate
+        :return: address of the allocated space or None if there is no large enough block
+        """
+        index = bisect_left(self._blocks, (size, -1))
+        if index == len(self._blocks):
+            return None
+
+        block_size, address = self._blocks.pop(index)
+        self.add(address + size, block_size - size)
+        return Rva(address)
+
+    @property
+    def total_size(self) -> int:
+        return sum(size for size, _ in self._blocks)
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+
+def merge_tails(items: Iterable[bytes]) -> dict[bytes, tuple[bytes, int]]:
+    """
+    Deduplicate byte strings and merge the ones which are suffixes of other ones
+    (so both can share the same null-terminated storage).
+
+    :param items: byte strings (without null terminators)
+    :return: mapping of each string to its container string and the offset of the string in the container
+    """
+    # In the order of reversed strings all the strings which end with some string follow it immediately
+    ordered = sorted(set(items), key=lambda item: item[::-1], reverse=True)
+    result: dict[bytes, tuple[bytes, int]] = {}
+    container = b""
+    for item in ordered:
+        if container and container.endswith(item):
+            result[item] = (container, len(container) - len(item))
+        else:
+            container = item
+            result[item] = (item, 0)
+
+    return result
+
+
+def find_string_slack(pe: PeImage, strings: Mapping[Rva, str], alignment: int = 4) -> dict[Rva, int]:
+    """
+    Find zero padding after the null terminators of the strings up to the next aligned address
+
+    :param pe: PE image
+    :param strings: strings by their RVA
+    :param alignment: alignment of the strings
+    :return: size of the padding after each string
+    """
+    result = {}
+    for rva, string in strings.items():
+        start = rva + len(string) + 1
+        end = align(start, alignment)
+        offset = pe.rva_to_offset(start)
+        padding = pe.data[offset : offset + end - start]
+        result[rva] = len(padding) if len(padding) == end - start and not any(padding) else 0
+
+    return result
+
+
+class RelocationStats(NamedTuple):
+    extended_in_place: int
+    moved: int
+    placed_in_slack: int
+    skipped: list[Rva]  # strings which can't be relocated
+    new_section_size: int
+
+
+def _place_containers(
+    pe: PeImage,
+    containers: list[bytes],
+    free_space: FreeSpaceMap,
+    plan: PatchPlan,
+) -> tuple[dict[bytes, int], dict[bytes, int]]:
+    """
+    Place null-terminated strings to the free space, the rest of them to a new section.
+    If a new section can't be added (see plan_new_section), the rest of the strings are not placed.
+
+    :return: addresses of the placed strings and offsets of the strings placed to the new section
+    """
+    addresses: dict[bytes, int] = {}
+    section_offsets: dict[bytes, int] = {}
+    section_size = 0
+    for container in containers:
+        address = free_space.allocate(len(container) + 1)
+        if address is not None:
+            addresses[container] = address
+            plan.add(pe.rva_to_offset(address), container + b"\0")
+        else:
+            section_offsets[container] = section_size
+            section_size += len(container) + 1
+
+    if section_size:
+        try:
+            new_section = plan_new_section(pe.data, NEW_SECTION_NAME, section_size)
+        except ValueError as ex:
+            logger.warning(f"{len(section_offsets)} strings don't fit into the padding: {ex}")
+            return addresses, {}
+
+        for header_offset, data in new_section.header_edits:
+            plan.add(header_offset, data)
+
+        section_data = bytearray(new_section.header.size_of_raw_data)
+        for container, offset in section_offsets.items():
+            section_data[offset : offset + len(container)] = container
+            addresses[container] = new_section.header.virtual_address + offset
+
+        plan.add(new_section.header.pointer_to_raw_data, bytes(section_data))
+
+    return addresses, section_offsets
+
+
+def relocate_strings(  # noqa: PLR0913
+    pe: PeImage,
+    strings: Mapping[Rva, str],
+    cross_references: Mapping[Rva, list[Rva]],
+    translations: Mapping[Rva, bytes],
+    plan: PatchPlan,
+    *,
+    alignment: int = 4,
+) -> RelocationStats:
+    """
+    Add edits to place translations longer than the original strings and to rewrite the references to them
+
+    :param pe: PE image
+    :param strings: strings by their RVA
+    :param cross_references: references to the strings from the code
+    :param translations: encoded translations (without null terminators) by RVA of the original strings
+    :param plan: patch plan to add the edits to
+    :param alignment: alignment of the strings
+    :return: RelocationStats
+    """
+    slack = find_string_slack(pe, strings, alignment)
+    colliding_references: set[Rva] = set()
+    for reference1, reference2 in find_intersected_cross_references(cross_references):
+        colliding_references.update((reference1, reference2))
+
+    extended_in_place = 0
+    skipped: list[Rva] = []
+    moved: dict[Rva, bytes] = {}
+    for rva, translation in translations.items():
+        if len(translation) <= len(strings[rva]) + slack[rva]:
+            plan.add(pe.rva_to_offset(rva), translation + b"\0")
+            slack[rva] = 0
+            extended_in_place += 1
+            continue
+
+        references = cross_references.get(rva)
+        if not references:
+            logger.warning(f"String {strings[rva]!r} has no references from code, it can't be relocated")
+            skipped.append(rva)
+        elif not colliding_references.isdisjoint(references):
+            logger.warning(f"References to string {strings[rva]!r} collide with other references, skipping")
+            skipped.append(rva)
+        else:
+            moved[rva] = translation
+
+    free_space = FreeSpaceMap((rva + len(strings[rva]) + 1, size) for rva, size in slack.items() if size)
+
+    merged = merge_tails(moved.values())
+    containers = sorted({container for container, _ in merged.values()}, key=len, reverse=True)
+    container_rva, section_offsets = _place_containers(pe, containers, free_space, plan)
+
+    absolute_references = set(parse_base_relocations(pe)) if moved else set()
+    for rva, translation in list(moved.items()):
+        container, offset = merged[translation]
+        if container not in container_rva:
+            del moved[rva]
+            skipped.append(rva)
+            continue
+
+        new_rva = container_rva[container] + offset
+        for reference in cross_references[rva]:
+            if reference in absolute_references:
+                data = _ABSOLUTE_REFERENCE.pack(pe.image_base + new_rva)
+            else:
+                data = _RELATIVE_REFERENCE.pack(new_rva - (reference + REFERENCE_SIZE))
+
+            plan.add(pe.rva_to_offset(reference), data)
+
+    return RelocationStats(
+        extended_in_place=extended_in_place,
+        moved=len(moved),
+        placed_in_slack=len(container_rva) - len(section_offsets),
+        skipped=skipped,
+        new_section_size=sum(len(container) + 1 for container in section_offsets),
+    )
@@ -0,0 +1,313 @@
+"""
+Watch mode: the source file is analysed once, then the dictionaries are polled for changes and the patched files
+are updated in place every time a dictionary is saved.
+
+A dictionary is re-read only when its modification time or size changes, but then it is read and parsed as a whole
+and compared with the previous translations, so this part of an update takes time proportional to the size of
+the dictionary. Only the edits of the strings which translations changed are planned and written (see LivePatchedFile),
+the manifests of the patched files are saved after a pause in the changes and when the watching stops.
+With relocation of longer translations every update plans all the translations again (see update_patched_file).
+"""
+
+import time
+from collections import defaultdict
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+from dfint64_patch.analysis.cache import AnalysisCache
+from dfint64_patch.dictionary_loaders.binary_dictionary import is_binary_dictionary
+from dfint64_patch.dictionary_loaders.csv_loader import load_translation_file
+from dfint64_patch.patching.batch import BatchResult, BatchTarget
+from dfint64_patch.patching.incremental import (
+    LivePatchedFile,
+    file_sha256,
+    load_manifest,
+    manifest_path,
+    update_patched_file,
+)
+from dfint64_patch.patching.patch import analyse_for_translation, plan_analysed_translation
+from dfint64_patch.pe.image import open_pe_image
+
+if TYPE_CHECKING:
+    from dfint64_patch.type_aliases import Rva
+
+WATCH_INTERVAL = 0.5  # seconds between checks of the dictionaries
+WATCH_DEBOUNCE = 0.3  # seconds a dictionary must stay unchanged after a change before it's reloaded
+WATCH_SAVE_DELAY = 10.0  # seconds without changes after which the manifest of a patched file is saved
+
+FileState = tuple[int, int]  # modification time (ns) and size
+
+
+def file_state(path: str | Path) -> FileState | None:
+    try:
+        stat = Path(path).stat()
+    except OSError:  # e.g. the file is being replaced by an editor
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def load_dictionary_rows(path: str | Path) -> list[tuple[str, str]]:
+    with Path(path).open(encoding="utf-8") as file:
+        return list(load_translation_file(file))
+
+
+def changed_rows(old: Mapping[str, str], new: Mapping[str, str]) -> list[str]:
+    """
+    Find the strings which are added, removed or translated differently
+
+    :param old: previous translations
+    :param new: current translations
+    :return: the changed strings, sorted
+    """
+    return sorted({string for string, _ in old.items() ^ new.items()})
+
+
+@dataclass
+class WatchedDictionary:
+    target: BatchTarget
+    state: FileState | None = None
+    changed_at: float | None = None  # time of the last detected change which is not applied yet
+    updated_at: float | None = None  # time of the last update of the patched file
+    rows: dict[str, str] = field(default_factory=dict)
+    live: LivePatchedFile | None = None  # the patched file updated in place, None until it's brought up to date
+    output_sha256: str | None = None  # hash of the patched file from its last saved manifest
+
+
+class TranslationWatcher:
+    """
+    Keeps the analysis of the source file in memory and updates the patched files when their dictionaries change
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        source_file: str | Path,
+        targets: Sequence[BatchTarget],
+        *,
+        workers: int = 1,
+        pe_backend: str = "builtin",
+        cache: AnalysisCache | None = None,
+        relocate: bool = False,
+        intersections_report: str | Path | None = None,
+        scan: str = "exhaustive",
+        debounce: float = WATCH_DEBOUNCE,
+        save_delay: float = WATCH_SAVE_DELAY,
+    ) -> None:
+        """
+        :param source_file: path to the original executable
+        :param targets: dictionaries (csv), their encodings and paths of the patched files
+        :param workers: number of processes to search cross-references
+        :param pe_backend: how to parse the headers, see PeImage
+        :param cache: analysis cache, if None then the cache is not used
+        :param relocate: relocate translations longer than the original strings instead of skipping them
+        :param intersections_report: path to write a summary of the collisions of the cross-references to
+        :param scan: scan mode of the cross-references search, see find_relative_cross_references
+        :param debounce: seconds a dictionary must stay unchanged after a change before it's reloaded
+        :param save_delay: seconds without changes after which the manifest of a patched file is saved
+        """
+        for target in targets:
+            if is_binary_dictionary(target.dictionary_file):
+                msg = f"Only csv dictionaries can be watched: {target.dictionary_file}"
+                raise ValueError(msg)
+
+        self.source_file = Path(source_file)
+        self.pe_backend = pe_backend
+        self.relocate = relocate
+        self.scan = scan
+        self.debounce = debounce
+        self.save_delay = save_delay
+        self.dictionaries = [WatchedDictionary(target) for target in targets]
+
+        with self.source_file.open("rb") as pe_file, open_pe_image(pe_file, backend=pe_backend) as pe:
+            self.analysis = analyse_for_translation(
+                pe,
+                workers=workers,
+                cache=cache,
+                intersections_report=intersections_report,
+                scan=scan,
+                relocate=self.relocate,
+            )
+
+        self._source_sha256 = file_sha256(self.source_file)
+        self._addresses_by_string: dict[str, list[Rva]] = defaultdict(list)
+        for item in self.analysis.strings:
+            self._addresses_by_string[item.string].append(item.address)
+
+    def _update_fully(self, dictionary: WatchedDictionary, translation_table: list[tuple[str, str]]) -> BatchResult:
+        """
+        Plan all the translations and update the patched file using its manifest
+        """
+        target = dictionary.target
+        dictionary.live = None
+        translation_patch = None
+        if not self.relocate:
+            with self.source_file.open("rb") as pe_file, open_pe_image(pe_file, backend=self.pe_backend) as pe:
+                translation_patch = plan_analysed_translation(pe, self.analysis, translation_table, target.encoding)
+
+        update = update_patched_file(
+            self.source_file,
+            target.patched_file,
+            translation_table,
+            target.encoding,
+            pe_backend=self.pe_backend,
+            relocate=self.relocate,
+            scan=self.scan,
+            analysis=self.analysis,
+            translation_patch=translation_patch,
+            source_sha256=self._source_sha256,
+            output_sha256=dictionary.output_sha256,
+        )
+        manifest = update.manifest if update is not None else load_manifest(manifest_path(target.patched_file))
+        dictionary.output_sha256 = manifest.output_sha256 if manifest is not None else None
+        if translation_patch is not None and manifest is not None:
+            dictionary.live = LivePatchedFile(target.patched_file, manifest, translation_patch, translation_table)
+
+        if update is None:
+            return BatchResult(target)
+
+        return BatchResult(target, len(update.translation_patch.translated), update.translation_patch.skipped)
+
+    def _update_live(
+        self,
+        dictionary: WatchedDictionary,
+        translation_table: list[tuple[str, str]],
+        changed: list[str],
+    ) -> BatchResult:
+        """
+        Write only the changed translations to the patched file
+        """
+        live = dictionary.live
+        assert live is not None
+        strings = {rva: string for string in changed for rva in self._addresses_by_string.get(string, [])}
+        with self.source_file.open("rb") as pe_file, open_pe_image(pe_file, backend=self.pe_backend) as pe:
+            edits = live.update(pe, strings, translation_table, dictionary.rows)
+
+        logger.info(f"{dictionary.target.patched_file}: {edits} edits written")
+        return BatchResult(dictionary.target, live.translated, live.skipped)
+
+    def _update(self, dictionary: WatchedDictionary, *, initial: bool = False) -> BatchResult:
+        target = dictionary.target
+        try:
+            translation_table = load_dictionary_rows(target.dictionary_file)
+        except Exception as ex:  # noqa: BLE001
+            # e.g. the dictionary is saved in the middle of an edit, the previous translations are kept
+            logger.error(f"Failed to load {target.dictionary_file}: {ex}")
+            return BatchResult(target, error=str(ex) or type(ex).__name__)
+
+        rows = dict(translation_table)
+        try:
+            changed = None if initial else changed_rows(dictionary.rows, rows)
+            if changed is not None and self._addresses_by_string.keys().isdisjoint(changed):
+                logger.info(f"{target.dictionary_file}: no translations of the strings of the executable changed")
+                if dictionary.live is not None:
+                    dictionary.live.set_translation_table(translation_table)
+                result = BatchResult(target)
+            elif changed is not None and dictionary.live is not None:
+                logger.info(f"{target.dictionary_file}: {len(changed)} translations changed")
+                result = self._update_live(dictionary, translation_table, changed)
+            else:
+                result = self._update_fully(dictionary, translation_table)
+        except Exception as ex:  # noqa: BLE001
+            logger.error(f"Failed to update {target.patched_file}: {ex}")
+            # the patched file may be changed partially, so the next update checks it against its manifest
+            dictionary.live = None
+            dictionary.output_sha256 = None
+            return BatchResult(target, error=str(ex) or type(ex).__name__)
+
+        dictionary.rows = rows
+        return result
+
+    @staticmethod
+    def _save(dictionary: WatchedDictionary) -> None:
+        assert dictionary.live is not None
+        started = time.perf_counter()
+        dictionary.live.save()
+        dictionary.output_sha256 = dictionary.live.manifest.output_sha256
+        logger.info(
+            f"Manifest of {dictionary.target.patched_file} is saved in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+
+    def save(self) -> None:
+        """
+        Save the manifests of the patched files changed since the last save
+        """
+        for dictionary in self.dictionaries:
+            if dictionary.live is not None and dictionary.live.dirty:
+                self._save(dictionary)
+
+    def start(self) -> list[BatchResult]:
+        """
+        Bring the patched files up to date with the current dictionaries
+
+        :return: results in the order of the targets
+        """
+        results = []
+        for dictionary in self.dictionaries:
+            dictionary.state = file_state(dictionary.target.dictionary_file)
+            results.append(self._update(dictionary, initial=True))
+
+        return results
+
+    def poll(self, now: float | None = None) -> list[BatchResult]:
+        """
+        Check the dictionaries for changes and update the patched files of the dictionaries which are changed
+        and then stay unchanged for the debounce time. Save the manifests of the patched files which are not updated
+        for the save delay.
+
+        :param now: current time (time.monotonic), for testing
+        :return: results of the updated targets
+        """
+        now = time.monotonic() if now is None else now
+        results = []
+        for dictionary in self.dictionaries:
+            state = file_state(dictionary.target.dictionary_file)
+            if state != dictionary.state:
+                dictionary.state = state
+                dictionary.changed_at = now
+
+            if state is None or dictionary.changed_at is None or now - dictionary.changed_at < self.debounce:
+                continue
+
+            dictionary.changed_at = None
+            started = time.perf_counter()
+            result = self._update(dictionary)
+            dictionary.updated_at = now
+            if result.applied is not None:
+                logger.info(
+                    f"{dictionary.target.patched_file} is updated in {(time.perf_counter() - started) * 1000:.0f} ms: "
+                    f"{result.applied} translations applied, {result.skipped} skipped"
+                )
+            results.append(result)
+
+        for dictionary in self.dictionaries:
+            if (
+                dictionary.live is not None
+                and dictionary.live.dirty
+                and dictionary.changed_at is None
+                and dictionary.updated_at is not None
+                and now - dictionary.updated_at >= self.save_delay
+            ):
+                self._save(dictionary)
+
+        return results
+
+    def run(self, interval: float = WATCH_INTERVAL) -> None:
+        """
+        Update the patched files until interrupted (Ctrl+C), then save their manifests
+
+        :param interval: seconds between checks of the dictionaries
+        """
+        self.start()
+        logger.info(f"Watching {', '.join(item.target.dictionary_file for item in self.dictionaries)} for changes")
+        try:
+            while True:
+                time.sleep(interval)
+                self.poll()
+        except KeyboardInterrupt:
+            logger.info("Watching is stopped")
+        finally:
+            self.save()
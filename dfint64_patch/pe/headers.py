@@ -0,0 +1,224 @@
+"""
+Minimal parser of the Portable Executable headers.
+Only the few things used by the project are read: the image base, the data directories and the section table.
+"""
+
+import struct
+from pathlib import Path
+from typing import NamedTuple
+
+from dfint64_patch.type_aliases import Offset, Rva
+
+DOS_SIGNATURE = b"MZ"
+PE_SIGNATURE = b"PE\0\0"
+
+PE32_MAGIC = 0x10B
+PE32_PLUS_MAGIC = 0x20B
+
+_DOS_HEADER_NEW_HEADER_OFFSET = 0x3C
+_WORD = struct.Struct("<H")
+_DWORD = struct.Struct("<I")
+_QWORD = struct.Struct("<Q")
+_COFF_HEADER = struct.Struct("<HHIIIHH")
+_SECTION_HEADER = struct.Struct("<8sIIIIIIHHI")
+_DATA_DIRECTORY = struct.Struct("<II")
+
+SECTION_HEADER_SIZE = _SECTION_HEADER.size
+COFF_HEADER_NUMBER_OF_SECTIONS_OFFSET = 2
+
+# Indices of the data directories
+IMAGE_DIRECTORY_ENTRY_IMPORT = 1
+IMAGE_DIRECTORY_ENTRY_RESOURCE = 2
+IMAGE_DIRECTORY_ENTRY_EXCEPTION = 3
+IMAGE_DIRECTORY_ENTRY_SECURITY = 4  # certificate table (Authenticode signature), its address is a file offset
+IMAGE_DIRECTORY_ENTRY_BASERELOC = 5
+
+# Section characteristics
+IMAGE_SCN_CNT_CODE = 0x00000020
+IMAGE_SCN_CNT_INITIALIZED_DATA = 0x00000040
+IMAGE_SCN_MEM_DISCARDABLE = 0x02000000
+IMAGE_SCN_MEM_EXECUTE = 0x20000000
+IMAGE_SCN_MEM_READ = 0x40000000
+
+# Offsets of the fields which are the same in PE32 and PE32+ optional headers
+OPTIONAL_HEADER_SECTION_ALIGNMENT_OFFSET = 32
+OPTIONAL_HEADER_FILE_ALIGNMENT_OFFSET = 36
+OPTIONAL_HEADER_SIZE_OF_IMAGE_OFFSET = 56
+OPTIONAL_HEADER_SIZE_OF_HEADERS_OFFSET = 60
+OPTIONAL_HEADER_CHECKSUM_OFFSET = 64
+
+# Layout of the optional header: image base structure and offsets of the image base,
+# of the number of the data directories and of the data directories
+_OPTIONAL_HEADER_LAYOUT = {
+    PE32_MAGIC: (_DWORD, 28, 92, 96),
+    PE32_PLUS_MAGIC: (_QWORD, 24, 108, 112),
+}
+
+
+class SectionHeader(NamedTuple):
+    name: str
+    virtual_address: Rva
+    virtual_size: int
+    pointer_to_raw_data: Offset
+    size_of_raw_data: int
+    characteristics: int
+
+
+class DataDirectory(NamedTuple):
+    virtual_address: Rva
+    size: int
+
+
+class HeaderOffsets(NamedTuple):
+    coff_header: Offset
+    optional_header: Offset
+    section_table: Offset
+    number_of_sections: int
+
+
+class PeHeaders(NamedTuple):
+    image_base: int
+    sections: list[SectionHeader]
+    data_directories: list[DataDirectory]
+    section_alignment: int
+    file_alignment: int
+
+
+def _unpack_from(structure: struct.Struct, data: bytes | memoryview, offset: int) -> tuple:
+    try:
+        return structure.unpack_from(data, offset)
+    except struct.error as ex:
+        msg = "Truncated PE headers"
+        raise ValueError(msg) from ex
+
+
+def locate_pe_headers(data: bytes | memoryview) -> HeaderOffsets:
+    """
+    Find offsets of the headers of a PE file
+
+    :param data: contents of the file (at least all the headers)
+    :return: HeaderOffsets
+    """
+    if bytes(data[: len(DOS_SIGNATURE)]) != DOS_SIGNATURE:
+        msg = "Not a DOS executable"
+        raise ValueError(msg)
+
+    (pe_header_offset,) = _unpack_from(_DWORD, data, _DOS_HEADER_NEW_HEADER_OFFSET)
+    if bytes(data[pe_header_offset : pe_header_offset + len(PE_SIGNATURE)]) != PE_SIGNATURE:
+        msg = "Not a PE executable"
+        raise ValueError(msg)
+
+    coff_header_offset = pe_header_offset + len(PE_SIGNATURE)
+    _, number_of_sections, _, _, _, size_of_optional_header, _ = _unpack_from(_COFF_HEADER, data, coff_header_offset)
+    optional_header_offset = coff_header_offset + _COFF_HEADER.size
+    return HeaderOffsets(
+        coff_header=Offset(coff_header_offset),
+        optional_header=Offset(optional_header_offset),
+        section_table=Offset(optional_header_offset + size_of_optional_header),
+        number_of_sections=number_of_sections,
+    )
+
+
+def pack_section_header(header: SectionHeader) -> bytes:
+    """
+    Pack a section header to its binary form (relocations and line numbers fields are zeroed)
+    """
+    return _SECTION_HEADER.pack(
+        header.name.encode("utf-8"),
+        header.virtual_size,
+        header.virtual_address,
+        header.size_of_raw_data,
+        header.pointer_to_raw_data,
+        0,
+        0,
+        0,
+        0,
+        header.characteristics,
+    )
+
+
+def parse_pe_headers(data: bytes | memoryview) -> PeHeaders:
+    """
+    Parse headers of a PE (PE32 or PE32+) file
+
+    :param data: contents of the file (at least all the headers)
+    :return: PeHeaders
+    """
+    offsets = locate_pe_headers(data)
+    optional_header_offset = offsets.optional_header
+    (magic,) = _unpack_from(_WORD, data, optional_header_offset)
+    if magic not in _OPTIONAL_HEADER_LAYOUT:
+        msg = f"Unknown optional header magic: 0x{magic:x}"
+        raise ValueError(msg)
+
+    image_base_structure, image_base_offset, count_offset, directories_offset = _OPTIONAL_HEADER_LAYOUT[magic]
+    (image_base,) = _unpack_from(image_base_structure, data, optional_header_offset + image_base_offset)
+    (number_of_directories,) = _unpack_from(_DWORD, data, optional_header_offset + count_offset)
+    (section_alignment,) = _unpack_from(_DWORD, data, optional_header_offset + OPTIONAL_HEADER_SECTION_ALIGNMENT_OFFSET)
+    (file_alignment,) = _unpack_from(_DWORD, data, optional_header_offset + OPTIONAL_HEADER_FILE_ALIGNMENT_OFFSET)
+
+    directories_start = optional_header_offset + directories_offset
+    data_directories = [
+        DataDirectory(Rva(virtual_address), size)
+        for virtual_address, size in (
+            _unpack_from(_DATA_DIRECTORY, data, directories_start + i * _DATA_DIRECTORY.size)
+            for i in range(number_of_directories)
+        )
+    ]
+
+    sections = []
+    for i in range(offsets.number_of_sections):
+        name, virtual_size, virtual_address, size_of_raw_data, pointer_to_raw_data, *_, characteristics = _unpack_from(
+            _SECTION_HEADER, data, offsets.section_table + i * SECTION_HEADER_SIZE
+        )
+        sections.append(
+            SectionHeader(
+                name=name.rstrip(b"\0").decode("utf-8", errors="replace"),
+                virtual_address=Rva(virtual_address),
+                virtual_size=virtual_size,
+                pointer_to_raw_data=Offset(pointer_to_raw_data),
+                size_of_raw_data=size_of_raw_data,
+                characteristics=characteristics,
+            )
+        )
+
+    return PeHeaders(
+        image_base=image_base,
+        sections=sections,
+        data_directories=data_directories,
+        section_alignment=section_alignment,
+        file_alignment=file_alignment,
+    )
+
+
+def read_pe_headers_with_lief(path: str | Path) -> PeHeaders:
+    """
+    Read headers of a PE file with lief (the optional backend, lief must be installed)
+
+    :param path: path to the file
+    :return: PeHeaders
+    """
+    import lief  # noqa: PLC0415
+
+    pe = lief.PE.parse(path)
+    if pe is None:
+        msg = f"Failed to parse PE file {path!r}"
+        raise ValueError(msg)
+
+    return PeHeaders(
+        image_base=pe.optional_header.imagebase,
+        sections=[
+            SectionHeader(
+                name=str(section.name),
+                virtual_address=Rva(section.virtual_address),
+                virtual_size=section.virtual_size,
+                pointer_to_raw_data=Offset(section.pointerto_raw_data),
+                size_of_raw_data=section.sizeof_raw_data,
+                characteristics=section.characteristics,
+            )
+            for section in pe.sections
+        ],
+        data_directories=[DataDirectory(Rva(directory.rva), directory.size) for directory in pe.data_directories],
+        section_alignment=pe.optional_header.section_alignment,
+        file_alignment=pe.optional_header.file_alignment,
+    )
@@ -0,0 +1,121 @@
+"""
+Zero-copy access to the sections of a Portable Executable file.
+The file is memory-mapped once, every section is exposed as a read-only memoryview slice of the mapping.
+"""
+
+import mmap
+from collections.abc import Generator
+from contextlib import contextmanager, suppress
+from typing import BinaryIO, NamedTuple
+
+from dfint64_patch.pe.headers import (
+    DataDirectory,
+    SectionHeader,
+    parse_pe_headers,
+    read_pe_headers_with_lief,
+)
+from dfint64_patch.type_aliases import Offset, Rva
+
+PE_BACKENDS = ("builtin", "lief")
+
+
+class SectionView(NamedTuple):
+    name: str
+    virtual_address: Rva
+    virtual_size: int
+    pointer_to_raw_data: Offset
+    size_of_raw_data: int
+    characteristics: int
+    content: memoryview  # read-only view of the section's data in the file
+
+    def contains_rva(self, rva: int) -> bool:
+        return self.virtual_address <= rva < self.virtual_address + max(self.virtual_size, self.size_of_raw_data)
+
+
+class PeImage:
+    """
+    Memory-mapped PE file. Use open_pe_image context manager, or call close() when done.
+    The section views must not be used after the image is closed.
+    """
+
+    image_base: int
+    sections: list[SectionView]
+    data_directories: list[DataDirectory]
+    section_alignment: int
+    file_alignment: int
+
+    def __init__(self, file_object: BinaryIO, *, backend: str = "builtin") -> None:
+        """
+        :param file_object: a file opened in binary mode
+        :param backend: how to parse the headers: "builtin" (own minimal parser) or "lief" (lief must be installed)
+        """
+        if backend not in PE_BACKENDS:
+            msg = f"Unknown PE backend: {backend!r}, expected one of {PE_BACKENDS}"
+            raise ValueError(msg)
+
+        self._mmap = mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        try:
+            if backend == "builtin":
+                headers = parse_pe_headers(self._view)
+            else:
+                headers = read_pe_headers_with_lief(file_object.name)
+        except Exception:
+            self.close()
+            raise
+
+        self.image_base = headers.image_base
+        self.data_directories = headers.data_directories
+        self.section_alignment = headers.section_alignment
+        self.file_alignment = headers.file_alignment
+        self.sections = [self._section_view(section) for section in headers.sections]
+
+    def _section_view(self, header: SectionHeader) -> SectionView:
+        # Same as lief's Section.content: raw data trimmed to the virtual size
+        size = min(header.virtual_size, header.size_of_raw_data) if header.virtual_size else header.size_of_raw_data
+        start = header.pointer_to_raw_data
+        return SectionView(*header, content=self._view[start : start + size])
+
+    @property
+    def data(self) -> memoryview:
+        """
+        Read-only view of the whole file
+        """
+        return self._view
+
+    def rva_to_offset(self, rva: int) -> Offset:
+        for section in self.sections:
+            if section.contains_rva(rva):
+                return Offset(section.pointer_to_raw_data + rva - section.virtual_address)
+
+        if self.sections and rva < self.sections[0].virtual_address:
+            return Offset(rva)  # the headers are mapped as is
+
+        msg = f"RVA 0x{rva:x} doesn't belong to any section"
+        raise ValueError(msg)
+
+    def close(self) -> None:
+        # If some views are still used (e.g. by numpy arrays), the mapping will be closed on their garbage collection
+        for view in [*(section.content for section in getattr(self, "sections", [])), self._view]:
+            with suppress(BufferError):
+                view.release()
+
+        with suppress(BufferError):
+            self._mmap.close()
+
+
+@contextmanager
+def open_pe_image(file_object: BinaryIO, *, backend: str = "builtin") -> Generator[PeImage, None, None]:
+    """
+    Context manager to map a PE file to memory and unmap it on exit
+
+    :param file_object: a file opened in binary mode
+    :param backend: how to parse the headers, see PeImage
+    :return: PeImage object
+    """
+    pe = PeImage(file_object, backend=backend)
+    try:
+        yield pe
+    finally:
+        pe.close()
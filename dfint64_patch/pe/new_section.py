@@ -0,0 +1,116 @@
+"""
+Appending a new section to a PE file
+"""
+
+import struct
+from typing import NamedTuple
+
+from dfint64_patch.pe.headers import (
+    COFF_HEADER_NUMBER_OF_SECTIONS_OFFSET,
+    IMAGE_DIRECTORY_ENTRY_SECURITY,
+    IMAGE_SCN_CNT_INITIALIZED_DATA,
+    IMAGE_SCN_MEM_READ,
+    OPTIONAL_HEADER_CHECKSUM_OFFSET,
+    OPTIONAL_HEADER_SIZE_OF_HEADERS_OFFSET,
+    OPTIONAL_HEADER_SIZE_OF_IMAGE_OFFSET,
+    SECTION_HEADER_SIZE,
+    SectionHeader,
+    locate_pe_headers,
+    pack_section_header,
+    parse_pe_headers,
+)
+from dfint64_patch.type_aliases import Offset, Rva
+
+
+def align(value: int, alignment: int) -> int:
+    return (value + alignment - 1) // alignment * alignment
+
+
+class NewSection(NamedTuple):
+    header: SectionHeader
+    header_edits: list[tuple[Offset, bytes]]  # changes of the headers of the file to add the section
+
+    def rva_to_offset(self, rva: int) -> Offset:
+        return Offset(self.header.pointer_to_raw_data + rva - self.header.virtual_address)
+
+
+def plan_new_section(
+    data: bytes | memoryview,
+    name: str,
+    size: int,
+    characteristics: int = IMAGE_SCN_CNT_INITIALIZED_DATA | IMAGE_SCN_MEM_READ,
+) -> NewSection:
+    """
+    Calculate the header and the placement of a new section appended after the last section of a PE file.
+    The contents of the section must be written at header.pointer_to_raw_data (padded to header.size_of_raw_data),
+    which is at the end of the file. Files with data after the last section (an overlay, e.g. a certificate table
+    of a signed file) are refused, since the data would have to be moved. The checksum of the image is zeroed
+    (i.e. not set), as the file changes; it is only verified for drivers and critical system files.
+
+    :param data: contents of the file
+    :param name: name of the section (up to 8 bytes)
+    :param size: size of the contents of the section
+    :param characteristics: section flags, readable initialized data by default
+    :return: NewSection
+    """
+    if len(name.encode("utf-8")) > 8:  # noqa: PLR2004
+        msg = f"Section name {name!r} is too long"
+        raise ValueError(msg)
+
+    headers = parse_pe_headers(data)
+    offsets = locate_pe_headers(data)
+
+    new_header_offset = offsets.section_table + offsets.number_of_sections * SECTION_HEADER_SIZE
+    (size_of_headers,) = struct.unpack_from(
+        "<I", data, offsets.optional_header + OPTIONAL_HEADER_SIZE_OF_HEADERS_OFFSET
+    )
+    first_raw_data = min(
+        (section.pointer_to_raw_data for section in headers.sections if section.size_of_raw_data),
+        default=size_of_headers,
+    )
+    new_header_end = new_header_offset + SECTION_HEADER_SIZE
+    if new_header_end > min(size_of_headers, first_raw_data) or any(data[new_header_offset:new_header_end]):
+        msg = "No room for a new section header"
+        raise ValueError(msg)
+
+    virtual_end = max(
+        (section.virtual_address + max(section.virtual_size, section.size_of_raw_data) for section in headers.sections),
+        default=align(size_of_headers, headers.section_alignment),
+    )
+    raw_end = max(
+        (section.pointer_to_raw_data + section.size_of_raw_data for section in headers.sections),
+        default=size_of_headers,
+    )
+    if len(headers.data_directories) > IMAGE_DIRECTORY_ENTRY_SECURITY and (
+        headers.data_directories[IMAGE_DIRECTORY_ENTRY_SECURITY].size
+    ):
+        msg = "The file is signed, a new section can't be added before its certificate table"
+        raise ValueError(msg)
+
+    if len(data) > raw_end:
+        msg = f"The file has {len(data) - raw_end} bytes of data after the last section, a new section can't be added"
+        raise ValueError(msg)
+
+    header = SectionHeader(
+        name=name,
+        virtual_address=Rva(align(virtual_end, headers.section_alignment)),
+        virtual_size=size,
+        pointer_to_raw_data=Offset(align(raw_end, headers.file_alignment)),
+        size_of_raw_data=align(size, headers.file_alignment),
+        characteristics=characteristics,
+    )
+    size_of_image = align(header.virtual_address + size, headers.section_alignment)
+
+    header_edits = [
+        (
+            Offset(offsets.coff_header + COFF_HEADER_NUMBER_OF_SECTIONS_OFFSET),
+            struct.pack("<H", offsets.number_of_sections + 1),
+        ),
+        (
+            Offset(offsets.optional_header + OPTIONAL_HEADER_SIZE_OF_IMAGE_OFFSET),
+            struct.pack("<I", size_of_image),
+        ),
+        (Offset(offsets.optional_header + OPTIONAL_HEADER_CHECKSUM_OFFSET), struct.pack("<I", 0)),
+        (Offset(new_header_offset), pack_section_header(header)),
+    ]
+    return NewSection(header, header_edits)
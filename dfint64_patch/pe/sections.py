@@ -0,0 +1,66 @@
+"""
+Discovery of the sections to analyse by their characteristics instead of their positions in the section table
+"""
+
+from dfint64_patch.pe.headers import (
+    IMAGE_DIRECTORY_ENTRY_BASERELOC,
+    IMAGE_DIRECTORY_ENTRY_EXCEPTION,
+    IMAGE_DIRECTORY_ENTRY_IMPORT,
+    IMAGE_DIRECTORY_ENTRY_RESOURCE,
+    IMAGE_SCN_CNT_CODE,
+    IMAGE_SCN_CNT_INITIALIZED_DATA,
+    IMAGE_SCN_MEM_DISCARDABLE,
+    IMAGE_SCN_MEM_EXECUTE,
+    IMAGE_SCN_MEM_READ,
+)
+from dfint64_patch.pe.image import PeImage, SectionView
+
+# Sections which start with one of these directories are tables, not string pools
+_SERVICE_DIRECTORIES = (
+    IMAGE_DIRECTORY_ENTRY_IMPORT,
+    IMAGE_DIRECTORY_ENTRY_RESOURCE,
+    IMAGE_DIRECTORY_ENTRY_EXCEPTION,
+    IMAGE_DIRECTORY_ENTRY_BASERELOC,
+)
+
+
+def is_code_section(section: SectionView) -> bool:
+    return bool(section.characteristics & (IMAGE_SCN_MEM_EXECUTE | IMAGE_SCN_CNT_CODE))
+
+
+def find_code_sections(pe: PeImage) -> list[SectionView]:
+    """
+    Find executable sections, i.e. sources of the cross-references
+
+    :param pe: PE image
+    :return: sections ordered by address
+    """
+    sections = [section for section in pe.sections if is_code_section(section) and len(section.content)]
+    return sorted(sections, key=lambda section: section.virtual_address)
+
+
+def find_data_sections(pe: PeImage) -> list[SectionView]:
+    """
+    Find readable initialized data sections which may contain strings.
+    Executable and discardable sections and the sections of the import, resource, exception and relocation directories
+    are skipped.
+
+    :param pe: PE image
+    :return: sections ordered by address
+    """
+    service_addresses = {
+        pe.data_directories[index].virtual_address
+        for index in _SERVICE_DIRECTORIES
+        if index < len(pe.data_directories) and pe.data_directories[index].size
+    }
+    required = IMAGE_SCN_CNT_INITIALIZED_DATA | IMAGE_SCN_MEM_READ
+    sections = [
+        section
+        for section in pe.sections
+        if section.characteristics & required == required
+        and not section.characteristics & IMAGE_SCN_MEM_DISCARDABLE
+        and not is_code_section(section)
+        and section.virtual_address not in service_addresses
+        and len(section.content)
+    ]
+    return sorted(sections, key=lambda section: section.virtual_address)
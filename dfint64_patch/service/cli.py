@@ -0,0 +1,72 @@
+import asyncio
+from contextlib import suppress
+
+import click
+
+from dfint64_patch.analysis.cache import AnalysisCache
+from dfint64_patch.cross_references.cross_references_relative import SCAN_MODES
+from dfint64_patch.pe.image import PE_BACKENDS
+from dfint64_patch.service.resident import load_resident_analysis
+from dfint64_patch.service.server import ServiceServer
+
+
+@click.command()
+@click.argument(
+    "source_file",
+    default="Dwarf Fortress.exe",
+    type=click.Path(exists=True, dir_okay=False, resolve_path=True),
+)
+@click.option("--socket", "socket_path", help="Path to a Unix socket to listen on instead of a TCP port", default=None)
+@click.option("--host", "host", help="Host to listen on", default="127.0.0.1")
+@click.option("--port", "port", help="TCP port to listen on", default=8764)
+@click.option("--concurrency", "concurrency", help="Number of requests handled at the same time", default=2)
+@click.option("--max-pending", "max_pending", help="Maximal number of queued requests", default=64)
+@click.option(
+    "--root",
+    "root",
+    help="Directory the dictionaries and the output files of the patch requests must be in "
+    "(by default the directory of the source file)",
+    type=click.Path(exists=True, file_okay=False, resolve_path=True),
+    default=None,
+)
+@click.option("--jobs", "jobs", help="Number of processes to search cross references", default=1)
+@click.option("--pe-backend", "pe_backend", help="PE headers parser", type=click.Choice(PE_BACKENDS), default="builtin")
+@click.option("--cache/--no-cache", "cache", help="Use the cache of the analysis results", default=True)
+@click.option("--cache-dir", "cache_dir", help="Directory of the analysis cache", default=None)
+@click.option(
+    "--scan",
+    "scan",
+    help="Search cross references in every 4 bytes of the code or only in RIP-relative LEA/MOV instructions",
+    type=click.Choice(SCAN_MODES),
+    default="exhaustive",
+)
+def main(  # noqa: PLR0913
+    source_file: str,
+    *,
+    socket_path: str | None,
+    host: str,
+    port: int,
+    concurrency: int,
+    max_pending: int,
+    root: str | None,
+    jobs: int,
+    pe_backend: str,
+    cache: bool,
+    cache_dir: str | None,
+    scan: str,
+) -> None:
+    resident = load_resident_analysis(
+        source_file,
+        workers=jobs,
+        pe_backend=pe_backend,
+        cache=AnalysisCache(cache_dir) if cache else None,
+        scan=scan,
+        root=root,
+    )
+    server = ServiceServer(resident.handlers, concurrency=concurrency, max_pending=max_pending)
+    with suppress(KeyboardInterrupt):
+        asyncio.run(server.serve_forever(socket_path=socket_path, host=host, port=port))
+
+
+if __name__ == "__main__":
+    main()
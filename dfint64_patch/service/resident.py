@@ -0,0 +1,286 @@
+"""
+Resident analysis of an executable: the results of the analysis are kept in memory and reused by the requests
+of the service (see server.py) instead of analysing the executable for every request.
+
+All addresses in the requests and in the results are virtual addresses (i.e. with the image base),
+like in the output of the extract command. Paths in the requests are confined to the root directory of the service.
+"""
+
+from collections import defaultdict
+from collections.abc import Callable, Generator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Any
+
+from dfint64_patch.analysis.analyse import Analysis
+from dfint64_patch.analysis.cache import AnalysisCache
+from dfint64_patch.dictionary_loaders.loader import open_translation_dictionary
+from dfint64_patch.patching.delta import save_delta
+from dfint64_patch.patching.incremental import update_patched_file
+from dfint64_patch.patching.patch import TranslationPatch, analyse_for_translation, plan_analysed_translation
+from dfint64_patch.pe.image import open_pe_image
+from dfint64_patch.strings_context.extract_strings_with_subs import (
+    StringCrossReference,
+    group_strings_by_subroutines,
+)
+from dfint64_patch.type_aliases import Rva, TranslationTable
+
+
+class ResidentAnalysis:
+    """
+    Analysis of an executable with indices for the requests of the service.
+    The analysis is read-only after creation, so the requests can be handled in several threads.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        source_file: str | Path,
+        analysis: Analysis,
+        image_base: int,
+        *,
+        pe_backend: str = "builtin",
+        scan: str = "exhaustive",
+        root: str | Path | None = None,
+    ) -> None:
+        """
+        :param source_file: path to the analysed executable
+        :param analysis: results of the analysis
+        :param image_base: image base of the executable
+        :param pe_backend: how to parse the headers when the executable is patched, see PeImage
+        :param scan: scan mode the analysis is made with, see find_relative_cross_references
+        :param root: directory the dictionaries and the output files of the requests must be in,
+            by default the directory of the executable
+        """
+        self.source_file = Path(source_file).resolve()
+        self.root = Path(root).resolve() if root is not None else self.source_file.parent
+        self.analysis = analysis
+        self.image_base = image_base
+        self.pe_backend = pe_backend
+        self.scan = scan
+
+        self._strings_by_subroutine: dict[Rva, list[StringCrossReference]] = group_strings_by_subroutines(
+            analysis, image_base
+        )
+        self._addresses_by_string: dict[str, list[Rva]] = defaultdict(list)
+        for item in analysis.strings:
+            self._addresses_by_string[item.string].append(item.address)
+
+        self._output_locks: dict[Path, Lock] = {}
+        self._locks_guard = Lock()
+
+    def _resolve_path(self, path: str) -> Path:
+        """
+        Resolve a path of a request (relative paths are relative to the root),
+        the requests can't read, write or delete files outside of the root
+        """
+        resolved = (self.root / path).resolve()
+        if not resolved.is_relative_to(self.root):
+            msg = f"Path {path} is outside of the root directory of the service"
+            raise ValueError(msg)
+
+        return resolved
+
+    def _output_lock(self, output: Path) -> Lock:
+        """
+        Requests which write the same output file are handled one at a time
+        """
+        with self._locks_guard:
+            return self._output_locks.setdefault(output, Lock())
+
+    def _write_delta(
+        self,
+        output: Path,
+        translation_table: TranslationTable,
+        encoding: str,
+        *,
+        relocate: bool,
+    ) -> TranslationPatch:
+        with self.source_file.open("rb") as pe_file, open_pe_image(pe_file, backend=self.pe_backend) as pe:
+            translation_patch = plan_analysed_translation(
+                pe, self.analysis, translation_table, encoding, relocate=relocate
+            )
+
+        save_delta(self.source_file, translation_patch.plan, output)
+        return translation_patch
+
+    @property
+    def handlers(self) -> dict[str, Callable[..., Any]]:
+        """
+        Request handlers by method name, parameters of a request are passed as keyword arguments
+        """
+        return {
+            "info": self.info,
+            "strings_in_subroutine": self.strings_in_subroutine,
+            "references": self.references,
+            "patch": self.patch,
+        }
+
+    def info(self) -> dict[str, Any]:
+        return {
+            "file": str(self.source_file),
+            "root": str(self.root),
+            "image_base": self.image_base,
+            "strings": len(self.analysis.strings),
+            "referenced_strings": len(self.analysis.cross_references),
+            "subroutines": len(self.analysis.subroutines),
+            "scan": self.scan,
+        }
+
+    def strings_in_subroutine(self, address: int) -> dict[str, Any]:
+        """
+        Strings referenced from the subroutine which contains the address
+
+        :param address: any address of the subroutine
+        :return: boundaries of the subroutine and the strings with the addresses of the references
+        """
+        subroutines = self.analysis.subroutines
+        index = subroutines.lookup_index(address - self.image_base)
+        if index < 0:
+            msg = f"Address 0x{address:x} doesn't belong to any subroutine"
+            raise ValueError(msg)
+
+        start = self.image_base + subroutines.starts[index]
+        return {
+            "start": start,
+            "end": self.image_base + subroutines.ends[index],
+            "strings": [
+                {"string": item.string, "reference": self.image_base + item.cross_reference}
+                for item in self._strings_by_subroutine.get(Rva(start), [])
+            ],
+        }
+
+    def references(self, string: str) -> list[dict[str, Any]]:
+        """
+        Where the string is referenced from
+
+        :param string: text of the string
+        :return: every occurrence of the string with its references and the subroutines which contain them
+        """
+        subroutines = self.analysis.subroutines
+        result = []
+        for address in self._addresses_by_string.get(string, []):
+            references = self.analysis.cross_references.get(address, [])
+            indices = subroutines.lookup_many(references)
+            result.append(
+                {
+                    "address": self.image_base + address,
+                    "references": [
+                        {
+                            "address": self.image_base + reference,
+                            "subroutine": self.image_base + subroutines.starts[index] if index >= 0 else None,
+                        }
+                        for reference, index in zip(references, indices, strict=True)
+                    ],
+                }
+            )
+
+        return result
+
+    def patch(  # noqa: PLR0913
+        self,
+        output: str,
+        *,
+        dictionary: str | None = None,
+        translations: Sequence[Sequence[str]] | None = None,
+        encoding: str = "cp437",
+        relocate: bool = False,
+        delta: bool = False,
+    ) -> dict[str, Any]:
+        """
+        Patch a copy of the executable (or update a previously patched copy incrementally) or write a delta file
+
+        :param output: path to the patched file or to the delta file, inside the root directory
+        :param dictionary: path to a dictionary file (csv or compiled), inside the root directory
+        :param translations: pairs of a string and its translation, instead of a dictionary file
+        :param encoding: encoding of the translations
+        :param relocate: relocate translations longer than the original strings instead of skipping them
+        :param delta: write a delta file instead of a patched copy
+        :return: numbers of the applied and the skipped translations, and of the written bytes
+        """
+        if (dictionary is None) == (translations is None):
+            msg = "Either dictionary or translations must be set"
+            raise ValueError(msg)
+
+        output_path = self._resolve_path(output)
+        if output_path == self.source_file:
+            msg = "The output file can't be the source file"
+            raise ValueError(msg)
+
+        dictionary_path = self._resolve_path(dictionary) if dictionary is not None else None
+        translation_patch: TranslationPatch | None
+        with (
+            self._output_lock(output_path),
+            _translation_table(dictionary_path, translations) as translation_table,
+        ):
+            if delta:
+                translation_patch = self._write_delta(output_path, translation_table, encoding, relocate=relocate)
+            else:
+                update = update_patched_file(
+                    self.source_file,
+                    output_path,
+                    translation_table,
+                    encoding,
+                    pe_backend=self.pe_backend,
+                    relocate=relocate,
+                    cleanup=True,
+                    scan=self.scan,
+                    analysis=self.analysis,
+                )
+                translation_patch = update.translation_patch if update is not None else None
+
+        if translation_patch is None:
+            return {"output": output, "up_to_date": True}
+
+        stats = translation_patch.plan.stats()
+        return {
+            "output": output,
+            "up_to_date": False,
+            "applied": len(translation_patch.translated),
+            "skipped": translation_patch.skipped,
+            "edits": stats.edits,
+            "bytes": stats.bytes_total,
+        }
+
+
+@contextmanager
+def _translation_table(
+    dictionary: Path | None,
+    translations: Sequence[Sequence[str]] | None,
+) -> Generator[TranslationTable, None, None]:
+    if dictionary is not None:
+        with open_translation_dictionary(dictionary) as translation_table:
+            yield translation_table
+    else:
+        assert translations is not None
+        yield [(source, translation) for source, translation in translations]
+
+
+def load_resident_analysis(  # noqa: PLR0913
+    source_file: str | Path,
+    *,
+    workers: int = 1,
+    pe_backend: str = "builtin",
+    cache: AnalysisCache | None = None,
+    scan: str = "exhaustive",
+    root: str | Path | None = None,
+) -> ResidentAnalysis:
+    """
+    Analyse the executable (or load the analysis from the cache) for the service
+
+    :param source_file: path to the executable
+    :param workers: number of processes to search cross-references
+    :param pe_backend: how to parse the headers, see PeImage
+    :param cache: analysis cache, if None then the cache is not used
+    :param scan: scan mode of the cross-references search, see find_relative_cross_references
+    :param root: directory the paths of the requests are confined to, by default the directory of the executable
+    :return: ResidentAnalysis
+    """
+    with Path(source_file).open("rb") as pe_file, open_pe_image(pe_file, backend=pe_backend) as pe:
+        # the service answers queries about subroutines and patch requests may ask to relocate the strings
+        analysis = analyse_for_translation(
+            pe, workers=workers, cache=cache, scan=scan, relocate=True, subroutines="auto"
+        )
+        image_base = pe.image_base
+
+    return ResidentAnalysis(source_file, analysis, image_base, pe_backend=pe_backend, scan=scan, root=root)
@@ -0,0 +1,152 @@
+"""
+Service protocol: newline-delimited JSON over a Unix socket or a localhost TCP socket.
+
+Request:  {"id": 1, "method": "references", "params": {"string": "Hello"}}
+Response: {"id": 1, "result": ...} or {"id": 1, "error": "message"}
+
+Requests of a connection are handled concurrently, so the responses may come out of order (they are matched by "id").
+Handlers run in a thread pool of a limited size, the requests beyond the pool wait in a queue;
+when the queue is full, new requests are rejected with an error instead of piling up.
+"""
+
+import asyncio
+import json
+from collections.abc import Callable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from functools import partial
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+STREAM_LIMIT = 16 * 1024 * 1024  # maximal size of a request line, a request may contain a whole translation table
+
+
+class ServiceServer:
+    def __init__(
+        self,
+        handlers: Mapping[str, Callable[..., Any]],
+        *,
+        concurrency: int = 2,
+        max_pending: int = 64,
+    ) -> None:
+        """
+        :param handlers: request handlers by method name, parameters of a request are passed as keyword arguments
+        :param concurrency: number of the requests handled at the same time
+        :param max_pending: maximal number of the accepted requests (handled and waiting in the queue)
+        """
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="dfint64-service")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    async def handle_request(self, request: Any) -> dict[str, Any]:  # noqa: ANN401
+        """
+        Handle a decoded request
+
+        :param request: request object
+        :return: response object
+        """
+        if not isinstance(request, dict):
+            return {"id": None, "error": "Request must be an object"}
+
+        request_id = request.get("id")
+        method = request.get("method")
+        params = request.get("params") or {}
+        handler = self.handlers.get(method) if isinstance(method, str) else None
+        if handler is None:
+            return {"id": request_id, "error": f"Unknown method: {method}"}
+
+        if not isinstance(params, dict):
+            return {"id": request_id, "error": "Params must be an object"}
+
+        if self.pending >= self.max_pending:
+            return {"id": request_id, "error": "Too many pending requests"}
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, partial(handler, **params))
+        except Exception as ex:  # noqa: BLE001
+            logger.warning(f"Request {request_id} ({method}) failed: {ex}")
+            return {"id": request_id, "error": str(ex) or type(ex).__name__}
+        finally:
+            self.pending -= 1
+
+        return {"id": request_id, "result": result}
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock) -> None:
+        try:
+            request = json.loads(line)
+        except ValueError as ex:
+            response: dict[str, Any] = {"id": None, "error": f"Invalid JSON: {ex}"}
+        else:
+            response = await self.handle_request(request)
+
+        async with write_lock:
+            writer.write(json.dumps(response, ensure_ascii=False).encode("utf-8") + b"\n")
+            await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        write_lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+
+                task = asyncio.create_task(self._respond(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, ValueError) as ex:  # ValueError: the request line exceeds STREAM_LIMIT
+            logger.warning(f"Connection is closed: {ex}")
+        finally:
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def start(
+        self,
+        *,
+        socket_path: str | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> asyncio.Server:
+        """
+        Start listening on a Unix socket (if socket_path is set) or on a TCP socket.
+        The Unix socket is accessible only by its owner.
+
+        :param socket_path: path to the Unix socket
+        :param host: host of the TCP socket, by default the service is available only on the local machine
+        :param port: port of the TCP socket, 0 to choose a free port
+        :return: started asyncio.Server
+        """
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(
+                self.handle_connection, path=socket_path, limit=STREAM_LIMIT, start_serving=False
+            )
+            Path(socket_path).chmod(0o600)  # noqa: ASYNC240, before the socket starts accepting connections
+            await server.start_serving()
+        else:
+            server = await asyncio.start_server(self.handle_connection, host=host, port=port, limit=STREAM_LIMIT)
+
+        for sock in server.sockets:
+            logger.info(f"Serving on {sock.getsockname()}")
+
+        return server
+
+    async def serve_forever(self, *, socket_path: str | None = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        server = await self.start(socket_path=socket_path, host=host, port=port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
@@ -9,73 +9,84 @@ from operator import itemgetter
 from pathlib import Path
 from typing import NamedTuple
 
-import lief
 from omegaconf import DictConfig
 
+from dfint64_patch.analysis.analyse import Analysis, AnalysisParameters, analyse_pe_image
+from dfint64_patch.analysis.cache import AnalysisCache
 from dfint64_patch.config import with_config
-from dfint64_patch.cross_references.cross_references_relative import find_relative_cross_references
-from dfint64_patch.extract_strings.from_raw_bytes import ExtractedStringInfo, extract_strings_from_raw_bytes
-from dfint64_patch.extract_subroutines.from_raw_bytes import SubroutineInfo, extract_subroutines, which_subroutine
+from dfint64_patch.extract_strings.from_raw_bytes import ExtractedStringInfo
+from dfint64_patch.pe.image import PeImage, open_pe_image
 from dfint64_patch.type_aliases import Rva
 
 
-def extract_strings_with_xrefs(pe: lief.PE.Binary) -> dict[ExtractedStringInfo, list[Rva]]:
-    code_section = pe.sections[0]
-    string_section = pe.sections[1]
-
-    strings = list(
-        extract_strings_from_raw_bytes(
-            string_section.content,
-            base_address=Rva(string_section.virtual_address),
-        ),
-    )
-
-    cross_references = find_relative_cross_references(
-        code_section.content,
-        base_address=Rva(code_section.virtual_address),
-        addresses=map(itemgetter(0), strings),
-    )
-
+def _strings_with_xrefs(analysis: Analysis) -> dict[ExtractedStringInfo, list[Rva]]:
+    cross_references = analysis.cross_references
     return {
         string_info: cross_references[string_info.address]
-        for string_info in strings
-        if cross_references[string_info.address]
+        for string_info in analysis.strings
+        if cross_references.get(string_info.address)
     }
 
 
+def extract_strings_with_xrefs(
+    pe: PeImage, *, cache: AnalysisCache | None = None
+) -> dict[ExtractedStringInfo, list[Rva]]:
+    return _strings_with_xrefs(analyse_pe_image(pe, AnalysisParameters(subroutines=None), cache=cache))
+
+
 class StringCrossReference(NamedTuple):
     string: str
     cross_reference: Rva
 
 
-def extract_strings_grouped_by_subs(pe_file: BufferedReader) -> dict[Rva, list[StringCrossReference]]:
-    pe = lief.PE.parse(pe_file)
-    assert pe is not None
-    code_section = pe.sections[0]
-
-    image_base = pe.optional_header.imagebase
-
-    strings_with_xrefs = extract_strings_with_xrefs(pe)
-
-    subroutines = list(
-        extract_subroutines(
-            code_section.content,
-            base_offset=code_section.virtual_address,
-        )
-    )
-
-    raw_result: dict[SubroutineInfo, list[StringCrossReference]] = defaultdict(list)
-    for string_info, xrefs in strings_with_xrefs.items():
-        for xref in xrefs:
-            subroutine = which_subroutine(subroutines, xref)
-            if not subroutine:
-                continue
-            raw_result[subroutine].append(StringCrossReference(string_info.string, xref))
+def extract_strings_grouped_by_subs(
+    pe_file: BufferedReader,
+    *,
+    subroutines_source: str = "auto",
+    cache: AnalysisCache | None = None,
+) -> dict[Rva, list[StringCrossReference]]:
+    """
+    Extract strings referenced from the code grouped by subroutines which reference them
+
+    :param pe_file: PE file opened in binary mode
+    :param subroutines_source: how to find subroutines: "auto", "pdata" or "padding", see extract_pe_subroutines
+    :param cache: analysis cache, if None then the cache is not used
+    :return: mapping of subroutine addresses to the strings referenced by the subroutine
+    """
+    with open_pe_image(pe_file) as pe:
+        image_base = pe.image_base
+        analysis = analyse_pe_image(pe, AnalysisParameters(subroutines=subroutines_source), cache=cache)
+
+    return group_strings_by_subroutines(analysis, image_base)
+
+
+def group_strings_by_subroutines(analysis: Analysis, image_base: int) -> dict[Rva, list[StringCrossReference]]:
+    """
+    Group strings referenced from the code by subroutines which reference them
+
+    :param analysis: results of the analysis
+    :param image_base: image base to add to the addresses of the subroutines
+    :return: mapping of subroutine addresses to the strings referenced by the subroutine
+    """
+    strings_with_xrefs = _strings_with_xrefs(analysis)
+    subroutines = analysis.subroutines
+
+    string_xrefs = [
+        StringCrossReference(string_info.string, xref)
+        for string_info, xrefs in strings_with_xrefs.items()
+        for xref in xrefs
+    ]
+    subroutine_indices = subroutines.lookup_many(item.cross_reference for item in string_xrefs)
+
+    raw_result: dict[int, list[StringCrossReference]] = defaultdict(list)
+    for string_xref, subroutine_index in zip(string_xrefs, subroutine_indices, strict=True):
+        if subroutine_index >= 0:
+            raw_result[subroutine_index].append(string_xref)
 
     result: dict[Rva, list[StringCrossReference]] = {}
-    for subroutine, string_xrefs in sorted(raw_result.items(), key=itemgetter(0)):
-        sorted_xrefs = sorted(string_xrefs, key=lambda x: x.cross_reference)
-        result[Rva(image_base + subroutine.start)] = sorted_xrefs
+    for subroutine_index, subroutine_xrefs in sorted(raw_result.items(), key=itemgetter(0)):
+        sorted_xrefs = sorted(subroutine_xrefs, key=lambda x: x.cross_reference)
+        result[Rva(image_base + subroutines.starts[subroutine_index])] = sorted_xrefs
 
     return result
 
@@ -84,12 +95,20 @@ def extract_strings_grouped_by_subs(pe_file: BufferedReader) -> dict[Rva, list[S
 class ExtractConfig(DictConfig):
     file_name: str
     out_file: str | None = None
+    subroutines: str = "auto"
+    cache: bool = True
+    cache_dir: str | None = None
 
 
 @with_config(ExtractConfig, ".extract.yaml")
 def main(conf: ExtractConfig) -> None:
     with Path(conf.file_name).open("rb") as pe_file:
-        for subroutine, strings in extract_strings_grouped_by_subs(pe_file).items():
+        cache = AnalysisCache(conf.cache_dir) if conf.cache else None
+        for subroutine, strings in extract_strings_grouped_by_subs(
+            pe_file,
+            subroutines_source=conf.subroutines,
+            cache=cache,
+        ).items():
             print(f"sub_{subroutine:x}:")
             for string in strings:
                 print(f"\t{string.string}")
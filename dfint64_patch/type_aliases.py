@@ -1,6 +1,10 @@
+from collections.abc import Iterable, Mapping
 from typing import NewType
 
 Rva = NewType("Rva", int)  # relative virtual address
 Offset = NewType("Offset", int)  # physical offset in a file
 
 RVA0 = Rva(0)
+
+# pairs of a string and its translation, or a mapping of strings to translations
+TranslationTable = Iterable[tuple[str, str]] | Mapping[str, str]
@@ -2,9 +2,27 @@ from pathlib import Path
 
 import pytest
 
+from dfint64_patch.extract_strings.cli import extract_strings
+
 tests_dir = Path(__file__).parent
 
 
 @pytest.fixture
 def exe_file_path() -> Path:
     return tests_dir / "test64.exe"
+
+
+@pytest.fixture
+def extracted_strings(exe_file_path: Path) -> list[str]:
+    """
+    Strings extracted from the test executable, to make translation tables of
+    """
+    with exe_file_path.open("rb") as pe_file:
+        return [item.string for item in extract_strings(pe_file)]
+
+
+@pytest.fixture(autouse=True)
+def analysis_cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("DFINT64_PATCH_CACHE_DIR", str(cache_dir))
+    return cache_dir
@@ -0,0 +1,44 @@
+import pickle
+
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+
+from dfint64_patch.cross_references import address_index
+from dfint64_patch.cross_references.address_index import AddressIndex
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+addresses_strategy = st.sets(st.integers(min_value=0x1000, max_value=0x2000), max_size=64)
+probes_strategy = st.lists(st.integers(min_value=0xF00, max_value=0x2100), max_size=64)
+
+
+@pytest.mark.parametrize("use_numpy", [False, pytest.param(True, marks=pytest.mark.skipif(np is None, reason="numpy"))])
+@given(addresses=addresses_strategy, probes=probes_strategy)
+def test_address_index(use_numpy: bool, addresses: set[int], probes: list[int]):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        if not use_numpy:
+            monkeypatch.setattr(address_index, "np", None)
+        index = AddressIndex(addresses)
+
+    assert len(index) == len(addresses)
+    assert list(index) == sorted(addresses)
+    assert [probe in index for probe in probes] == [probe in addresses for probe in probes]
+    assert "0x1000" not in index
+
+
+@pytest.mark.skipif(np is None, reason="numpy is not installed")
+@given(addresses=addresses_strategy, probes=probes_strategy)
+def test_address_index_contains_many(addresses: set[int], probes: list[int]):
+    index = AddressIndex(addresses)
+    mask = index.contains_many(np.array(probes, dtype=np.int64))
+    assert mask.tolist() == [probe in addresses for probe in probes]
+
+
+def test_address_index_pickle():
+    index = AddressIndex([0x1000, 0x1004, 0x2000])
+    restored = pickle.loads(pickle.dumps(index))  # noqa: S301
+    assert list(restored) == list(index)
@@ -0,0 +1,80 @@
+import io
+from pathlib import Path
+
+import pytest
+
+from dfint64_patch.analysis.analyse import Analysis, AnalysisParameters, analyse_pe_image
+from dfint64_patch.analysis.cache import CACHE_FILE_SUFFIX, AnalysisCache, CachedStrings, read_analysis, write_analysis
+from dfint64_patch.extract_strings.from_raw_bytes import ExtractedStringInfo
+from dfint64_patch.extract_subroutines.from_raw_bytes import SubroutineIndex, SubroutineInfo
+from dfint64_patch.pe.image import open_pe_image
+from dfint64_patch.type_aliases import Rva
+
+analysis = Analysis(
+    strings=[ExtractedStringInfo(Rva(0x2000), "Hello"), ExtractedStringInfo(Rva(0x2008), "Привет")],
+    cross_references={Rva(0x2000): [Rva(0x1010), Rva(0x1020)], Rva(0x2008): [Rva(0x1030)]},
+    subroutines=SubroutineIndex.from_subroutines([SubroutineInfo(0x1000, 0x1018), SubroutineInfo(0x1020, 0x1040)]),
+)
+
+
+@pytest.mark.parametrize("test_data", [analysis, Analysis([], {}, SubroutineIndex())])
+def test_write_read_analysis(test_data: Analysis):
+    file_object = io.BytesIO()
+    write_analysis(test_data, file_object)
+    assert read_analysis(file_object.getvalue()) == test_data
+
+
+def test_read_analysis_cached_strings():
+    file_object = io.BytesIO()
+    write_analysis(analysis, file_object)
+    strings = read_analysis(file_object.getvalue()).strings
+
+    assert isinstance(strings, CachedStrings)
+    assert len(strings) == len(analysis.strings)
+    assert strings[-1] == analysis.strings[-1]
+    assert strings[1:] == analysis.strings[1:]
+    assert list(strings) == analysis.strings
+    with pytest.raises(IndexError):
+        strings[2]
+
+
+def test_read_analysis_invalid():
+    file_object = io.BytesIO()
+    write_analysis(analysis, file_object)
+    data = file_object.getvalue()
+
+    with pytest.raises(ValueError, match="truncated"):
+        read_analysis(data[:-1])
+
+    with pytest.raises(ValueError, match="format"):
+        read_analysis(b"\0" + data[1:])
+
+
+def test_analysis_cache(tmp_path: Path):
+    cache = AnalysisCache(tmp_path)
+    key = cache.key(b"data", AnalysisParameters())
+    assert key != cache.key(b"data", AnalysisParameters(encoding="cp1251"))
+    assert cache.load(key) is None
+
+    cache.store(key, analysis)
+    assert cache.load(key) == analysis
+
+    # corrupted entries are removed
+    (tmp_path / (key + CACHE_FILE_SUFFIX)).write_bytes(b"garbage")
+    assert cache.load(key) is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_analysis_cache_evict(tmp_path: Path):
+    cache = AnalysisCache(tmp_path, max_size=1)
+    cache.store("key", analysis)
+    assert not list(tmp_path.glob("*" + CACHE_FILE_SUFFIX))
+
+
+def test_analyse_pe_image_cached(exe_file_path: Path, tmp_path: Path):
+    cache = AnalysisCache(tmp_path)
+    with exe_file_path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        expected = analyse_pe_image(pe)
+        assert analyse_pe_image(pe, cache=cache) == expected
+        assert len(list(tmp_path.glob("*" + CACHE_FILE_SUFFIX))) == 1
+        assert analyse_pe_image(pe, cache=cache) == expected
@@ -0,0 +1,107 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from dfint64_patch.patching.batch import BatchResult, BatchTarget, format_batch_summary, patch_batch
+from dfint64_patch.patching.cli import main
+from dfint64_patch.patching.delta import apply_delta, load_delta
+from dfint64_patch.patching.patch import patch
+
+from .utils import write_dictionary
+
+
+@pytest.fixture
+def translation_tables(extracted_strings: list[str]) -> list[list[tuple[str, str]]]:
+    strings = extracted_strings
+    return [
+        [(string, string.upper()) for string in strings[:10]],
+        [(string, string.lower()) for string in strings[5:15]] + [(strings[15], strings[15] + " (longer)")],
+        [(string, string.title()) for string in strings[10:12]],
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_patch_batch(exe_file_path: Path, tmp_path: Path, translation_tables: list, workers: int):
+    targets = [
+        BatchTarget(write_dictionary(tmp_path / f"dict{i}.csv", table), "cp437", str(tmp_path / f"patched{i}.exe"))
+        for i, table in enumerate(translation_tables)
+    ]
+
+    results = patch_batch(exe_file_path, targets, workers=workers)
+    assert [result.target for result in results] == targets
+    assert [(result.applied, result.skipped, result.error) for result in results] == [
+        (10, 0, None),
+        (10, 1, None),
+        (2, 0, None),
+    ]
+
+    for i, table in enumerate(translation_tables):
+        expected_file = tmp_path / f"expected{i}.exe"
+        shutil.copy(exe_file_path, expected_file)
+        patch(expected_file, table, "cp437")
+        assert Path(targets[i].patched_file).read_bytes() == expected_file.read_bytes()
+
+    # Up to date files are not patched again, errors don't stop other targets
+    targets.append(BatchTarget(str(tmp_path / "missing.csv"), "cp437", str(tmp_path / "patched3.exe")))
+    results = patch_batch(exe_file_path, targets, workers=workers)
+    assert [result.applied for result in results[:3]] == [None, None, None]
+    assert results[3].error is not None
+
+
+def test_patch_batch_same_files(exe_file_path: Path, tmp_path: Path):
+    target = BatchTarget("dict.csv", "cp437", str(tmp_path / "patched.exe"))
+    with pytest.raises(ValueError, match="must be different"):
+        patch_batch(exe_file_path, [target, target])
+
+    with pytest.raises(ValueError, match="Source file"):
+        patch_batch(exe_file_path, [target._replace(patched_file=str(exe_file_path))])
+
+
+def test_format_batch_summary():
+    target = BatchTarget("dict.csv", "cp1251", "patched.exe")
+    lines = format_batch_summary(
+        [BatchResult(target, 10, 2), BatchResult(target), BatchResult(target, error="No such file")],
+    )
+    assert len(lines) == 4
+    assert lines[1].split() == ["patched.exe", "cp1251", "10", "2"]
+    assert lines[2].endswith("up to date")
+    assert lines[3].endswith("error: No such file")
+
+
+def test_cli_batch(exe_file_path: Path, tmp_path: Path, translation_tables: list):
+    arguments = [str(exe_file_path)]
+    for i, table in enumerate(translation_tables):
+        arguments += [
+            "--batch",
+            write_dictionary(tmp_path / f"dict{i}.csv", table),
+            "cp437",
+            str(tmp_path / f"{i}.exe"),
+        ]
+
+    result = CliRunner().invoke(main, arguments, catch_exceptions=False)
+    assert result.exit_code == 0
+    assert all((tmp_path / f"{i}.exe").exists() for i in range(len(translation_tables)))
+
+    result = CliRunner().invoke(main, [*arguments, "--dry-run"])
+    assert result.exit_code != 0
+
+
+def test_patch_batch_delta(exe_file_path: Path, tmp_path: Path, translation_tables: list):
+    targets = [
+        BatchTarget(write_dictionary(tmp_path / f"dict{i}.csv", table), "cp437", str(tmp_path / f"{i}.delta"))
+        for i, table in enumerate(translation_tables)
+    ]
+    results = patch_batch(exe_file_path, targets, delta=True)
+    assert [result.applied for result in results] == [10, 10, 2]
+
+    for i, table in enumerate(translation_tables):
+        expected_file = tmp_path / f"expected{i}.exe"
+        shutil.copy(exe_file_path, expected_file)
+        patch(expected_file, table, "cp437")
+
+        target_file = tmp_path / f"target{i}.exe"
+        shutil.copy(exe_file_path, target_file)
+        apply_delta(load_delta(targets[i].patched_file), target_file)
+        assert target_file.read_bytes() == expected_file.read_bytes()
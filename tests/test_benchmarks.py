@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from benchmarks.baseline import compare_results, format_comparison, make_results
+from benchmarks.cli import cli
+from benchmarks.stages import STAGES, run_stages
+from benchmarks.synthetic_pe import MB, SyntheticPeInfo, SyntheticPeParameters, generate_pe
+from dfint64_patch.analysis.analyse import AnalysisParameters, analyse_pe_image
+from dfint64_patch.cross_references.cross_references_relative import find_intersected_cross_references
+from dfint64_patch.extract_subroutines.from_exception_directory import extract_subroutines_from_exception_directory
+from dfint64_patch.pe.image import open_pe_image
+from dfint64_patch.pe.sections import find_code_sections, find_data_sections
+
+SMALL_IMAGE = SyntheticPeParameters(size=MB // 4, collision_rate=0.05, seed=1)
+
+
+@pytest.fixture(scope="module")
+def synthetic_image(tmp_path_factory: pytest.TempPathFactory) -> tuple[Path, SyntheticPeInfo]:
+    path = tmp_path_factory.mktemp("benchmarks") / "synthetic.exe"
+    info = generate_pe(path, SMALL_IMAGE)
+    return path, info
+
+
+def test_generate_pe(synthetic_image: tuple[Path, SyntheticPeInfo]):
+    path, info = synthetic_image
+    assert path.stat().st_size == info.size
+    assert info.strings > 0
+    assert info.references > info.strings
+    assert info.collisions > 0
+    assert info.pointers > 0
+
+    with path.open("rb") as file, open_pe_image(file) as pe:
+        assert [section.name for section in find_code_sections(pe)] == [".text"]
+        assert [section.name for section in find_data_sections(pe)] == [".rdata", ".data"]
+        subroutines = extract_subroutines_from_exception_directory(pe)
+        assert subroutines is not None
+        assert len(subroutines) == info.functions
+
+        analysis = analyse_pe_image(pe, AnalysisParameters())
+
+    # the shortest generated strings (e.g. "a") are not recognized as strings, so the numbers are approximate
+    assert len(analysis.strings) >= info.strings * 0.99
+    assert sum(map(len, analysis.cross_references.values())) >= (info.references + info.pointers) * 0.99
+    assert len(list(find_intersected_cross_references(analysis.cross_references))) >= info.collisions * 0.9
+
+
+def test_generate_pe_is_deterministic(tmp_path: Path, synthetic_image: tuple[Path, SyntheticPeInfo]):
+    path, _ = synthetic_image
+    generate_pe(tmp_path / "synthetic.exe", SMALL_IMAGE)
+    assert (tmp_path / "synthetic.exe").read_bytes() == path.read_bytes()
+
+
+def test_run_stages(synthetic_image: tuple[Path, SyntheticPeInfo]):
+    path, _ = synthetic_image
+    results = run_stages(path, repeat=1, scan="opcodes")
+    assert tuple(results) == STAGES
+    assert all(len(durations) == 1 and durations[0] >= 0 for durations in results.values())
+
+
+def test_compare_results():
+    baseline = make_results({"a": [1.0, 1.2], "b": [0.001], "c": [2.0]}, {})
+    current = make_results({"a": [1.5], "b": [0.003], "d": [1.0]}, {})
+    comparison = compare_results(baseline, current, threshold=0.1, min_delta=0.005)
+
+    assert [(item.stage, item.regression) for item in comparison] == [
+        ("a", True),
+        ("b", False),  # three times slower, but within the noise
+        ("c", False),
+        ("d", False),
+    ]
+    assert comparison[0].ratio == pytest.approx(1.5)
+    assert comparison[2].ratio is None
+
+    lines = format_comparison(comparison)
+    assert len(lines) == 5
+    assert lines[1].endswith("REGRESSION")
+
+
+def test_cli(tmp_path: Path):
+    runner = CliRunner()
+    baseline_file = tmp_path / "baseline.json"
+    result = runner.invoke(
+        cli, ["run", "--size", "0.125", "--repeat", "1", "--output", str(baseline_file)], catch_exceptions=False
+    )
+    assert result.exit_code == 0
+    baseline = json.loads(baseline_file.read_text())
+    assert set(baseline["stages"]) == set(STAGES)
+    assert baseline["image"]["synthetic"]
+
+    result = runner.invoke(cli, ["compare", str(baseline_file), str(baseline_file)])
+    assert result.exit_code == 0
+    assert "REGRESSION" not in result.output
+
+    for item in baseline["stages"].values():
+        item["best"] /= 2
+    faster_file = tmp_path / "faster.json"
+    faster_file.write_text(json.dumps(baseline))
+    result = runner.invoke(cli, ["compare", str(faster_file), str(baseline_file), "--min-delta", "0"])
+    assert result.exit_code == 1
+    assert "REGRESSION" in result.output
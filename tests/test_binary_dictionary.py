@@ -0,0 +1,74 @@
+import io
+import shutil
+import string
+from pathlib import Path
+
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+
+from dfint64_patch.dictionary_loaders.binary_dictionary import (
+    BinaryDictionary,
+    compile_dictionary,
+    is_binary_dictionary,
+)
+from dfint64_patch.dictionary_loaders.loader import open_translation_dictionary
+from dfint64_patch.patching.patch import patch
+
+from .utils import write_dictionary
+
+text_strategy = st.text(alphabet=string.printable + "абвгд")
+
+
+def compile_to_bytes(translation_table: list[tuple[str, str]], encoding: str) -> bytes:
+    file = io.BytesIO()
+    compile_dictionary(translation_table, encoding, file)
+    return file.getvalue()
+
+
+@given(st.lists(st.tuples(text_strategy, text_strategy)), text_strategy)
+def test_binary_dictionary(translation_table: list[tuple[str, str]], missing: str):
+    expected = dict(translation_table)
+    dictionary = BinaryDictionary(compile_to_bytes(translation_table, "cp866"))
+
+    assert dictionary.encoding == "cp866"
+    assert len(dictionary) == len(expected)
+    assert dict(dictionary) == expected
+    for key, value in expected.items():
+        assert dictionary.get_encoded(key) == value.encode("cp866")
+
+    if missing not in expected:
+        assert missing not in dictionary
+        assert dictionary.get(missing) is None
+        assert dictionary.get_encoded(missing) is None
+
+
+def test_compile_dictionary_unencodable():
+    dictionary = BinaryDictionary(compile_to_bytes([("a", "b"), ("c", "日本"), ("a", "漢字")], "cp437"))
+    assert dict(dictionary) == {}
+
+
+@pytest.mark.parametrize("data", [b"", b"DF64DIC\0", compile_to_bytes([("a", "b")], "cp437")[:-1]])
+def test_binary_dictionary_invalid(data: bytes):
+    with pytest.raises(ValueError, match=r"format|truncated"):
+        BinaryDictionary(data)
+
+
+def test_patch_with_binary_dictionary(exe_file_path: Path, tmp_path: Path, extracted_strings: list[str]):
+    translation_table = [(string, string.upper()) for string in extracted_strings[:10]]
+    csv_file = Path(write_dictionary(tmp_path / "dictionary.csv", translation_table))
+    binary_file = tmp_path / "dictionary.bin"
+    binary_file.write_bytes(compile_to_bytes(translation_table, "cp437"))
+    assert is_binary_dictionary(binary_file)
+    assert not is_binary_dictionary(csv_file)
+
+    results = []
+    for dictionary_file in [csv_file, binary_file]:
+        patched_file = tmp_path / "patched.exe"
+        shutil.copy(exe_file_path, patched_file)
+        with open_translation_dictionary(dictionary_file) as dictionary:
+            patch(patched_file, dictionary, "cp437")
+
+        results.append(patched_file.read_bytes())
+
+    assert results[0] == results[1] != exe_file_path.read_bytes()
@@ -0,0 +1,70 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from dfint64_patch.cli import COMMANDS, main
+
+
+def test_help_imports_no_commands():
+    code = (
+        "import sys\n"
+        "from dfint64_patch.cli import main\n"
+        "try:\n"
+        "    main(['--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted(name for name in sys.modules if name.startswith(('dfint64_patch.', 'omegaconf', 'lief'))))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)  # noqa: S603
+    assert result.stdout.splitlines()[-1] == "['dfint64_patch.cli']"
+    assert all(name in result.stdout for name in COMMANDS)
+
+
+def test_patch_help_imports_no_analysis():
+    code = (
+        "import sys\n"
+        "from dfint64_patch.cli import main\n"
+        "try:\n"
+        "    main(['patch', '--help'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print(sorted(name for name in sys.modules if name.startswith(('numpy', 'dfint64_patch.analysis'))))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)  # noqa: S603
+    assert "Usage" in result.stdout
+    assert result.stdout.splitlines()[-1] == "[]"
+
+
+def test_commands_are_importable():
+    runner = CliRunner()
+    for name in COMMANDS:
+        result = runner.invoke(main, [name, "--help"], catch_exceptions=False)
+        assert result.exit_code == 0, name
+
+    assert runner.invoke(main, ["unknown"]).exit_code != 0
+
+
+def test_extract(exe_file_path: Path, tmp_path: Path):
+    out_file = tmp_path / "strings.txt"
+    result = CliRunner().invoke(
+        main,
+        ["extract", f"file_name={exe_file_path}", f"out_file={out_file}", "cache=false"],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    assert out_file.read_text().splitlines()
+
+
+def test_patch(exe_file_path: Path, tmp_path: Path):
+    dictionary_file = tmp_path / "dict.csv"
+    dictionary_file.write_text("", encoding="utf-8")
+    patched_file = tmp_path / "patched.exe"
+    result = CliRunner().invoke(
+        main,
+        ["patch", str(exe_file_path), str(patched_file), "--dict", str(dictionary_file)],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    assert patched_file.read_bytes() == exe_file_path.read_bytes()
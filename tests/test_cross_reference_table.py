@@ -0,0 +1,101 @@
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+
+from dfint64_patch.cross_references import cross_reference_table
+from dfint64_patch.cross_references.cross_reference_table import CrossReferenceTable
+from dfint64_patch.cross_references.cross_references_relative import (
+    find_intersected_cross_references,
+    invert_cross_reference_table,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+pairs_strategy = st.dictionaries(
+    st.integers(min_value=0, max_value=0x10000),  # unique sources
+    st.integers(min_value=0, max_value=0x100),
+    max_size=64,
+).map(lambda sources: [(destination, source) for source, destination in sources.items()])
+
+
+def as_dict(pairs: list[tuple[int, int]]) -> dict[int, list[int]]:
+    result: dict[int, list[int]] = {}
+    for destination, source in sorted(pairs):
+        result.setdefault(destination, []).append(source)
+    return result
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+@given(pairs=pairs_strategy)
+def test_from_pairs(pairs: list[tuple[int, int]], vectorized: bool):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        if not vectorized:
+            monkeypatch.setattr(cross_reference_table, "np", None)
+
+        table = CrossReferenceTable.from_pairs(pairs)
+
+    expected = as_dict(pairs)
+    assert table == expected
+    assert dict(table) == expected
+    assert list(table) == sorted(expected)
+    assert table.references_count == len(pairs)
+    assert list(table.pairs()) == sorted(pairs)
+
+    inverse = {source: destination for destination, source in pairs}
+    assert table.inverse() == inverse
+    assert list(table.inverse()) == sorted(inverse)
+    assert table.sorted_sources().tolist() == sorted(inverse)
+
+
+@pytest.mark.skipif(np is None, reason="numpy is not installed")
+@given(pairs=pairs_strategy)
+def test_from_arrays(pairs: list[tuple[int, int]]):
+    destinations = np.array([destination for destination, _ in pairs], dtype=np.int64)
+    sources = np.array([source for _, source in pairs], dtype=np.int64)
+    table = CrossReferenceTable.from_arrays(destinations, sources)
+
+    assert table == as_dict(pairs)
+    assert list(table.pairs()) == sorted(pairs)
+    assert table.offsets.typecode == table.destinations.typecode == table.sources.typecode == "q"
+
+
+def test_lookups():
+    table = CrossReferenceTable.from_mapping({0x200: [0x14, 0x10], 0x100: [0x20]})
+
+    assert table[0x200] == [0x10, 0x14]
+    assert table.get(0x100) == [0x20]
+    assert table.get(0x300) is None
+    assert 0x100 in table
+    assert 0x300 not in table
+    assert "0x100" not in table
+    assert table[0x300] == []
+    assert 0x300 not in table
+
+    assert table.destination_of(0x14) == 0x200
+    assert table.destination_of(0x20) == 0x100
+    assert table.destination_of(0x18) is None
+    assert invert_cross_reference_table(table)[0x10] == 0x200
+    with pytest.raises(KeyError):
+        invert_cross_reference_table(table)[0x18]
+
+
+def test_empty():
+    table = CrossReferenceTable.from_pairs([])
+    assert len(table) == 0
+    assert table == {}
+    assert table.destination_of(0) is None
+    assert list(find_intersected_cross_references(table)) == []
+
+
+def test_intersections():
+    table = CrossReferenceTable.from_mapping({0x100: [0x10, 0x20], 0x200: [0x12]})
+    assert list(find_intersected_cross_references(table)) == [(0x10, 0x12)]
+
+
+def test_invalid_offsets():
+    table = CrossReferenceTable.from_pairs([(1, 2)])
+    with pytest.raises(ValueError, match="Offsets"):
+        CrossReferenceTable(table.destinations, table.offsets[:1], table.sources)
@@ -0,0 +1,78 @@
+import struct
+from pathlib import Path
+
+import pytest
+
+from dfint64_patch.cross_references import cross_references_absolute
+from dfint64_patch.cross_references.cross_references_absolute import (
+    IMAGE_REL_BASED_DIR64,
+    find_absolute_cross_references,
+    parse_base_relocations,
+)
+from dfint64_patch.pe.headers import DataDirectory
+from dfint64_patch.pe.image import PeImage, SectionView, open_pe_image
+from dfint64_patch.type_aliases import Offset, Rva
+
+from .utils import FakePeImage
+
+IMAGE_BASE = 0x140000000
+IMAGE_REL_BASED_ABSOLUTE = 0  # padding entry
+
+
+def fake_pe_image() -> PeImage:
+    """
+    Identity-mapped image: relocation table at 0x100, pointers at 0x1000-0x1020, objects at 0x2000
+    """
+    data = bytearray(0x3000)
+    table = struct.pack("<II", 0x1000, 16) + struct.pack(
+        "<4H",
+        IMAGE_REL_BASED_DIR64 << 12 | 0x000,
+        IMAGE_REL_BASED_DIR64 << 12 | 0x008,
+        3 << 12 | 0x010,  # HIGHLOW, not a 64-bit pointer
+        IMAGE_REL_BASED_ABSOLUTE,
+    )
+    table += struct.pack("<II", 0x2000, 12) + struct.pack("<2H", IMAGE_REL_BASED_DIR64 << 12 | 0xFFC, 0)
+    data[0x100 : 0x100 + len(table)] = table
+    struct.pack_into("<QQQ", data, 0x1000, IMAGE_BASE + 0x2000, IMAGE_BASE + 0x2010, IMAGE_BASE + 0x2000)
+
+    data_directories = [DataDirectory(Rva(0), 0)] * 5 + [DataDirectory(Rva(0x100), len(table))]
+    view = memoryview(bytes(data))
+    sections = [
+        SectionView(".data", Rva(0x1000), 0x1000, Offset(0x1000), 0x1000, 0, view[0x1000:0x2000]),
+        SectionView(".rdata", Rva(0x2000), 0x1000, Offset(0x2000), 0x1000, 0, view[0x2000:0x3000]),
+    ]
+    return FakePeImage(bytes(data), data_directories, sections, IMAGE_BASE)  # type: ignore[return-value]
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_parse_base_relocations(monkeypatch: pytest.MonkeyPatch, vectorized: bool):
+    if not vectorized:
+        monkeypatch.setattr(cross_references_absolute, "np", None)
+
+    assert parse_base_relocations(fake_pe_image()).tolist() == [0x1000, 0x1008, 0x2FFC]
+
+
+def test_no_base_relocations():
+    pe = FakePeImage(b"", [], [], IMAGE_BASE)
+    assert not parse_base_relocations(pe)  # type: ignore[arg-type]
+    assert find_absolute_cross_references(pe, [0x2000]) == {}  # type: ignore[arg-type]
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_find_absolute_cross_references(monkeypatch: pytest.MonkeyPatch, vectorized: bool):
+    if not vectorized:
+        monkeypatch.setattr(cross_references_absolute, "np", None)
+
+    # 0x1010 points to 0x2000 too, but it is not in the relocation table as a 64-bit pointer;
+    # 0x2FFC is in the table, but the pointer doesn't fit into the raw data of the section
+    result = find_absolute_cross_references(fake_pe_image(), [0x2000, 0x2010, 0x2020])
+    assert result == {0x2000: [0x1000], 0x2010: [0x1008]}
+
+
+def test_find_absolute_cross_references_exe(exe_file_path: Path):
+    with exe_file_path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        addresses = range(pe.sections[-1].virtual_address + pe.sections[-1].virtual_size)
+        result = find_absolute_cross_references(pe, addresses)
+        for destination, source in result.pairs():
+            (pointer,) = struct.unpack_from("<Q", pe.data, pe.rva_to_offset(source))
+            assert pointer == pe.image_base + destination
@@ -1,12 +1,27 @@
 import pytest
+from hypothesis import given
+from hypothesis import strategies as st
 
+from dfint64_patch.cross_references import cross_references_relative
 from dfint64_patch.cross_references.cross_references_relative import (
+    REFERENCE_SIZE,
     find_intersected_cross_references,
     find_relative_cross_references,
     invert_cross_reference_table,
+    split_into_shards,
 )
 from dfint64_patch.type_aliases import Rva
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # type: ignore[assignment]
+
+vectorized_options = [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(np is None, reason="numpy is not installed")),
+]
+
 
 @pytest.mark.parametrize(
     ("test_data", "expected"),
@@ -30,8 +45,22 @@ from dfint64_patch.type_aliases import Rva
         ),
     ],
 )
-def test_find_relative_cross_references(test_data: dict, expected: dict[int, list[int]]):
-    assert find_relative_cross_references(**test_data) == expected
+@pytest.mark.parametrize("vectorized", vectorized_options)
+def test_find_relative_cross_references(test_data: dict, expected: dict[int, list[int]], vectorized: bool):
+    assert find_relative_cross_references(**test_data, vectorized=vectorized) == expected
+
+
+@pytest.mark.skipif(np is None, reason="numpy is not installed")
+@given(
+    bytes_block=st.binary(max_size=64),
+    base_address=st.integers(min_value=0, max_value=0x1000),
+    addresses=st.sets(st.integers(min_value=-0x100, max_value=0x1100), max_size=32),
+)
+def test_find_relative_cross_references_vectorized(bytes_block: bytes, base_address: Rva, addresses: set[Rva]):
+    addresses |= {Rva(base_address + len(bytes_block))}  # make sure that there are some matches for zero bytes
+    expected = find_relative_cross_references(bytes_block, base_address, addresses, vectorized=False)
+    result = find_relative_cross_references(bytes_block, base_address, addresses, vectorized=True)
+    assert result == expected
 
 
 @pytest.mark.parametrize(
@@ -46,5 +75,88 @@ def test_invert_cross_reference_table(test_data: dict[Rva, list[Rva]], expected:
     ("test_data", "expected"),
     [({111: [0, 4, 8, 9], 222: [1, 2, 10]}, [(0, 1), (0, 2), (1, 2), (1, 4), (2, 4), (8, 9), (8, 10), (9, 10)])],
 )
-def test_find_intersected_cross_references(test_data: dict[Rva, list[Rva]], expected: list[tuple[Rva, Rva]]):
-    assert list(find_intersected_cross_references(test_data)) == expected
+@pytest.mark.parametrize("vectorized", vectorized_options)
+def test_find_intersected_cross_references(
+    test_data: dict[Rva, list[Rva]], expected: list[tuple[Rva, Rva]], vectorized: bool
+):
+    assert list(find_intersected_cross_references(test_data, vectorized=vectorized)) == expected
+
+
+@pytest.mark.skipif(np is None, reason="numpy is not installed")
+@given(references=st.sets(st.integers(min_value=0, max_value=0x100), max_size=64))
+def test_find_intersected_cross_references_vectorized(references: set[Rva]):
+    cross_references = {Rva(i): sorted(references)[i::3] for i in range(3)}  # every reference is found only once
+    expected = list(find_intersected_cross_references(cross_references, vectorized=False))
+    assert list(find_intersected_cross_references(cross_references, vectorized=True)) == expected
+
+
+@given(size=st.integers(min_value=0, max_value=100), shards=st.integers(min_value=1, max_value=16))
+def test_split_into_shards(size: int, shards: int):
+    result = split_into_shards(size, shards)
+    assert len(result) <= shards
+    positions = [position for start, stop in result for position in range(start, stop)]
+    assert positions == list(range(size - REFERENCE_SIZE + 1))
+
+
+@pytest.mark.parametrize("vectorized", vectorized_options)
+def test_find_relative_cross_references_parallel(monkeypatch: pytest.MonkeyPatch, vectorized: bool):
+    monkeypatch.setattr(cross_references_relative, "MIN_SHARD_SIZE", 16)
+    bytes_block = bytes(range(256)) * 4
+    addresses = range(0x1000, 0x2000000)
+    expected = find_relative_cross_references(bytes_block, Rva(0x1000), addresses, vectorized=vectorized)
+    assert expected
+    result = find_relative_cross_references(bytes_block, Rva(0x1000), addresses, vectorized=vectorized, workers=3)
+    assert result == expected
+    assert all(sources == sorted(sources) for sources in result.values())
+
+
+@pytest.mark.parametrize("vectorized", vectorized_options)
+def test_find_relative_cross_references_opcodes(vectorized: bool):
+    bytes_block = (
+        b"\x48\x8d\x15"
+        + (0x100 - 0x7).to_bytes(4, "little")  # lea rdx, [rip+0xf9] -> 0x100
+        + b"\x8b\x05"
+        + (0x100 - 0xD).to_bytes(4, "little")  # mov eax, [rip+0xf3] -> 0x100
+        + b"\x48\x8d\xc8"
+        + (0x100 - 0x14).to_bytes(4, "little")  # not RIP-relative ModRM
+        + b"\x90"
+        + (0x100 - 0x19).to_bytes(4, "little")  # a value which looks like a reference
+    )
+    exhaustive = find_relative_cross_references(bytes_block, Rva(0), [0x100], vectorized=vectorized)
+    assert exhaustive == {0x100: [0x3, 0x9, 0x10, 0x15]}
+
+    result = find_relative_cross_references(bytes_block, Rva(0), [0x100], vectorized=vectorized, scan="opcodes")
+    assert result == {0x100: [0x3, 0x9]}
+
+
+def test_find_relative_cross_references_unknown_scan_mode():
+    with pytest.raises(ValueError, match="scan mode"):
+        find_relative_cross_references(b"\0" * 8, Rva(0), [4], scan="unknown")
+
+
+@pytest.mark.skipif(np is None, reason="numpy is not installed")
+@given(
+    bytes_block=st.lists(st.sampled_from([b"\x48", b"\x8b", b"\x8d", b"\x05", b"\x3d", b"\x10", b"\0"]), max_size=64),
+    base_address=st.integers(min_value=0, max_value=0x1000),
+)
+def test_find_relative_cross_references_opcodes_vectorized(bytes_block: list[bytes], base_address: Rva):
+    block = b"".join(bytes_block)
+    addresses = range(-0x100000000, 0x100000000)
+    expected = find_relative_cross_references(block, base_address, addresses, vectorized=False, scan="opcodes")
+    result = find_relative_cross_references(block, base_address, addresses, vectorized=True, scan="opcodes")
+    assert result == expected
+
+
+@pytest.mark.parametrize("vectorized", vectorized_options)
+def test_find_relative_cross_references_opcodes_parallel(monkeypatch: pytest.MonkeyPatch, vectorized: bool):
+    monkeypatch.setattr(cross_references_relative, "MIN_SHARD_SIZE", 16)
+    bytes_block = b"\0\0\0\0\x90\x90\x8d\x05" * 128 + b"\0" * 4  # some references start at shard boundaries
+    addresses = range(0x1000, 0x2000000)
+    expected = find_relative_cross_references(
+        bytes_block, Rva(0x1000), addresses, vectorized=vectorized, scan="opcodes"
+    )
+    assert expected.references_count == 128
+    result = find_relative_cross_references(
+        bytes_block, Rva(0x1000), addresses, vectorized=vectorized, workers=3, scan="opcodes"
+    )
+    assert result == expected
@@ -0,0 +1,125 @@
+import io
+import shutil
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from dfint64_patch.patching.apply_delta import main as apply_delta_main
+from dfint64_patch.patching.cli import main as patch_main
+from dfint64_patch.patching.delta import (
+    apply_delta,
+    load_delta,
+    patched_sha256,
+    read_delta,
+    save_delta,
+    write_delta,
+)
+from dfint64_patch.patching.incremental import file_sha256
+from dfint64_patch.patching.patch import patch
+from dfint64_patch.patching.patch_plan import PatchEdit, PatchPlan
+from dfint64_patch.type_aliases import Offset
+
+from .utils import write_dictionary
+
+
+@pytest.fixture
+def translation_table(extracted_strings: list[str]) -> list[tuple[str, str]]:
+    strings = extracted_strings
+    return [*((string, string.upper()) for string in strings[:10]), (strings[10], strings[10] + " (longer)")]
+
+
+def test_patched_sha256(tmp_path: Path):
+    source_file = tmp_path / "source.bin"
+    source_file.write_bytes(bytes(range(100)))
+    plan = PatchPlan(
+        [
+            PatchEdit(Offset(10), b"abc"),
+            PatchEdit(Offset(13), b"d"),
+            PatchEdit(Offset(50), b"x"),
+            PatchEdit(Offset(110), b"end"),
+        ]
+    )
+
+    patched = bytearray(source_file.read_bytes())
+    patched.extend(bytes(13))
+    plan.apply_to_buffer(patched)
+    patched_file = tmp_path / "patched.bin"
+    patched_file.write_bytes(patched)
+
+    assert patched_sha256(source_file, plan) == (len(patched), file_sha256(patched_file))
+    assert patched_sha256(source_file, PatchPlan()) == (100, file_sha256(source_file))
+
+
+def test_write_read_delta(tmp_path: Path):
+    source_file = tmp_path / "source.bin"
+    source_file.write_bytes(bytes(100))
+    plan = PatchPlan([PatchEdit(Offset(10), b"abc"), PatchEdit(Offset(13), b"d"), PatchEdit(Offset(50), b"x")])
+
+    file = io.BytesIO()
+    header = write_delta(source_file, plan, file)
+    assert header.runs == 2
+    assert header.source_size == header.target_size == 100
+    assert header.source_sha256 == file_sha256(source_file)
+
+    data = file.getvalue()
+    delta = read_delta(data)
+    assert delta.header == header
+    assert list(delta.plan) == list(plan.coalesced())
+
+    with pytest.raises(ValueError, match="truncated"):
+        read_delta(data[:-1])
+
+    with pytest.raises(ValueError, match="extra data"):
+        read_delta(data + b"\0")
+
+    with pytest.raises(ValueError, match="Unsupported"):
+        read_delta(b"X" + data[1:])
+
+
+@pytest.mark.parametrize("relocate", [False, True])
+def test_apply_delta(exe_file_path: Path, tmp_path: Path, translation_table: list[tuple[str, str]], relocate: bool):
+    expected_file = tmp_path / "expected.exe"
+    shutil.copy(exe_file_path, expected_file)
+    plan = patch(expected_file, translation_table, "cp437", relocate=relocate)
+
+    delta_file = tmp_path / "patch.delta"
+    header = save_delta(exe_file_path, plan, delta_file)
+    assert header.target_sha256 == file_sha256(expected_file)
+    assert delta_file.stat().st_size < 0x1000
+
+    target_file = tmp_path / "target.exe"
+    shutil.copy(exe_file_path, target_file)
+    delta = load_delta(delta_file)
+    assert apply_delta(delta, target_file)
+    assert target_file.read_bytes() == expected_file.read_bytes()
+
+    assert not apply_delta(delta, target_file)  # already patched
+
+    with pytest.raises(ValueError, match="doesn't match"):
+        apply_delta(delta, delta_file)
+
+    with pytest.raises(ValueError, match="Size"):
+        apply_delta(delta, delta_file, verify=False)
+
+
+def test_cli_delta(exe_file_path: Path, tmp_path: Path, translation_table: list[tuple[str, str]]):
+    dictionary_file = write_dictionary(tmp_path / "dictionary.csv", translation_table)
+    delta_file = tmp_path / "patch.delta"
+
+    runner = CliRunner()
+    result = runner.invoke(
+        patch_main,
+        [str(exe_file_path), str(delta_file), "--dict", dictionary_file, "--delta", "--relocate"],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+
+    patched_file = tmp_path / "patched.exe"
+    result = runner.invoke(
+        apply_delta_main,
+        [str(delta_file), str(exe_file_path), "--output", str(patched_file)],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0
+    assert file_sha256(patched_file) == load_delta(delta_file).header.target_sha256
@@ -0,0 +1,111 @@
+import struct
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic_pe import MB, SyntheticPeParameters, generate_pe
+from dfint64_patch.analysis.analyse import (
+    AnalysisParameters,
+    analyse_pe_image,
+    extract_pe_subroutines,
+    fill_subroutine_gaps,
+)
+from dfint64_patch.extract_subroutines.from_exception_directory import extract_subroutines_from_exception_directory
+from dfint64_patch.extract_subroutines.from_raw_bytes import SubroutineIndex, SubroutineInfo, extract_subroutine_index
+from dfint64_patch.pe.headers import DataDirectory
+from dfint64_patch.pe.image import PeImage, open_pe_image
+from dfint64_patch.pe.sections import find_code_sections
+from dfint64_patch.strings_context.extract_strings_with_subs import group_strings_by_subroutines
+from dfint64_patch.type_aliases import Rva
+
+from .utils import FakePeImage
+
+
+def fake_pe_image(runtime_functions: list[tuple[int, int, int]], *, extra_bytes: int = 0) -> PeImage:
+    table = b"".join(struct.pack("<III", *item) for item in runtime_functions)
+    data_directories = [DataDirectory(Rva(0), 0)] * 3 + [DataDirectory(Rva(0x10), len(table) + extra_bytes)]
+    return FakePeImage(b"\0" * 0x10 + table + b"\0" * extra_bytes, data_directories)  # type: ignore[return-value]
+
+
+@pytest.mark.parametrize("extra_bytes", [0, 4])
+def test_extract_subroutines_from_exception_directory(extra_bytes: int):
+    pe = fake_pe_image(
+        [(0x1000, 0x1010, 0x3000), (0x1020, 0x1048, 0x3008), (0x1010, 0x1018, 0x3010)], extra_bytes=extra_bytes
+    )
+    assert list(extract_subroutines_from_exception_directory(pe) or []) == [
+        SubroutineInfo(0x1000, 0x1010),
+        SubroutineInfo(0x1010, 0x1018),
+        SubroutineInfo(0x1020, 0x1048),
+    ]
+
+
+def test_no_exception_directory():
+    assert extract_subroutines_from_exception_directory(FakePeImage(b"", [])) is None  # type: ignore[arg-type]
+    assert extract_subroutines_from_exception_directory(fake_pe_image([])) is None
+
+
+def test_extract_pe_subroutines(exe_file_path: Path):
+    with exe_file_path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        code_section = pe.sections[0]
+        from_padding = extract_subroutine_index(code_section.content, base_offset=code_section.virtual_address)
+        from_exception_directory = extract_subroutines_from_exception_directory(pe)
+
+        assert extract_pe_subroutines(pe, [code_section], "padding") == from_padding
+        if from_exception_directory is None:
+            assert extract_pe_subroutines(pe, [code_section], "auto") == from_padding
+            with pytest.raises(ValueError, match="no exception directory"):
+                extract_pe_subroutines(pe, [code_section], "pdata")
+        else:
+            assert extract_pe_subroutines(pe, [code_section], "auto") == from_exception_directory
+            assert extract_pe_subroutines(pe, [code_section], "pdata") == from_exception_directory
+
+        with pytest.raises(ValueError, match="Unknown subroutines source"):
+            extract_pe_subroutines(pe, [code_section], "unknown")
+
+
+def test_fill_subroutine_gaps():
+    functions = SubroutineIndex.from_subroutines([(0x10, 0x20), (0x30, 0x38), (0x40, 0x50)])
+    from_padding = SubroutineIndex.from_subroutines([(0x0, 0x8), (0x10, 0x20), (0x28, 0x3C), (0x40, 0x60)])
+    assert list(fill_subroutine_gaps(functions, from_padding)) == [
+        (0x0, 0x8),
+        (0x10, 0x20),
+        (0x28, 0x30),
+        (0x30, 0x38),
+        (0x38, 0x3C),
+        (0x40, 0x50),
+        (0x50, 0x60),
+    ]
+    assert fill_subroutine_gaps(functions, functions) == functions
+
+
+def test_leaf_functions(tmp_path: Path):
+    path = tmp_path / "synthetic.exe"
+    generate_pe(path, SyntheticPeParameters(size=MB // 4, leaf_share=0.3, seed=1))
+    with path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        functions = extract_subroutines_from_exception_directory(pe)
+        assert functions is not None
+        [code_section] = find_code_sections(pe)
+        code_range = range(code_section.virtual_address, code_section.virtual_address + len(code_section.content))
+        analyses = {
+            source: analyse_pe_image(pe, AnalysisParameters(subroutines=source))
+            for source in ("auto", "pdata", "padding")
+        }
+
+    # References from the functions without entries in the exception directory
+    leaf_references = {
+        reference
+        for references in analyses["auto"].cross_references.values()
+        for reference in references
+        if reference in code_range and functions.lookup_index(reference) < 0
+    }
+    assert leaf_references
+
+    grouped = {
+        source: {
+            item.cross_reference for strings in group_strings_by_subroutines(analysis, 0).values() for item in strings
+        }
+        for source, analysis in analyses.items()
+    }
+    assert leaf_references <= grouped["auto"]
+    assert leaf_references.isdisjoint(grouped["pdata"])
+    assert grouped["auto"] == grouped["padding"]
@@ -6,12 +6,16 @@ from typing import Any
 
 import pytest
 from _pytest.capture import CaptureFixture
+from hypothesis import given
+from hypothesis import strategies as st
 
 from dfint64_patch.extract_strings.cli import extract_strings, main
 from dfint64_patch.extract_strings.from_raw_bytes import (
     ExtractedStringInfo,
+    _extract_strings_generic,
     check_string,
     extract_strings_from_raw_bytes,
+    is_ascii_compatible,
 )
 from dfint64_patch.type_aliases import Rva
 
@@ -69,6 +73,24 @@ def test_extract_strings_from_raw_bytes(test_data: dict[str, Any], expected: set
     assert set(extract_strings_from_raw_bytes(**test_data)) == expected
 
 
+@given(
+    bytes_block=st.lists(st.sampled_from([b"\0", b"\0\0\0", b"a", b"Bc", b"12", b"@", b"\x01", b"\xff"])).map(b"".join),
+    alignment=st.sampled_from([1, 2, 4, 8]),
+    encoding=st.sampled_from(["cp437", "utf-8"]),
+)
+def test_extract_strings_from_raw_bytes_same_as_generic(bytes_block: bytes, alignment: int, encoding: str):
+    expected = list(_extract_strings_generic(bytes_block, Rva(0x1000), alignment, encoding))
+    assert list(extract_strings_from_raw_bytes(bytes_block, Rva(0x1000), alignment, encoding)) == expected
+
+
+@pytest.mark.parametrize(
+    ("encoding", "expected"),
+    [("cp437", True), ("cp1251", True), ("utf-8", True), ("utf-16-le", False), ("utf-7", False)],
+)
+def test_is_ascii_compatible(encoding: str, expected: bool):
+    assert is_ascii_compatible(encoding) == expected
+
+
 EXE_STRINGS = {
     "Hello, World!",
     "Unit report sheet popup",
@@ -1,6 +1,14 @@
 import pytest
+from hypothesis import given
+from hypothesis import strategies as st
 
-from dfint64_patch.extract_subroutines.from_raw_bytes import SubroutineInfo, extract_subroutines, which_subroutine
+from dfint64_patch.extract_subroutines.from_raw_bytes import (
+    SubroutineIndex,
+    SubroutineInfo,
+    extract_subroutine_index,
+    extract_subroutines,
+    which_subroutine,
+)
 
 
 @pytest.mark.parametrize(
@@ -14,6 +22,7 @@ from dfint64_patch.extract_subroutines.from_raw_bytes import SubroutineInfo, ext
 )
 def test_extract_subroutines_from_bytes(test_data: bytes, offset: int, expected: list[SubroutineInfo]):
     assert list(extract_subroutines(test_data, offset)) == expected
+    assert extract_subroutine_index(test_data, offset) == expected
 
 
 @pytest.mark.parametrize(
@@ -29,3 +38,20 @@ def test_extract_subroutines_from_bytes(test_data: bytes, offset: int, expected:
 )
 def test_which_subroutine(subroutines: list[SubroutineInfo], address: int, expected: bool):
     assert which_subroutine(subroutines, address) == expected
+    assert which_subroutine(SubroutineIndex.from_subroutines(subroutines), address) == expected
+
+
+@given(
+    st.lists(st.integers(min_value=0, max_value=0x1000), unique=True).map(sorted),
+    st.lists(st.integers(min_value=0, max_value=0x1100)),
+)
+def test_subroutine_index_lookup_many(bounds: list[int], addresses: list[int]):
+    # Subroutines between every other pair of bounds, so there are gaps between them
+    subroutines = [SubroutineInfo(start, end) for start, end in zip(bounds[::2], bounds[1::2], strict=False)]
+    index = SubroutineIndex.from_subroutines(subroutines)
+    expected = [
+        subroutines.index(subroutine) if (subroutine := which_subroutine(subroutines, address)) else -1
+        for address in addresses
+    ]
+    assert index.lookup_many(addresses) == expected
+    assert [index.lookup_index(address) for address in addresses] == expected
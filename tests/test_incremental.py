@@ -0,0 +1,114 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from dfint64_patch.patching.incremental import (
+    ManifestEdit,
+    diff_edits,
+    file_sha256,
+    load_manifest,
+    manifest_path,
+    update_patched_file,
+)
+from dfint64_patch.patching.patch import patch
+from dfint64_patch.type_aliases import Offset
+
+
+def test_diff_edits():
+    old_edits = [ManifestEdit(Offset(0), b"ab", b"xy"), ManifestEdit(Offset(4), b"cd", b"zz")]
+    new_edits = [ManifestEdit(Offset(0), b"ab", b"xy"), ManifestEdit(Offset(5), b"de", b"uv")]
+    plans = diff_edits(old_edits, new_edits)
+    assert plans is not None
+    restore_plan, update_plan = plans
+    assert list(restore_plan) == [(4, b"cd")]
+    assert list(update_plan) == [(5, b"uv")]
+
+    # Edits beyond the end of the source file can't be restored
+    assert diff_edits(old_edits, [ManifestEdit(Offset(8), b"", b"new data")]) is None
+
+
+def patch_full(source_file: Path, patched_file: Path, translation_table: list[tuple[str, str]], *, relocate: bool):
+    shutil.copy(source_file, patched_file)
+    patch(patched_file, translation_table, "cp437", relocate=relocate)
+    return patched_file.read_bytes()
+
+
+@pytest.mark.parametrize("relocate", [False, True])
+def test_update_patched_file(exe_file_path: Path, tmp_path: Path, extracted_strings: list[str], relocate: bool):
+    strings = extracted_strings
+    translation_table = [(string, string.upper()) for string in strings[:10]]
+    translation_table.append((strings[10], strings[10] + " (longer)"))
+    patched_file = tmp_path / "patched.exe"
+
+    update_patched_file(exe_file_path, patched_file, translation_table, "cp437", relocate=relocate)
+    assert patched_file.read_bytes() == patch_full(
+        exe_file_path, tmp_path / "full.exe", translation_table, relocate=relocate
+    )
+    manifest = load_manifest(manifest_path(patched_file))
+    assert manifest is not None
+    assert {item.original for item in manifest.strings} == {
+        source for source, translation in translation_table if relocate or len(translation) <= len(source)
+    }
+
+    # Removed, changed and added entries
+    new_translation_table = [
+        *translation_table[1:5],
+        (strings[5], "changed"),
+        *translation_table[6:],
+        (strings[11], strings[11].title()),
+    ]
+    update_patched_file(exe_file_path, patched_file, new_translation_table, "cp437", relocate=relocate)
+    expected = patch_full(exe_file_path, tmp_path / "full.exe", new_translation_table, relocate=relocate)
+    assert patched_file.read_bytes() == expected
+
+    # Up to date
+    update_patched_file(exe_file_path, patched_file, new_translation_table, "cp437", relocate=relocate)
+    assert patched_file.read_bytes() == expected
+
+    # The patched file is changed by someone else
+    with patched_file.open("r+b") as file:
+        file.write(b"XX")
+
+    update_patched_file(exe_file_path, patched_file, new_translation_table, "cp437", relocate=relocate)
+    assert patched_file.read_bytes() == expected
+
+
+def test_update_patched_file_known_hashes(exe_file_path: Path, tmp_path: Path, extracted_strings: list[str]):
+    strings = extracted_strings
+    patched_file = tmp_path / "patched.exe"
+    update = update_patched_file(exe_file_path, patched_file, [(strings[0], "x")], "cp437")
+    assert update is not None
+    assert update.manifest.output_sha256 == file_sha256(patched_file)
+
+    translation_table = [(strings[1], "y")]
+    source_sha256 = file_sha256(exe_file_path)
+    update = update_patched_file(
+        exe_file_path,
+        patched_file,
+        translation_table,
+        "cp437",
+        source_sha256=source_sha256,
+        output_sha256=update.manifest.output_sha256,
+    )
+    assert update is not None
+    assert update.manifest.output_sha256 == file_sha256(patched_file)
+    assert patched_file.read_bytes() == patch_full(
+        exe_file_path, tmp_path / "full.exe", translation_table, relocate=False
+    )
+
+    # A hash which doesn't match the manifest makes the file rebuilt
+    with patched_file.open("r+b") as file:
+        file.write(b"XX")
+
+    update_patched_file(
+        exe_file_path,
+        patched_file,
+        [(strings[2], "z")],
+        "cp437",
+        source_sha256=source_sha256,
+        output_sha256="0" * 64,
+    )
+    assert patched_file.read_bytes() == patch_full(
+        exe_file_path, tmp_path / "full.exe", [(strings[2], "z")], relocate=False
+    )
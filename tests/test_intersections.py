@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from dfint64_patch.patching.intersections import (
+    IntersectionsSummary,
+    format_intersections_summary,
+    report_intersections,
+    summarize_intersections,
+)
+from dfint64_patch.type_aliases import Rva
+
+OBJECT_RVA_BY_REFERENCE = {Rva(0): Rva(100), Rva(1): Rva(200), Rva(2): Rva(200), Rva(4): Rva(100), Rva(8): Rva(300)}
+INTERSECTIONS = [(Rva(0), Rva(1)), (Rva(0), Rva(2)), (Rva(1), Rva(2)), (Rva(1), Rva(4)), (Rva(2), Rva(4))]
+STRINGS = {Rva(100): "first", Rva(200): "second", Rva(300): "third"}
+
+
+def test_summarize_intersections():
+    summary = summarize_intersections(INTERSECTIONS, OBJECT_RVA_BY_REFERENCE, top=1)
+    assert summary == IntersectionsSummary(collisions=5, references=4, objects=2, worst_objects=[(100, 2)])
+
+
+def test_summarize_no_intersections():
+    summary = summarize_intersections([], OBJECT_RVA_BY_REFERENCE)
+    assert summary == IntersectionsSummary(collisions=0, references=0, objects=0, worst_objects=[])
+    assert format_intersections_summary(summary, STRINGS) == [
+        "Colliding pairs of references: 0",
+        "Colliding references: 0",
+        "Objects with colliding references: 0",
+    ]
+
+
+def test_report_intersections(tmp_path: Path):
+    report_file = tmp_path / "report.txt"
+    summary = summarize_intersections(INTERSECTIONS, OBJECT_RVA_BY_REFERENCE)
+    report_intersections(summary, STRINGS, report_file)
+
+    lines = report_file.read_text(encoding="utf-8").splitlines()
+    assert lines[0] == "Colliding pairs of references: 5"
+    assert lines[3] == "Top 2 objects by the number of colliding references:"
+    assert lines[4].split() == ["2", "0x64", "'first'"]
+    assert lines[5].split() == ["2", "0xc8", "'second'"]
@@ -0,0 +1,128 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from dfint64_patch.analysis.analyse import analyse_pe_image
+from dfint64_patch.cross_references import cross_references_relative
+from dfint64_patch.cross_references.cross_references_relative import find_relative_cross_references
+from dfint64_patch.metrics import (
+    ThrottledProgress,
+    collect_metrics,
+    count,
+    current_metrics,
+    peak_rss,
+    stage,
+    track_progress,
+)
+from dfint64_patch.patching.incremental import update_patched_file
+from dfint64_patch.pe.image import open_pe_image
+from dfint64_patch.type_aliases import Rva
+
+
+def test_stage_without_collector():
+    assert current_metrics() is None
+    with stage("test", size=10) as stage_metrics:
+        stage_metrics.items += 1
+    count("test")
+    assert current_metrics() is None
+
+
+def test_collect_metrics(tmp_path: Path):
+    with collect_metrics() as metrics:
+        assert current_metrics() is metrics
+        for _ in range(2):
+            with stage("outer", size=100) as outer, stage("inner") as inner:
+                outer.items += 1
+                inner.bytes += 5
+        count("things", 3)
+        count("things")
+
+    assert current_metrics() is None
+    assert list(metrics.stages) == ["outer", "inner"]
+    assert metrics.stages["outer"].calls == 2
+    assert metrics.stages["outer"].bytes == 200
+    assert metrics.stages["outer"].items == 2
+    assert metrics.stages["inner"].bytes == 10
+    assert metrics.stages["outer"].seconds >= metrics.stages["inner"].seconds
+    assert metrics.counters == {"things": 4}
+
+    metrics_file = tmp_path / "metrics.json"
+    metrics.save(metrics_file)
+    report = json.loads(metrics_file.read_text())
+    assert report["counters"] == {"things": 4}
+    assert report["stages"]["outer"]["bytes"] == 200
+    assert report["peak_rss"] == peak_rss()
+
+
+def test_peak_rss():
+    rss = peak_rss()
+    assert rss is None or rss > 0
+
+
+@pytest.mark.parametrize(
+    ("total", "step", "sizes", "expected"),
+    [
+        (100, 30, [10, 10, 10, 10, 50, 10], [30, 90, 100]),
+        (100, 30, [100], [100]),
+        (100, 30, [60, 60], [60, 100]),
+        (0, None, [0], [0]),
+    ],
+)
+def test_throttled_progress(total: int, step: int | None, sizes: list[int], expected: list[int]):
+    reports = []
+    progress = ThrottledProgress("test", total, lambda name, done, total: reports.append((name, done, total)), step)
+    for size in sizes:
+        progress.advance(size)
+
+    assert reports == [("test", done, total) for done in expected]
+
+
+def test_track_progress():
+    reports = []
+    with collect_metrics(progress=lambda *args: reports.append(args)):
+        track_progress("test", 100).advance(100)
+    track_progress("test", 100).advance(100)
+
+    assert reports == [("test", 100, 100)]
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+@pytest.mark.parametrize("scan", ["exhaustive", "opcodes"])
+def test_find_relative_cross_references_segments(monkeypatch: pytest.MonkeyPatch, vectorized: bool, scan: str):
+    code = bytes(range(256)) * 4 + b"\x48\x8d\x05\x00\x00\x00\x00" * 50
+    addresses = range(0x1000, 0x3000)
+    expected = find_relative_cross_references(code, Rva(0x1000), addresses, vectorized=vectorized, scan=scan)
+
+    monkeypatch.setattr(cross_references_relative, "PROGRESS_SEGMENT_SIZE", 101)
+    reports = []
+    with collect_metrics(progress=lambda *args: reports.append(args)) as metrics:
+        result = find_relative_cross_references(code, Rva(0x1000), addresses, vectorized=vectorized, scan=scan)
+
+    assert dict(result) == dict(expected)
+    assert reports[-1] == ("find_relative_cross_references", len(code), len(code))
+    assert 1 < len(reports) <= len(code) // 101 + 1
+    stage_metrics = metrics.stages["find_relative_cross_references"]
+    assert stage_metrics.bytes == len(code)
+    assert stage_metrics.items == result.references_count
+
+
+def test_patch_stages(exe_file_path: Path, tmp_path: Path):
+    with collect_metrics() as metrics:
+        with exe_file_path.open("rb") as file, open_pe_image(file) as pe:
+            analyse_pe_image(pe)
+
+        update_patched_file(exe_file_path, tmp_path / "patched.exe", [], "cp437", cache=None)
+
+    assert {
+        "extract_strings",
+        "find_relative_cross_references",
+        "find_absolute_cross_references",
+        "extract_subroutines",
+        "find_intersected_cross_references",
+        "build_patch_plan",
+        "patch_writing",
+    } <= set(metrics.stages)
+    assert metrics.stages["extract_strings"].calls == 2
+    assert metrics.stages["extract_strings"].items > 0
+    assert metrics.stages["find_relative_cross_references"].bytes > 0
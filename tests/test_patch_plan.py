@@ -0,0 +1,80 @@
+import shutil
+from pathlib import Path
+
+import pytest
+
+from dfint64_patch.extract_strings.cli import extract_strings
+from dfint64_patch.patching.patch import patch
+from dfint64_patch.patching.patch_plan import PatchEdit, PatchPlan, PatchPlanStats
+from dfint64_patch.type_aliases import Offset
+
+
+def test_patch_plan():
+    plan = PatchPlan(
+        [
+            PatchEdit(Offset(8), b"cd"),
+            PatchEdit(Offset(0), b"ab"),
+            PatchEdit(Offset(2), b"xy"),
+            PatchEdit(Offset(12), b""),
+        ]
+    )
+    assert list(plan) == [(0, b"ab"), (2, b"xy"), (8, b"cd")]
+    assert list(plan.coalesced()) == [(0, b"abxy"), (8, b"cd")]
+    assert plan.stats() == PatchPlanStats(edits=3, writes=2, bytes_total=6, first_offset=0, last_offset=10)
+
+    buffer = bytearray(12)
+    plan.apply_to_buffer(buffer)
+    assert buffer == b"abxy\0\0\0\0cd\0\0"
+
+    with pytest.raises(ValueError, match="exceeds"):
+        plan.apply_to_buffer(bytearray(9))
+
+
+@pytest.mark.parametrize(("offset", "data"), [(3, b"a"), (1, b"ab"), (0, b"abcdefghi")])
+def test_patch_plan_overlap(offset: int, data: bytes):
+    plan = PatchPlan([PatchEdit(Offset(2), b"xy"), PatchEdit(Offset(8), b"cd")])
+    with pytest.raises(ValueError, match="overlaps"):
+        plan.add(offset, data)
+
+    assert len(plan) == 2
+
+
+def test_patch_plan_empty():
+    plan = PatchPlan()
+    assert not plan
+    assert plan.stats() == PatchPlanStats(edits=0, writes=0, bytes_total=0, first_offset=None, last_offset=None)
+
+
+def test_patch_plan_apply(tmp_path: Path):
+    file_path = tmp_path / "file.bin"
+    file_path.write_bytes(b"0123456789")
+    with file_path.open("r+b") as file_object:
+        PatchPlan([PatchEdit(Offset(1), b"ab"), PatchEdit(Offset(3), b"c"), PatchEdit(Offset(9), b"z")]).apply(
+            file_object
+        )
+
+    assert file_path.read_bytes() == b"0abc45678z"
+
+
+def test_patch_dry_run(exe_file_path: Path, tmp_path: Path):
+    with exe_file_path.open("rb") as pe_file:
+        strings = extract_strings(pe_file)
+
+    string = strings[0].string
+    translation_table = [(string, "x" * (len(string) - 1))]
+    patched_file = tmp_path / "patched.exe"
+    shutil.copy(exe_file_path, patched_file)
+
+    plan = patch(patched_file, translation_table, "cp437", dry_run=True)
+    assert patched_file.read_bytes() == exe_file_path.read_bytes()
+    assert len(plan) == 1
+    (edit,) = plan
+    assert edit.data == b"x" * (len(string) - 1) + b" \0"
+
+    assert list(patch(patched_file, translation_table, "cp437")) == list(plan)
+    with patched_file.open("rb") as pe_file:
+        new_strings = [item.string for item in extract_strings(pe_file)]
+
+    assert string not in new_strings
+    assert "x" * (len(string) - 1) + " " in new_strings
+    assert len(new_strings) == len(strings)
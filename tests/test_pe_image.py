@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import pytest
+
+from dfint64_patch.pe.headers import parse_pe_headers, read_pe_headers_with_lief
+from dfint64_patch.pe.image import open_pe_image
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"MZ", b"MZ" + b"\0" * 0x3A + b"\x40\0\0\0" + b"\0" * 4, b"MZ" + b"\0" * 0x3A + b"\x40\0\0\0" + b"PE\0\0"],
+)
+def test_parse_pe_headers_invalid(data: bytes):
+    with pytest.raises(ValueError, match=r"executable|Truncated"):
+        parse_pe_headers(data)
+
+
+def test_parse_pe_headers(exe_file_path: Path):
+    pytest.importorskip("lief")
+    assert parse_pe_headers(exe_file_path.read_bytes()) == read_pe_headers_with_lief(exe_file_path)
+
+
+@pytest.mark.parametrize("backend", ["builtin", "lief"])
+def test_pe_image(exe_file_path: Path, backend: str):
+    lief = pytest.importorskip("lief")
+    pe = lief.PE.parse(exe_file_path)
+    assert pe is not None
+
+    with exe_file_path.open("rb") as pe_file, open_pe_image(pe_file, backend=backend) as pe_image:
+        assert pe_image.image_base == pe.optional_header.imagebase
+        assert len(pe_image.sections) == len(pe.sections)
+
+        for section, lief_section in zip(pe_image.sections, pe.sections, strict=True):
+            assert section.name == lief_section.name
+            assert section.virtual_address == lief_section.virtual_address
+            assert section.content.readonly
+            assert section.content == lief_section.content
+            assert pe_image.rva_to_offset(section.virtual_address + 1) == pe.rva_to_offset(section.virtual_address + 1)
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+from dfint64_patch.analysis.analyse import AnalysisParameters, analyse_pe_image, find_sections_cross_references
+from dfint64_patch.pe.headers import (
+    IMAGE_SCN_CNT_CODE,
+    IMAGE_SCN_CNT_INITIALIZED_DATA,
+    IMAGE_SCN_MEM_DISCARDABLE,
+    IMAGE_SCN_MEM_EXECUTE,
+    IMAGE_SCN_MEM_READ,
+    DataDirectory,
+)
+from dfint64_patch.pe.image import PeImage, SectionView, open_pe_image
+from dfint64_patch.pe.sections import find_code_sections, find_data_sections
+from dfint64_patch.type_aliases import Offset, Rva
+
+from .utils import FakePeImage
+
+CODE = IMAGE_SCN_CNT_CODE | IMAGE_SCN_MEM_EXECUTE | IMAGE_SCN_MEM_READ
+DATA = IMAGE_SCN_CNT_INITIALIZED_DATA | IMAGE_SCN_MEM_READ
+
+
+def section(name: str, virtual_address: int, characteristics: int, content: bytes = b"\0" * 16) -> SectionView:
+    return SectionView(
+        name,
+        Rva(virtual_address),
+        len(content),
+        Offset(virtual_address),
+        len(content),
+        characteristics,
+        memoryview(content),
+    )
+
+
+def test_find_sections():
+    sections = [
+        section(".data", 0x4000, DATA | 0x80000000),
+        section(".text", 0x1000, CODE),
+        section(".rdata", 0x3000, DATA),
+        section(".init", 0x2000, CODE),
+        section(".pdata", 0x5000, DATA),
+        section(".reloc", 0x6000, DATA | IMAGE_SCN_MEM_DISCARDABLE),
+        section(".bss", 0x7000, DATA, b""),
+    ]
+    data_directories = [DataDirectory(Rva(0), 0)] * 3 + [DataDirectory(Rva(0x5000), 0x10)]
+    pe: PeImage = FakePeImage(data_directories=data_directories, sections=sections)  # type: ignore[assignment]
+
+    assert [item.name for item in find_code_sections(pe)] == [".text", ".init"]
+    assert [item.name for item in find_data_sections(pe)] == [".rdata", ".data"]
+
+
+def test_find_sections_cross_references():
+    code = section(
+        ".text", 0x1000, CODE, (0x3000 - 0x1004).to_bytes(4, "little") + (0x4000 - 0x1008).to_bytes(4, "little")
+    )
+    code2 = section(".init", 0x2000, CODE, (0x3000 - 0x2004).to_bytes(4, "little"))
+    addresses = [Rva(0x3000), Rva(0x4000)]
+
+    expected = {0x3000: [0x1000, 0x2000], 0x4000: [0x1004]}
+    assert find_sections_cross_references([code, code2], addresses) == expected
+    assert find_sections_cross_references([code, code2], addresses, workers=2) == expected
+    assert find_sections_cross_references([code], addresses[:1], workers=2) == {0x3000: [0x1000]}
+
+
+def test_analyse_all_data_sections(exe_file_path: Path):
+    with exe_file_path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        data_sections = find_data_sections(pe)
+        analysis = analyse_pe_image(pe)
+        for index, data_section in enumerate(pe.sections):
+            if data_section in data_sections:
+                parameters = AnalysisParameters(
+                    code_section=pe.sections.index(find_code_sections(pe)[0]), data_section=index
+                )
+                single = analyse_pe_image(pe, parameters)
+                assert set(single.strings) <= set(analysis.strings)
+                assert all(analysis.cross_references[rva] == refs for rva, refs in single.cross_references.items())
+
+
+def test_analyse_only_requested_parts(exe_file_path: Path):
+    with exe_file_path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        analysis = analyse_pe_image(pe)
+        partial = analyse_pe_image(pe, AnalysisParameters(subroutines=None, absolute_references=False))
+
+    assert partial.strings == analysis.strings
+    assert len(analysis.subroutines) > 0
+    assert len(partial.subroutines) == 0
+    assert all(set(refs) <= set(analysis.cross_references[rva]) for rva, refs in partial.cross_references.items())
@@ -0,0 +1,132 @@
+import shutil
+import struct
+from pathlib import Path
+
+import pytest
+
+from dfint64_patch.analysis.analyse import analyse_pe_image
+from dfint64_patch.cross_references.cross_references_absolute import parse_base_relocations
+from dfint64_patch.patching.patch import patch
+from dfint64_patch.patching.relocation import NEW_SECTION_NAME, FreeSpaceMap, merge_tails
+from dfint64_patch.pe.headers import (
+    IMAGE_DIRECTORY_ENTRY_SECURITY,
+    OPTIONAL_HEADER_CHECKSUM_OFFSET,
+    locate_pe_headers,
+    parse_pe_headers,
+)
+from dfint64_patch.pe.image import PeImage, open_pe_image
+from dfint64_patch.pe.new_section import plan_new_section
+
+
+def test_free_space_map():
+    free_space = FreeSpaceMap([(0x100, 3), (0x200, 8), (0x300, 0), (0x400, 5)])
+    assert len(free_space) == 3
+    assert free_space.allocate(4) == 0x400
+    assert free_space.allocate(2) == 0x100
+    assert free_space.allocate(8) == 0x200
+    assert free_space.allocate(2) is None
+    assert free_space.total_size == 2
+
+
+def test_merge_tails():
+    merged = merge_tails([b"world", b"hello world", b"ld", b"hello world", b"foo", b"o"])
+    assert merged == {
+        b"hello world": (b"hello world", 0),
+        b"world": (b"hello world", 6),
+        b"ld": (b"hello world", 9),
+        b"foo": (b"foo", 0),
+        b"o": (b"foo", 2),
+    }
+
+
+def read_string(pe: PeImage, rva: int) -> bytes:
+    offset = pe.rva_to_offset(rva)
+    return bytes(pe.data[offset : bytes(pe.data).index(b"\0", offset)])
+
+
+@pytest.mark.parametrize("relocate", [False, True])
+def test_patch_relocate(exe_file_path: Path, tmp_path: Path, relocate: bool):
+    with exe_file_path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        analysis = analyse_pe_image(pe)
+        absolute_references = set(parse_base_relocations(pe))
+
+    referenced = [item for item in analysis.strings if analysis.cross_references.get(item.address)]
+    translations = {item.string: item.string.upper() + " (translated)" for item in referenced[:20]}
+    # Identical translations and a translation which is a suffix of another one
+    shortest = sorted(referenced[20:], key=lambda item: len(item.string))[:2]
+    translations[shortest[0].string] = translations[referenced[0].string]
+    translations[shortest[1].string] = " (translated)"
+    referenced = [*referenced[:20], *shortest]
+
+    patched_file = tmp_path / "patched.exe"
+    shutil.copy(exe_file_path, patched_file)
+    patch(patched_file, list(translations.items()), "cp437", relocate=relocate)
+
+    with patched_file.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        for item in referenced[:22]:
+            for reference in analysis.cross_references[item.address]:
+                if reference in absolute_references:
+                    (pointer,) = struct.unpack_from("<Q", pe.data, pe.rva_to_offset(reference))
+                    destination = pointer - pe.image_base
+                else:
+                    (relative_offset,) = struct.unpack_from("<i", pe.data, pe.rva_to_offset(reference))
+                    destination = reference + 4 + relative_offset
+
+                expected = translations[item.string] if relocate else item.string
+                assert read_string(pe, destination) == expected.encode()
+
+            assert read_string(pe, item.address) == item.string.encode()  # the original strings are intact
+
+        sections = parse_pe_headers(pe.data).sections
+        assert (sections[-1].name == NEW_SECTION_NAME) is relocate
+        if relocate:
+            checksum_offset = locate_pe_headers(pe.data).optional_header + OPTIONAL_HEADER_CHECKSUM_OFFSET
+            assert struct.unpack_from("<I", pe.data, checksum_offset) == (0,)
+
+
+def test_patch_relocate_overlay(exe_file_path: Path, tmp_path: Path):
+    with exe_file_path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        analysis = analyse_pe_image(pe)
+
+    referenced = [item for item in analysis.strings if analysis.cross_references.get(item.address)]
+    translations = {item.string: item.string.upper() + " (translated)" for item in referenced[:20]}
+
+    overlay = b"overlay data"
+    patched_file = tmp_path / "patched.exe"
+    patched_file.write_bytes(exe_file_path.read_bytes() + overlay)
+    patch(patched_file, list(translations.items()), "cp437", relocate=True)
+
+    # no section is appended after the overlay, the translations which don't fit into the padding are skipped
+    data = patched_file.read_bytes()
+    assert len(data) == exe_file_path.stat().st_size + len(overlay)
+    assert data.endswith(overlay)
+    assert len(parse_pe_headers(data).sections) == len(parse_pe_headers(exe_file_path.read_bytes()).sections)
+
+
+def test_patch_relocate_in_place(exe_file_path: Path, tmp_path: Path):
+    with exe_file_path.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        analysis = analyse_pe_image(pe)
+
+    # A string followed by at least 2 bytes of padding
+    item = next(item for item in analysis.strings if len(item.string) % 4 == 1)
+    translation = item.string + "!!"
+
+    patched_file = tmp_path / "patched.exe"
+    shutil.copy(exe_file_path, patched_file)
+    patch(patched_file, [(item.string, translation)], "cp437", relocate=True)
+
+    with patched_file.open("rb") as pe_file, open_pe_image(pe_file) as pe:
+        assert read_string(pe, item.address) == translation.encode()
+        assert len(pe.sections) == len(parse_pe_headers(exe_file_path.read_bytes()).sections)
+
+
+def test_new_section_signed_file(exe_file_path: Path):
+    data = exe_file_path.read_bytes()
+    plan_new_section(data, NEW_SECTION_NAME, 0x10)
+
+    # size of the certificate table in the data directories of the PE32+ optional header
+    size_offset = locate_pe_headers(data).optional_header + 112 + IMAGE_DIRECTORY_ENTRY_SECURITY * 8 + 4
+    signed = bytearray(data)
+    struct.pack_into("<I", signed, size_offset, 0x100)
+    with pytest.raises(ValueError, match="signed"):
+        plan_new_section(bytes(signed), NEW_SECTION_NAME, 0x10)
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from dfint64_patch.patching.delta import apply_delta, load_delta
+from dfint64_patch.patching.patch import patch
+from dfint64_patch.service.resident import ResidentAnalysis, load_resident_analysis
+from dfint64_patch.service.server import ServiceServer
+from dfint64_patch.strings_context.extract_strings_with_subs import extract_strings_grouped_by_subs
+
+
+@pytest.fixture
+def resident(exe_file_path: Path, tmp_path: Path) -> ResidentAnalysis:
+    return load_resident_analysis(exe_file_path, cache=None, root=tmp_path)
+
+
+def test_strings_in_subroutine(exe_file_path: Path, resident: ResidentAnalysis):
+    with exe_file_path.open("rb") as pe_file:
+        expected = extract_strings_grouped_by_subs(pe_file)
+
+    assert expected
+    for start, strings in expected.items():
+        result = resident.strings_in_subroutine(start + 1)
+        assert result["start"] == start
+        assert [item["string"] for item in result["strings"]] == [item.string for item in strings]
+
+    with pytest.raises(ValueError, match="doesn't belong"):
+        resident.strings_in_subroutine(0)
+
+
+def test_references(resident: ResidentAnalysis):
+    subroutines = {
+        item["reference"]: start
+        for start in {resident.image_base + start for start in resident.analysis.subroutines.starts}
+        for item in resident.strings_in_subroutine(start)["strings"]
+    }
+    string_info = next(item for item in resident.analysis.strings if item.address in resident.analysis.cross_references)
+
+    result = resident.references(string_info.string)
+    occurrence = next(item for item in result if item["address"] == resident.image_base + string_info.address)
+    assert [item["address"] for item in occurrence["references"]] == [
+        resident.image_base + reference for reference in resident.analysis.cross_references[string_info.address]
+    ]
+    for item in occurrence["references"]:
+        assert item["subroutine"] == subroutines.get(item["address"])
+
+    assert resident.references("no such string") == []
+
+
+def test_patch(exe_file_path: Path, tmp_path: Path, resident: ResidentAnalysis, extracted_strings: list[str]):
+    translations = [[string, string.upper()] for string in extracted_strings[:10]]
+
+    expected_file = tmp_path / "expected.exe"
+    shutil.copy(exe_file_path, expected_file)
+    patch(expected_file, [(source, translation) for source, translation in translations], "cp437")
+
+    patched_file = tmp_path / "patched.exe"
+    result = resident.patch(str(patched_file), translations=translations)
+    assert (result["applied"], result["skipped"], result["up_to_date"]) == (10, 0, False)
+    assert patched_file.read_bytes() == expected_file.read_bytes()
+    assert resident.patch(str(patched_file), translations=translations)["up_to_date"]
+
+    delta_file = tmp_path / "patched.delta"
+    assert resident.patch(str(delta_file), translations=translations, delta=True)["applied"] == 10
+    target_file = tmp_path / "target.exe"
+    shutil.copy(exe_file_path, target_file)
+    apply_delta(load_delta(delta_file), target_file)
+    assert target_file.read_bytes() == expected_file.read_bytes()
+
+    with pytest.raises(ValueError, match="Either"):
+        resident.patch(str(patched_file))
+
+
+def test_patch_paths(exe_file_path: Path, tmp_path: Path, resident: ResidentAnalysis):
+    translations = [["a", "b"]]
+    assert resident.patch("patched.exe", translations=translations)["applied"] == 0
+    assert (tmp_path / "patched.exe").exists()
+
+    outside = tmp_path.parent / "outside.exe"
+    for output in ["../outside.exe", str(outside), str(exe_file_path)]:
+        with pytest.raises(ValueError, match="outside of the root"):
+            resident.patch(output, translations=translations)
+
+    (tmp_path / "link").symlink_to(tmp_path.parent)
+    with pytest.raises(ValueError, match="outside of the root"):
+        resident.patch("link/outside.exe", translations=translations)
+
+    with pytest.raises(ValueError, match="outside of the root"):
+        resident.patch("patched.exe", dictionary=str(exe_file_path))
+
+    assert not outside.exists()
+
+    source_root = ResidentAnalysis(exe_file_path, resident.analysis, resident.image_base)
+    with pytest.raises(ValueError, match="source file"):
+        source_root.patch(exe_file_path.name, translations=translations)
+
+
+async def _exchange(port: int, requests: list[Any]) -> list[dict[str, Any]]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for request in requests:
+        writer.write(json.dumps(request).encode() + b"\n")
+    await writer.drain()
+
+    responses = [json.loads(await reader.readline()) for _ in requests]
+    writer.close()
+    await writer.wait_closed()
+    return responses
+
+
+def test_server(resident: ResidentAnalysis):
+    async def run() -> list[dict[str, Any]]:
+        server = ServiceServer(resident.handlers)
+        async with await server.start(port=0) as tcp_server:
+            port = tcp_server.sockets[0].getsockname()[1]
+            responses = await _exchange(
+                port,
+                [
+                    {"id": 1, "method": "info"},
+                    {"id": 2, "method": "references", "params": {"string": "no such string"}},
+                    {"id": 3, "method": "unknown"},
+                    {"id": 4, "method": "strings_in_subroutine", "params": {"address": 0}},
+                    {"id": 5, "method": "info", "params": {"unexpected": 1}},
+                    [],
+                ],
+            )
+        server.close()
+        return responses
+
+    responses = {response["id"]: response for response in asyncio.run(run())}
+    assert responses[1]["result"]["strings"] == len(resident.analysis.strings)
+    assert responses[2] == {"id": 2, "result": []}
+    assert "Unknown method" in responses[3]["error"]
+    assert "doesn't belong" in responses[4]["error"]
+    assert "error" in responses[5]
+    assert responses[None]["error"] == "Request must be an object"
+
+
+def test_unix_socket(tmp_path: Path):
+    async def run() -> int:
+        server = ServiceServer({"info": lambda: "info"})
+        socket_path = tmp_path / "service.sock"
+        async with await server.start(socket_path=str(socket_path)):
+            mode = socket_path.stat().st_mode & 0o777
+            reader, writer = await asyncio.open_unix_connection(str(socket_path))
+            writer.write(b'{"id": 1, "method": "info"}\n')
+            assert json.loads(await reader.readline()) == {"id": 1, "result": "info"}
+            writer.close()
+            await writer.wait_closed()
+        server.close()
+        return mode
+
+    assert asyncio.run(run()) == 0o600
+
+
+def test_server_max_pending():
+    def slow() -> str:
+        time.sleep(0.2)
+        return "done"
+
+    async def run() -> list[dict[str, Any]]:
+        server = ServiceServer({"slow": slow}, concurrency=1, max_pending=2)
+        async with await server.start(port=0) as tcp_server:
+            port = tcp_server.sockets[0].getsockname()[1]
+            responses = await _exchange(port, [{"id": i, "method": "slow"} for i in range(3)])
+        server.close()
+        return responses
+
+    responses = {response["id"]: response for response in asyncio.run(run())}
+    assert responses[0]["result"] == responses[1]["result"] == "done"
+    assert responses[2]["error"] == "Too many pending requests"
@@ -0,0 +1,100 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from dfint64_patch.dictionary_loaders.binary_dictionary import compile_dictionary
+from dfint64_patch.patching.batch import BatchTarget
+from dfint64_patch.patching.cli import main
+from dfint64_patch.patching.incremental import file_sha256, load_manifest, manifest_path, update_patched_file
+from dfint64_patch.patching.patch import patch
+from dfint64_patch.patching.watch import TranslationWatcher, changed_rows
+
+from .utils import write_dictionary
+
+
+def test_changed_rows():
+    old = {"a": "1", "b": "2", "c": "3"}
+    new = {"a": "1", "b": "two", "d": "4"}
+    assert changed_rows(old, new) == ["b", "c", "d"]
+    assert changed_rows(old, dict(old)) == []
+
+
+def touch(path: Path, mtime_ns: int) -> None:
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_translation_watcher(exe_file_path: Path, tmp_path: Path, extracted_strings: list[str]):
+    strings = extracted_strings
+    dictionary_file = tmp_path / "dict.csv"
+    patched_file = tmp_path / "patched.exe"
+    table = [(string, string.upper()) for string in strings[:10]]
+    write_dictionary(dictionary_file, table)
+    touch(dictionary_file, 1_000_000_000)
+
+    watcher = TranslationWatcher(
+        exe_file_path,
+        [BatchTarget(str(dictionary_file), "cp437", str(patched_file))],
+        cache=None,
+        debounce=1.0,
+    )
+    [result] = watcher.start()
+    assert result.applied == 10
+    assert watcher.poll(now=100.0) == []
+
+    # A change is applied only when the file stays unchanged for the debounce time
+    table = [(string, string.lower()) for string in strings[5:15]]
+    write_dictionary(dictionary_file, table)
+    touch(dictionary_file, 2_000_000_000)
+    assert watcher.poll(now=200.0) == []
+    assert watcher.poll(now=200.5) == []
+    [result] = watcher.poll(now=201.0)
+    assert result.applied == 10
+
+    expected_file = tmp_path / "expected.exe"
+    shutil.copy(exe_file_path, expected_file)
+    patch(expected_file, table, "cp437")
+    assert patched_file.read_bytes() == expected_file.read_bytes()
+    # The manifest is saved only after a pause
+    assert not manifest_path(patched_file).exists()
+
+    # Saved without changes of the translations of the strings of the executable
+    table = [*table, ("no such string", "translation")]
+    write_dictionary(dictionary_file, table)
+    touch(dictionary_file, 3_000_000_000)
+    assert watcher.poll(now=300.0) == []
+    [result] = watcher.poll(now=301.0)
+    assert (result.applied, result.error) == (None, None)
+
+    # A broken dictionary doesn't stop watching, the patched file is kept
+    dictionary_file.write_text('"unterminated\n', encoding="utf-8")
+    touch(dictionary_file, 4_000_000_000)
+    assert watcher.poll(now=400.0) == []
+    [result] = watcher.poll(now=401.0)
+    assert result.error is not None
+    assert patched_file.read_bytes() == expected_file.read_bytes()
+
+    assert watcher.poll(now=420.0) == []
+    manifest = load_manifest(manifest_path(patched_file))
+    assert manifest is not None
+    assert manifest.output_sha256 == file_sha256(patched_file)
+    assert update_patched_file(exe_file_path, patched_file, table, "cp437") is None
+
+
+def test_translation_watcher_binary_dictionary(exe_file_path: Path, tmp_path: Path):
+    dictionary_file = tmp_path / "dict.bin"
+    with dictionary_file.open("wb") as file:
+        compile_dictionary([("a", "b")], "cp437", file)
+
+    with pytest.raises(ValueError, match="Only csv"):
+        TranslationWatcher(exe_file_path, [BatchTarget(str(dictionary_file), "cp437", str(tmp_path / "out.exe"))])
+
+
+def test_cli_watch_options(exe_file_path: Path, tmp_path: Path):
+    dictionary_file = tmp_path / "dict.csv"
+    write_dictionary(dictionary_file, [])
+    result = CliRunner().invoke(main, [str(exe_file_path), "--dict", str(dictionary_file), "--watch", "--delta"])
+    assert result.exit_code != 0
+    assert "--watch" in result.output
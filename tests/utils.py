@@ -1,14 +1,27 @@
+import csv
 import platform
 import random
 import shutil
 import string
 import subprocess
+from collections.abc import Iterable, Sequence
 from pathlib import Path
+from typing import NamedTuple
+
+from dfint64_patch.pe.headers import DataDirectory
+from dfint64_patch.pe.image import SectionView
+from dfint64_patch.type_aliases import Offset
 
 _MAX_RETRIES = 10
 GENERATED_STRING_CHARACTERS = string.ascii_lowercase + " "
 
 
+def write_dictionary(path: Path, translation_table: Iterable[tuple[str, str]]) -> str:
+    with path.open("w", encoding="utf-8", newline="") as file:
+        csv.writer(file, dialect="unix").writerows(translation_table)
+    return str(path)
+
+
 def possible_to_run_exe() -> bool:
     if platform.system() == "Windows":
         return True
@@ -36,3 +49,17 @@ def get_random_string(length: int, not_equals: str | None = None) -> str:
         if counter >= _MAX_RETRIES:
             msg = "Infinite loop"
             raise ValueError(msg)
+
+
+class FakePeImage(NamedTuple):
+    """
+    Identity-mapped stand-in for PeImage with only the attributes used by the tested functions
+    """
+
+    data: bytes = b""
+    data_directories: Sequence[DataDirectory] = ()
+    sections: Sequence[SectionView] = ()
+    image_base: int = 0x140000000
+
+    def rva_to_offset(self, rva: int) -> Offset:
+        return Offset(rva)